@@ -1,38 +1,336 @@
 import numpy as np
 from move import *
+from qtable import DictQTable, create_q_table
+from random_stream import RandomStream
+
+
+def boltzmann_probabilities(values: np.ndarray, temperature: float) -> np.ndarray:
+    """
+    Compute the Boltzmann (softmax) distribution of some values. The
+    maximal value is subtracted first so that small temperatures do not
+    overflow the exponential.
+
+    :param values: The values of the possible choices (one row per
+        distribution if the array has several dimensions).
+    :param temperature: The temperature (Boltzmann tau).
+
+    :return: The probability of each choice.
+    """
+    exponents = np.exp((values - np.max(values, axis=-1, keepdims=True)) / temperature)
+    return exponents / np.sum(exponents, axis=-1, keepdims=True)
+
+
+def sample_index(probabilities: np.ndarray, rng=np.random) -> int:
+    """
+    Draw an index according to a probability distribution, with one
+    uniform draw on the cumulative sum.
+
+    :param probabilities: The probability of each index.
+    :param rng: The source of the uniform draw (a RandomStream, or the
+        global numpy random state by default).
+
+    :return: The index drawn.
+    """
+    cumulative = np.cumsum(probabilities)
+    return int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right'))
+
+
+def sample_indices(probabilities: np.ndarray, rng=np.random) -> np.ndarray:
+    """
+    Draw one index per row of a matrix of probability distributions.
+
+    :param probabilities: The probability of each index, one distribution
+        per row.
+    :param rng: The source of the uniform draws (a RandomStream, or the
+        global numpy random state by default).
+
+    :return: The index drawn for each row.
+    """
+    cumulative = np.cumsum(probabilities, axis=1)
+    draws = rng.random(len(cumulative)) * cumulative[:, -1]
+    return np.minimum(np.sum(cumulative <= draws[:, np.newaxis], axis=1), probabilities.shape[1] - 1)
+
+
+class Policy:
+    """
+    Frozen Boltzmann policy of an agent (used to evaluate the agent without
+    modifying it). Only the states stored in the Q-table of the agent have
+    their own probabilities, all the other states share one default row,
+    so the policy grows with the Q-table and not with the state space. It
+    is indexed by state ids like an array (state id, action).
+    """
+
+    def __init__(self, state_ids: np.ndarray, probabilities: np.ndarray):
+        """
+        Initialize the policy.
+
+        :param state_ids: The sorted ids of the states with their own
+            probabilities.
+        :param probabilities: An array (state, action) with the default
+            probabilities first, then the ones of the states of state_ids
+            (see get_row_state_ids).
+        """
+        # the sentinel is greater than any state id, so a search never goes past the end
+        self.state_ids = np.append(state_ids, np.iinfo(np.int64).max)
+        self.probabilities = probabilities
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    def __getitem__(self, state_ids):
+        """
+        Get the probabilities of the actions in some states.
+
+        :param state_ids: A state id or an array of state ids.
+
+        :return: The probabilities (state, action), or of one state.
+        """
+        positions = np.searchsorted(self.state_ids, state_ids)
+        return self.probabilities[np.where(self.state_ids[positions] == state_ids, positions + 1, 0)]
+
+    @staticmethod
+    def get_row_state_ids(state_ids: np.ndarray, num_states: int) -> np.ndarray:
+        """
+        Get the ids of the states whose probabilities are computed: a
+        state which is not stored, for the default row, then the states
+        stored.
+
+        :param state_ids: The sorted ids of the states stored.
+        :param num_states: The number of states of the game.
+
+        :return: The state ids of the rows of the policy.
+        """
+        missing = np.flatnonzero(state_ids != np.arange(len(state_ids)))
+        default_state_id = missing[0] if len(missing) > 0 else min(len(state_ids), num_states - 1)
+        return np.concatenate(([default_state_id], state_ids)).astype(int)
 
 
 class State:
+    """
+    State of a hunter given by its relative position and the relative
+    position of the other hunter. In the simulation loops the states are
+    passed as integer ids (see StateEncoder), this class is kept as a
+    readable view of a state.
+    """
+    __slots__ = ('rel_position', 'other_rel_position')
+
     def __init__(self, rel_position, other_rel_position):
         self.rel_position = rel_position
         self.other_rel_position = other_rel_position
 
+    def __setstate__(self, attributes):
+        """
+        Restore a pickled state. States pickled before __slots__ was used
+        stored their attributes in a dictionary.
+
+        :param attributes: The pickled attributes of the state.
+        """
+        if isinstance(attributes, tuple):
+            attributes = attributes[1]
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+    def swapped(self):
+        """
+        Get the state as seen by the other hunter.
+
+        :return: The state with the relative positions inverted.
+        """
+        return State(self.other_rel_position, self.rel_position)
+
+
+class StateEncoder:
+    """
+    Map the states of a game to consecutive integer ids, so that they can
+    be used as indices in arrays.
+    """
+
+    def __init__(self, playing_field_size: tuple):
+        """
+        Initialize the encoder.
+
+        :param playing_field_size: Size of game board (width, height).
+        """
+        self.x_max = playing_field_size[0]
+        self.y_max = playing_field_size[1]
+
+        # relative coordinates lie in [-max // 2, max // 2] on the torus
+        self.x_offset = self.x_max // 2
+        self.y_offset = self.y_max // 2
+        self.x_size = 2 * self.x_offset + 1
+        self.y_size = 2 * self.y_offset + 1
+
+        self.nb_positions = self.x_size * self.y_size
+        self.num_states = self.nb_positions * self.nb_positions
+
+    @property
+    def swapped_ids(self) -> np.ndarray:
+        """
+        The state id as seen by the other hunter, for every state id
+        (computed on demand, it is as large as the state space).
+        """
+        return self.swap_array(np.arange(self.num_states))
+
+    def encode_position(self, position: (int, int)) -> int:
+        """
+        Get the id of a relative position.
+
+        :param position: The relative position (x, y).
+
+        :return: The id of the position.
+        """
+        return int((position[0] + self.x_offset) * self.y_size + position[1] + self.y_offset)
+
+    def decode_position(self, position_id: int) -> (int, int):
+        """
+        Get the relative position corresponding to an id.
+
+        :param position_id: The id of the position.
+
+        :return: The relative position (x, y).
+        """
+        return position_id // self.y_size - self.x_offset, position_id % self.y_size - self.y_offset
+
+    def encode_positions(self, rel_position: (int, int), other_rel_position: (int, int)) -> int:
+        """
+        Get the id of the state made of two relative positions.
+
+        :param rel_position: The relative position of the hunter.
+        :param other_rel_position: The relative position of the other hunter.
+
+        :return: The id of the state.
+        """
+        return self.encode_position(rel_position) * self.nb_positions + self.encode_position(other_rel_position)
+
+    def encode(self, state) -> int:
+        """
+        Get the id of a state.
+
+        :param state: The state of the two hunters given by their relative
+            positions, or already a state id (returned unchanged).
+
+        :return: The id of the state.
+        """
+        if isinstance(state, State):
+            return self.encode_positions(state.rel_position, state.other_rel_position)
+        return int(state)
+
+    def swap(self, state) -> int:
+        """
+        Get the id of a state as seen by the other hunter.
+
+        :param state: The state or the id of the state.
+
+        :return: The id of the state with the relative positions inverted.
+        """
+        state_id = self.encode(state)
+        return (state_id % self.nb_positions) * self.nb_positions + state_id // self.nb_positions
+
+    def swap_array(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Get the ids of several states as seen by the other hunter.
+
+        :param state_ids: The ids of the states.
+
+        :return: The id of each state with the relative positions inverted.
+        """
+        return (state_ids % self.nb_positions) * self.nb_positions + state_ids // self.nb_positions
+
+    def encode_position_array(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Get the ids of several relative positions.
+
+        :param positions: The relative positions (n, 2).
+
+        :return: The id of each position.
+        """
+        return (positions[:, 0] + self.x_offset) * self.y_size + positions[:, 1] + self.y_offset
+
+    def decode(self, state_id: int) -> State:
+        """
+        Get the state corresponding to an id.
+
+        :param state_id: The id of the state.
+
+        :return: The state of the two hunters.
+        """
+        return State(self.decode_position(state_id // self.nb_positions),
+                     self.decode_position(state_id % self.nb_positions))
+
 
 class Agent:
     """
     Abstract agent.
     """
 
+    # the maximal expected value of a state (see max_EV_next) only depends on the
+    # Q-values (and internal model) of that state, so it can be cached
+    max_EV_cached = False
+
     def __init__(self, learning_rate: float, discount_rate: float, temperature: float, initial_state: State,
-                 initial_q_value=0.0, theta=None):
+                 initial_q_value=0.0, theta=None, backend='dict', state_encoder=None, rng=None):
         """
         Initialize an agent.
 
         :param learning_rate: The learning rate (alpha)
         :param discount_rate: The discount rate (gamma)
         :param temperature: The temperature (Boltzmann tau)
-        :param initial_state: The initial state
+        :param initial_state: The initial state (a State or a state id)
         :param initial_q_value: The initial values of the Q-table
         :param theta: The theta for the internal model (None if the
             internal model is not used).
+        :param backend: The storage used for the Q-table ('dict', 'sparse',
+            'array' or 'memmap').
+        :param state_encoder: The state encoder of the game (mandatory for
+            the 'array' and 'memmap' backends).
+        :param rng: The random stream of the agent (see RandomStream, one
+            seeded from the OS entropy if None).
         """
-        self.q_table = dict()
+        self.q_table = create_q_table(backend, initial_q_value, state_encoder)
+        self.rng = rng if rng is not None else RandomStream()
+        self.backend = backend
+        self.state_encoder = state_encoder
         self.initial_q_value = initial_q_value
         self.learning_rate = learning_rate
         self.discount_rate = discount_rate
         self.temperature = temperature
         self.state = initial_state
         self.theta = theta
+        self.max_EV_cache = {}  # state key -> maximal expected value (see max_EV_next)
+
+    def __setstate__(self, attributes: dict):
+        """
+        Restore a pickled agent. Agents pickled before the Q-table
+        backends existed stored their Q-table as a plain dictionary, and
+        agents pickled before the random streams have none.
+
+        :param attributes: The pickled attributes of the agent.
+        """
+        self.__dict__.update(attributes)
+        if 'rng' not in attributes:
+            self.rng = RandomStream()
+        if 'max_EV_cache' not in attributes:
+            self.max_EV_cache = {}
+        if isinstance(self.q_table, dict):
+            q_table = DictQTable(self.initial_q_value)
+            q_table.values = self.q_table
+            self.q_table = q_table
+            self.backend = 'dict'
+            self.state_encoder = None  # see set_state_encoder
+
+    def set_state_encoder(self, state_encoder: StateEncoder):
+        """
+        Give a state encoder to an agent without one (agents pickled before
+        the states were encoded), its tables are then keyed by state id
+        like the ones of the other agents.
+
+        :param state_encoder: The state encoder of the game.
+        """
+        self.state_encoder = state_encoder
+        self.q_table.set_state_encoder(state_encoder)
+        if hasattr(self, 'internal_model'):
+            self.internal_model.set_state_encoder(state_encoder)
+        self.max_EV_cache = {}
 
     def get_q_value(self, action: int, other_action: int = None) -> float:
         """
@@ -44,23 +342,27 @@ class Agent:
 
         :return: The q value.
         """
-        qIndex = (self.state.rel_position, self.state.other_rel_position, action, other_action)
-        if qIndex in self.q_table:
-            return self.q_table[qIndex]
-        else:
-            self.q_table[qIndex] = self.initial_q_value
-            return self.initial_q_value
+        return self.q_table.get(self.state, action, other_action)
 
     def update_q_value(self, q_value: float, action: int, other_action=None):
         """
-        Update the Q-table (for the state we are in).
+        Update the Q-table (for the state we are in), and the cached maximal
+        expected value of the state.
 
         :param q_value: The new Q-value.
         :param action: The action done.
         :param other_action: The other agent action (ignored if None).
         """
-        qIndex = (self.state.rel_position, self.state.other_rel_position, action, other_action)
-        self.q_table[qIndex] = q_value
+        if self.max_EV_cached:
+            key = self.get_state_key(self.state)
+            ev_max = self.max_EV_cache.get(key)
+            if ev_max is not None and self.is_max_EV_candidate(self.state, action, other_action):
+                if q_value >= ev_max:
+                    self.max_EV_cache[key] = q_value
+                elif self.q_table.get(self.state, action, other_action) == ev_max:
+                    # the maximum decreased, it is computed again when needed
+                    del self.max_EV_cache[key]
+        self.q_table.set(self.state, action, other_action, q_value)
 
     def set_state(self, state: State):
         """
@@ -112,10 +414,58 @@ class Agent:
         else:
             return initial_position
 
+    def get_state_key(self, state: State):
+        """
+        Create the key of a state in the cache of the maximal expected values.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: The id of the state, or its relative positions if there is no
+            state encoder.
+        """
+        if self.state_encoder is not None:
+            return self.state_encoder.encode(state)
+        return state.rel_position, state.other_rel_position
+
+    def is_max_EV_candidate(self, state: State, action: int, other_action: int) -> bool:
+        """
+        Check if a Q-value is one of the values the maximal expected value
+        of a state is taken from (see max_EV_next).
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action.
+        :param other_action: The other agent action (None if ignored).
+
+        :return: True if the Q-value counts in the maximal expected value.
+        """
+        return True
+
     def max_EV_next(self, new_state: State) -> float:
         """
         Find the maximal expected value for every possible action, starting
-        from the specified state, by using the current Q-table.
+        from the specified state, by using the current Q-table. If the agent
+        caches it (max_EV_cached), it is only computed again after a change
+        of the Q-values or of the internal model of the state which can
+        change it (see update_q_value).
+
+        :param new_state: The new state from which every possible action
+            is computed.
+
+        :return: The maximal expected value between all the action.
+        """
+        if not self.max_EV_cached:
+            return self.compute_max_EV_next(new_state)
+
+        key = self.get_state_key(new_state)
+        ev_max = self.max_EV_cache.get(key)
+        if ev_max is None:
+            ev_max = self.max_EV_cache[key] = self.compute_max_EV_next(new_state)
+        return ev_max
+
+    def compute_max_EV_next(self, new_state: State) -> float:
+        """
+        Compute the maximal expected value for every possible action (see
+        max_EV_next).
 
         :param new_state: The new state from which every possible action
             is computed.
@@ -141,13 +491,7 @@ class Agent:
 
         :return: The action chosen (MOVE_*)
         """
-        probas = [np.exp(self.expected_value(action) / self.temperature) for action in range(NB_MOVES)]
-        tot = sum(probas)
-        probas = [p / tot for p in probas]
-
-        action = np.random.choice(range(NB_MOVES), p=probas)
-
-        return action
+        return sample_index(boltzmann_probabilities(self.expected_values(), self.temperature), self.rng)
 
     def choose_next_action(self) -> int:
         """
@@ -185,6 +529,40 @@ class Agent:
         print("expected_value() must be implemented.")
         return 0.0
 
+    def get_expected_values_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Compute the expected value of every action in some states,
+        without modifying the agent.
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action) with the expected values.
+        """
+        return self.q_table.get_rows(state_ids)[:, :, NB_MOVES]
+
+    def get_policy(self) -> Policy:
+        """
+        Snapshot the current Boltzmann policy of the agent (used to evaluate
+        the agent without modifying it). The expected values of a state
+        whose Q-values are all initial are equal, whatever the internal
+        model, so only the states of the Q-table get their own row.
+
+        :return: The probability of each action in each state (see Policy).
+        """
+        state_ids = self.q_table.get_state_ids()
+        row_state_ids = Policy.get_row_state_ids(state_ids, self.state_encoder.num_states)
+        return Policy(state_ids, boltzmann_probabilities(self.get_expected_values_rows(row_state_ids),
+                                                         self.temperature))
+
+    def expected_values(self) -> np.ndarray:
+        """
+        Compute the expected value of every action for the current
+        state (used by the boltzmann function).
+
+        :return: An array with the expected value of each action.
+        """
+        return np.array([self.expected_value(action) for action in range(NB_MOVES)])
+
 
 if __name__ == "__main__":
     alpha = 0.1
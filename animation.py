@@ -54,13 +54,8 @@ def game_showcase(game: Game, hunter_config: HunterConfig):
     plt.show()
 
 
-def load_hunter_config(filename: str) -> HunterConfig:
-    with open(filename, 'rb') as hunter_config_file:
-        return pickle.load(hunter_config_file)
-
-
 def showcase_from_file(game: Game, filename: str):
-    hunter_config = load_hunter_config(filename)
+    hunter_config = load_hunter_config(filename, (game.x_max, game.y_max))
     game_showcase(game, hunter_config)
 
 
@@ -80,4 +75,4 @@ if __name__ == "__main__":
     penalty = -1
 
     game = Game(playing_field, reward, penalty)
-    showcase_from_file(game, "results/figure5_V2_with_STD/hunters_Q-learning with proposed action estimation_02012021_2041.bin")
+    showcase_from_file(game, "results/figure5_V2_with_STD/hunters_Q-learning with randomly action estimation_02012021_2200.bin")
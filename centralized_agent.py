@@ -1,5 +1,5 @@
 import numpy as np
-from agent import State, Agent
+from agent import State, Agent, Policy, boltzmann_probabilities, sample_index
 from move import *
 
 class Agent_Interface:
@@ -42,10 +42,12 @@ class Centralized_Agent(Agent):
     @Simulation using the Agent_Interface representing the agents.
     """
 
+    max_EV_cached = True
+
     def __init__(self, learning_rate: float, discount_rate: float, temperature: float, initial_state: State,
-                 initial_q_value=0.0, theta=0.998849):
+                 initial_q_value=0.0, theta=0.998849, backend='dict', state_encoder=None, rng=None):
         Agent.__init__(self, learning_rate, discount_rate, temperature, initial_state,
-                       initial_q_value, theta)
+                       initial_q_value, theta, backend, state_encoder, rng)
 
         self.initial_theta = theta
         self.action_choice = (None, None)
@@ -59,26 +61,45 @@ class Centralized_Agent(Agent):
         Returns the action of the agent of corresponding id.
         """
         if id == 0:
-            self.action_choice = self.boltzmann()
-            return self.action_choice[0]
+            return self.choose_joint_action()[0]
         return self.action_choice[1]
 
+    def choose_joint_action(self) -> (int, int):
+        """
+        Choose the actions of both agents at once (used by the simulation
+        loops instead of a call per Agent_Interface).
+
+        :return: The action pair chosen (MOVE_*, MOVE_*).
+        """
+        self.action_choice = self.boltzmann()
+        return self.action_choice
+
     # override
     def boltzmann(self) -> tuple:
         """
         Boltzmann function based on the Q-values of the possible next
         action pairs.
 
-        :return: The action chosen (MOVE_*)
+        :return: The action pair chosen (MOVE_*, MOVE_*)
+        """
+        q_values = self.q_table.get_action_pairs(self.state).ravel()
+        action_choice_idx = sample_index(boltzmann_probabilities(q_values, self.temperature), self.rng)
+        return divmod(action_choice_idx, NB_MOVES)
+
+    def get_policy(self) -> Policy:
+        """
+        Snapshot the current Boltzmann policy over the action pairs (used
+        to evaluate the agent without modifying it).
+
+        :return: The probability of each action pair in each state (see
+            Policy), the pair (action_1, action_2) having the index
+            action_1 * NB_MOVES + action_2.
         """
-        action_pairs = [(action_1, action_2) for action_1 in range(NB_MOVES) for action_2 in range(NB_MOVES)]
-        probas = [np.exp(self.get_q_value_for_action_pair(self.state, action_pair) / self.temperature) for action_pair
-                  in action_pairs]
-        tot = sum(probas)
-        probas = [p / tot for p in probas]
-        action_choice_idx = np.random.choice(range(len(action_pairs)), p=probas)
-        action_choice = action_pairs[action_choice_idx]
-        return action_choice
+        state_ids = self.q_table.get_state_ids()
+        row_state_ids = Policy.get_row_state_ids(state_ids, self.state_encoder.num_states)
+        q_values = self.q_table.get_rows(row_state_ids)[:, :, :NB_MOVES]
+        return Policy(state_ids, boltzmann_probabilities(q_values.reshape(len(q_values), NB_MOVES * NB_MOVES),
+                                                         self.temperature))
 
     def get_q_value_for_action_pair(self, state: State, action: tuple) -> float:
         """
@@ -89,12 +110,7 @@ class Centralized_Agent(Agent):
 
         :return: The q value.
         """
-        qIndex = (state.rel_position, state.other_rel_position, action[0], action[1])
-        if qIndex in self.q_table:
-            return self.q_table[qIndex]
-        else:
-            self.q_table[qIndex] = self.initial_q_value
-            return self.initial_q_value
+        return self.q_table.get(state, action[0], action[1])
 
     def update(self, new_state: State, action: int, reward: float, other_action: int, episode=1) -> None:
         """
@@ -122,29 +138,32 @@ class Centralized_Agent(Agent):
 
         self.set_state(new_state)
 
-    def max_EV_next(self, new_state: State) -> float:
+    def is_max_EV_candidate(self, state: State, action: int, other_action: int) -> bool:
         """
-        Find the maximal expected value for every possible action, starting
-        from the specified state, by using the current Q-table.
+        Check if a Q-value is one of the values the maximal expected value
+        of a state is taken from: the Q-values of the action pairs.
+
+        :param state: The state of the first agent (or its id).
+        :param action: The action of the first agent.
+        :param other_action: The action of the second agent (None if ignored).
+
+        :return: True if the Q-value counts in the maximal expected value.
+        """
+        return other_action is not None
+
+    def compute_max_EV_next(self, new_state: State) -> float:
+        """
+        Compute the maximal expected value for every possible action pair,
+        starting from the specified state, by using the current Q-table
+        (see Agent.max_EV_next).
 
         :param new_state: The new state from which every possible action
             is computed.
 
         :return: The maximal expected value between all the action.
         """
-        global NB_MOVES
         # @TODO: take into account the prey moves (if it changes something?)
-
-        ev_max = None
-
-        action_pairs = [(action_1, action_2) for action_1 in range(NB_MOVES) for action_2 in range(NB_MOVES)]
-        for action in action_pairs:
-            ev = self.predict_reward(new_state, action)
-
-            if ev_max is None or ev > ev_max:
-                ev_max = ev
-
-        return ev_max
+        return self.q_table.get_action_pairs(new_state).max()
 
     def predict_reward(self, future_state: State, action: tuple) -> float:
         """
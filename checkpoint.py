@@ -0,0 +1,295 @@
+import io
+import os
+import pickle
+
+import numpy as np
+
+from qtable import create_memmap
+
+# rows of the tables compared at once with their last saved copy, to bound
+# the memory used by the comparison of large (memory-mapped) tables
+ROWS_PER_BLOCK = 65536
+
+# a new log of the tables is started once the log is that many times larger
+# than the full copy of the tables it starts with
+MAX_LOG_GROWTH = 4
+
+# persistent id of the caches of the agents, which are not saved (see CheckpointWriter)
+CACHE = 'cache'
+
+_MISSING = object()
+
+
+def get_tables(agents: list) -> dict:
+    """
+    Get the tables of the agents saved incrementally: the Q-values of the
+    Q-tables and the estimations of the internal models.
+
+    :param agents: The learning agents (see result_file.get_agents).
+
+    :return: The tables (a dictionary or an array each) by name.
+    """
+    tables = {}
+    for index, agent in enumerate(agents):
+        tables[f'q_table_{index}'] = agent.q_table.values
+        if hasattr(agent, 'internal_model'):
+            tables[f'internal_model_{index}'] = agent.internal_model.model
+    return tables
+
+
+def copy_table(table):
+    """
+    Copy a table as it is saved, the rows of the tables storing one array
+    per state are copied as well. The copy of a memory-mapped array is
+    memory-mapped too.
+
+    :param table: The table (a dictionary or an array).
+
+    :return: The copy.
+    """
+    if isinstance(table, dict):
+        return {key: value.copy() if isinstance(value, np.ndarray) else value for key, value in table.items()}
+    if isinstance(table, np.memmap):
+        copy = create_memmap(table.shape)
+        copy[:] = table
+        return copy
+    return np.array(table)
+
+
+def get_table_changes(table, saved_table) -> tuple:
+    """
+    Get the changes of a table since it was saved, and apply them to the
+    saved copy (see apply_table_changes).
+
+    :param table: The table (a dictionary or an array).
+    :param saved_table: The copy of the table when it was last saved.
+
+    :return: The changes: ('dict', the entries added or changed, the keys
+        removed) or ('rows', the indices of the rows changed, the rows).
+    """
+    if isinstance(table, dict):
+        changed = {}
+        for key, value in table.items():
+            saved_value = saved_table.get(key, _MISSING)
+            if isinstance(value, np.ndarray):
+                if saved_value is _MISSING or not np.array_equal(value, saved_value):
+                    changed[key] = value.copy()
+            elif saved_value is _MISSING or saved_value != value:
+                changed[key] = value
+        removed = [key for key in saved_table if key not in table]
+        changes = ('dict', changed, removed)
+    else:
+        indices = []
+        for start in range(0, len(table), ROWS_PER_BLOCK):
+            block = table[start:start + ROWS_PER_BLOCK]
+            is_changed = block != saved_table[start:start + ROWS_PER_BLOCK]
+            indices.append(start + np.flatnonzero(is_changed.reshape(len(block), -1).any(axis=1)))
+        indices = np.concatenate(indices)
+        changes = ('rows', indices, np.array(table[indices]))
+    apply_table_changes(saved_table, changes)
+    return changes
+
+
+def apply_table_changes(table, changes: tuple):
+    """
+    Apply the changes of a table (see get_table_changes).
+
+    :param table: The table (a dictionary or an array).
+    :param changes: The changes.
+    """
+    if changes[0] == 'dict':
+        _, changed, removed = changes
+        for key in removed:
+            del table[key]
+        table.update({key: value.copy() if isinstance(value, np.ndarray) else value
+                      for key, value in changed.items()})
+    else:
+        _, indices, rows = changes
+        table[indices] = rows
+
+
+class _ManifestPickler(pickle.Pickler):
+    """
+    Pickler of the manifest of a checkpoint, the tables and the caches of
+    the agents are replaced by references.
+    """
+
+    def __init__(self, file, tables: dict, caches: list):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.tables = {id(table): (name, table) for name, table in tables.items()}
+        self.cache_ids = {id(cache) for cache in caches}
+
+    def persistent_id(self, obj):
+        if id(obj) in self.cache_ids:
+            return CACHE
+        name, table = self.tables.get(id(obj), (None, None))
+        if name is None and isinstance(obj, np.ndarray) and obj.base is not None:
+            # the array pickled for a memory-mapped table is a view on it
+            name, table = self.tables.get(id(obj.base), (None, None))
+            if table is not None and obj.shape != table.shape:
+                name = None
+        return name
+
+
+class _ManifestUnpickler(pickle.Unpickler):
+    """
+    Unpickler of the manifest of a checkpoint, the references are replaced
+    by the tables loaded from the log and by empty caches.
+    """
+
+    def __init__(self, file, tables: dict):
+        super().__init__(file)
+        self.tables = tables
+
+    def persistent_load(self, pid):
+        if pid == CACHE:
+            return {}
+        return self.tables[pid]
+
+
+class CheckpointWriter:
+    """
+    Save the checkpoints of a simulation incrementally. The tables of the
+    agents (see get_tables) are appended to a log: a full copy of them at
+    the first checkpoint, and then only the entries or rows changed since
+    the previous checkpoint. Everything else (the game and the random
+    streams, the hunters without their tables, the results and the
+    counters) is pickled into a small manifest, which references the
+    tables and the length of the log. The caches of the agents are not
+    saved, they are filled again after a resume.
+
+    The manifest is written to a temporary file which then replaces the
+    previous one, after the log was written, so a crash while saving
+    leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, filename: str):
+        """
+        Initialize the writer, the log of the checkpoint found in the file
+        (if any) is replaced at the first checkpoint.
+
+        :param filename: The name of the checkpoint file (the manifest).
+        """
+        self.filename = filename
+        self.log_filename = None
+        self.log_size = 0
+        self.base_size = 0
+        self.saved_tables = {}
+
+    def start_log(self, tables: dict, previous_log_filename: str) -> dict:
+        """
+        Start a new log with a full copy of the tables, next to the log
+        of the previous manifest (removed once the manifest is replaced).
+
+        :param tables: The tables by name.
+        :param previous_log_filename: The log of the previous manifest
+            (None if there is none).
+
+        :return: The changes of the first record of the log.
+        """
+        number = int(previous_log_filename.rsplit('.', 1)[1]) + 1 if previous_log_filename is not None else 1
+        self.log_filename = f"{self.filename}.log.{number}"
+        self.log_size = 0
+        self.saved_tables = {name: copy_table(table) for name, table in tables.items()}
+        return {name: ('full', table if isinstance(table, dict) else np.asarray(table))
+                for name, table in tables.items()}
+
+    def save(self, checkpoint: dict, agents: list) -> int:
+        """
+        Save a checkpoint.
+
+        :param checkpoint: The objects to save.
+        :param agents: The learning agents, whose tables are saved
+            incrementally (see result_file.get_agents).
+
+        :return: The number of bytes written.
+        """
+        tables = get_tables(agents)
+        previous_log_filename = self.log_filename
+        if previous_log_filename is None:
+            previous_log_filename = get_log_filename(self.filename)
+        if self.log_filename is None or self.log_size > MAX_LOG_GROWTH * self.base_size \
+                or tables.keys() != self.saved_tables.keys():
+            record = self.start_log(tables, previous_log_filename)
+        else:
+            record = {name: get_table_changes(table, self.saved_tables[name]) for name, table in tables.items()}
+
+        # the record is written after the end of the log known to the manifest
+        with open(self.log_filename, 'r+b' if self.log_size > 0 else 'wb') as log_file:
+            log_file.seek(self.log_size)
+            pickle.dump(record, log_file, protocol=pickle.HIGHEST_PROTOCOL)
+            log_file.truncate()
+            log_file.flush()
+            os.fsync(log_file.fileno())
+            record_size = log_file.tell() - self.log_size
+            self.log_size = log_file.tell()
+        if self.log_filename != previous_log_filename:
+            self.base_size = self.log_size
+
+        manifest = io.BytesIO()
+        pickle.dump({'log_filename': os.path.basename(self.log_filename), 'log_size': self.log_size}, manifest)
+        caches = [agent.max_EV_cache for agent in agents if hasattr(agent, 'max_EV_cache')]
+        _ManifestPickler(manifest, tables, caches).dump(checkpoint)
+
+        temporary_filename = f"{self.filename}.tmp"
+        with open(temporary_filename, 'wb') as checkpoint_file:
+            checkpoint_file.write(manifest.getbuffer())
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_filename, self.filename)
+
+        if previous_log_filename is not None and previous_log_filename != self.log_filename:
+            os.remove(previous_log_filename)
+        return record_size + len(manifest.getbuffer())
+
+
+def read_header(checkpoint_file) -> dict:
+    """
+    Read the header of a checkpoint (see CheckpointWriter).
+
+    :param checkpoint_file: The checkpoint file, opened in binary mode.
+
+    :return: The header: the name of the log file and its length.
+    """
+    header = pickle.load(checkpoint_file)
+    if not isinstance(header, dict) or 'log_filename' not in header:
+        raise ValueError(f"{checkpoint_file.name} is not a checkpoint")
+    return header
+
+
+def get_log_filename(filename: str):
+    """
+    Get the log of the tables of a checkpoint (see CheckpointWriter).
+
+    :param filename: The name of the checkpoint file.
+
+    :return: The name of the log file, None if there is no checkpoint.
+    """
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'rb') as checkpoint_file:
+        header = read_header(checkpoint_file)
+    return os.path.join(os.path.dirname(filename), header['log_filename'])
+
+
+def load_checkpoint(filename: str) -> dict:
+    """
+    Load a checkpoint (see CheckpointWriter).
+
+    :param filename: The name of the checkpoint file.
+
+    :return: The saved objects.
+    """
+    with open(filename, 'rb') as checkpoint_file:
+        header = read_header(checkpoint_file)
+
+        tables = {}
+        with open(os.path.join(os.path.dirname(filename), header['log_filename']), 'rb') as log_file:
+            while log_file.tell() < header['log_size']:
+                for name, changes in pickle.load(log_file).items():
+                    if changes[0] == 'full':
+                        tables[name] = changes[1]
+                    else:
+                        apply_table_changes(tables[name], changes)
+
+        return _ManifestUnpickler(checkpoint_file, tables).load()
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class EvaluationBudget:
+    """
+    Adaptive number of evaluation episodes: the episodes are played in
+    rounds until the confidence interval of the mean time steps is narrow
+    enough (or the maximal number of evaluation episodes is reached). A
+    curve which has converged to a few time steps only needs a few rounds,
+    while the noisy start of the training gets the full budget.
+    """
+
+    def __init__(self, relative_width=0.05, round_episodes=20, z=1.96):
+        """
+        :param relative_width: Largest accepted half-width of the confidence
+            interval of the mean, relative to the mean (0.05 for +/- 5%).
+        :param round_episodes: Number of evaluation episodes played between
+            two checks of the confidence interval.
+        :param z: Quantile of the normal distribution of the confidence
+            level (1.96 for a 95% confidence interval).
+        """
+        self.relative_width = relative_width
+        self.round_episodes = round_episodes
+        self.z = z
+
+    def get_half_width(self, time_steps: np.ndarray) -> float:
+        """
+        Compute the half-width of the confidence interval of the mean time steps.
+
+        :param time_steps: The time steps of the evaluation episodes played so far.
+
+        :return: The half-width of the confidence interval (inf with less
+            than 2 episodes).
+        """
+        if len(time_steps) < 2:
+            return np.inf
+        return self.z * np.std(time_steps, ddof=1) / np.sqrt(len(time_steps))
+
+    def is_enough(self, time_steps: np.ndarray) -> bool:
+        """
+        Check if the evaluation can be stopped.
+
+        :param time_steps: The time steps of the evaluation episodes played so far.
+
+        :return: True if the confidence interval is narrow enough.
+        """
+        return self.get_half_width(time_steps) <= self.relative_width * np.average(time_steps)
+
+
+class ConvergenceCriterion:
+    """
+    Stop the training when the learning curve is flat: the averages of the
+    last evaluations all lie within a band around their mean. Any object
+    with an is_converged method taking the averages can be used instead.
+    """
+
+    def __init__(self, window=10, tolerance=0.05, min_episodes=0):
+        """
+        :param window: Number of last evaluations checked.
+        :param tolerance: Half-width of the band, relative to the mean of
+            the last evaluations.
+        :param min_episodes: The training is never stopped before this
+            number of training episodes.
+        """
+        self.window = window
+        self.tolerance = tolerance
+        self.min_episodes = min_episodes
+
+    def is_converged(self, average_time_steps: np.ndarray, episode: int) -> bool:
+        """
+        Check if the learning curve has converged.
+
+        :param average_time_steps: The average time steps of every evaluation so far.
+        :param episode: The training episode of the last evaluation.
+
+        :return: True if the training can be stopped.
+        """
+        if episode < self.min_episodes or len(average_time_steps) < self.window:
+            return False
+        last_averages = average_time_steps[-self.window:]
+        mean = np.average(last_averages)
+        return bool(np.all(np.abs(last_averages - mean) <= self.tolerance * mean))
@@ -0,0 +1,97 @@
+import numpy as np
+
+from agent import boltzmann_probabilities, sample_index
+from qwpae_agent import QwProposedAEAgent
+from random_stream import RandomStream
+
+
+class FactoredAgent:
+    """
+    Hunter of a game with several other hunters (see MultiHunterGame),
+    estimating the actions of each other hunter with its own internal
+    model. Instead of a Q-table over the joint actions of all the hunters
+    (5^N Q-values per state, on states made of the N relative positions),
+    the agent is factored into one agent per other hunter (a QwPAE agent by
+    default): each factor learns the Q-values of the actions of the hunter
+    against the actions of one other hunter, on the states made of their
+    two relative positions. The expected value of an action is the average
+    of its expectations under the internal models of the factors, so the
+    cost of a time step and the size of the tables grow linearly with the
+    number of hunters.
+    """
+
+    def __init__(self, learning_rate: float, discount_rate: float, temperature: float, initial_states: [int],
+                 initial_q_value=0.0, theta=0.998849, backend='dict', state_encoder=None, rng=None,
+                 factor_type=QwProposedAEAgent):
+        """
+        Initialize an agent.
+
+        :param learning_rate: The learning rate (alpha)
+        :param discount_rate: The discount rate (gamma)
+        :param temperature: The temperature (Boltzmann tau)
+        :param initial_states: The initial state ids, one per other hunter
+            (see MultiHunterGame.get_state_ids).
+        :param initial_q_value: The initial values of the Q-tables
+        :param theta: The theta for the internal models.
+        :param backend: The storage used for the Q-tables and the internal
+            models ('dict', 'sparse', 'array' or 'memmap').
+        :param state_encoder: The state encoder of the game (mandatory for
+            the 'array' and 'memmap' backends).
+        :param rng: The random stream of the agent (see RandomStream, one
+            seeded from the OS entropy if None).
+        :param factor_type: The agent class of the factors (an agent with an
+            internal model of the other agent, e.g. QwProposedAEAgent or
+            QwRandomAEAgent).
+        """
+        self.rng = rng if rng is not None else RandomStream()
+        self.factors = [factor_type(learning_rate, discount_rate, temperature, state, initial_q_value, theta,
+                                    backend, state_encoder, self.rng.spawn()) for state in initial_states]
+
+    @property
+    def temperature(self) -> float:
+        # the factors share the temperature schedule (see QwProposedAEAgent.update)
+        return self.factors[0].temperature
+
+    @property
+    def state(self) -> [int]:
+        return [factor.state for factor in self.factors]
+
+    def set_state(self, states: [int]):
+        """
+        Set the states to new ones without updating anything else.
+
+        :param states: The new state ids, one per other hunter.
+        """
+        for factor, state in zip(self.factors, states):
+            factor.set_state(state)
+
+    def expected_values(self) -> np.ndarray:
+        """
+        Compute the expected value of every action for the current
+        states (used by the boltzmann function).
+
+        :return: An array with the expected value of each action.
+        """
+        return np.mean([factor.expected_values() for factor in self.factors], axis=0)
+
+    def choose_next_action(self) -> int:
+        """
+        Choose the next action based on the current states.
+
+        :return: Choose the next action (MOVE_*)
+        """
+        return sample_index(boltzmann_probabilities(self.expected_values(), self.temperature), self.rng)
+
+    def update(self, new_states: [int], action: int, reward: float, other_actions: [int], episode=1):
+        """
+        Update every factor with the action of its other hunter.
+
+        :param new_states: The new state ids, one per other hunter.
+        :param action: The action done by the agent (MOVE_*).
+        :param reward: The reward obtained.
+        :param other_actions: The actions of the other hunters, in the
+            order of the hunters.
+        :param episode: the episode of the game
+        """
+        for factor, new_state, other_action in zip(self.factors, new_states, other_actions):
+            factor.update(new_state, action, reward, other_action, episode)
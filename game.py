@@ -1,6 +1,33 @@
+from bisect import bisect_right
+from functools import lru_cache
+
 import numpy as np
-from agent import State
+from agent import State, StateEncoder
 from move import *
+from random_stream import RandomStream
+
+
+@lru_cache(maxsize=None)
+def get_relative_location_tables(x_max: int, y_max: int) -> (np.ndarray, np.ndarray):
+    """
+    Precompute the shortest relative coordinate on the torus for every
+    possible difference of coordinates between the prey and a hunter.
+    The tables are computed once per playing field size.
+
+    :param x_max: Width of the playing field.
+    :param y_max: Height of the playing field.
+
+    :return: The tables of the x and y coordinates, the relative coordinate
+        of a difference d is found at index d + max - 1.
+    """
+
+    def get_relative_location_table(max_coord):
+        diff = np.arange(-(max_coord - 1), max_coord)
+        dist = np.stack([diff, diff + max_coord, diff - max_coord])
+        min_index = np.argmin(np.abs(dist), axis=0)  # get index of lowest abs distance
+        return dist[min_index, np.arange(diff.size)]
+
+    return get_relative_location_table(x_max), get_relative_location_table(y_max)
 
 
 def is_prey_caught_homogeneous(x1: int, y1: int, x2: int, y2: int) -> (bool, bool):
@@ -9,6 +36,7 @@ def is_prey_caught_homogeneous(x1: int, y1: int, x2: int, y2: int) -> (bool, boo
     both hunters should be at each side of the prey, vertically or horizontally.
     Thus both players get reward
     function needs to be injected as a parameter in game class 
+    the positions can also be arrays to check several games at once
 
     :param x1 (int): relative x position of hunter 1 vs prey
     :param y1 (int): relative y position of hunter 1 vs prey
@@ -17,8 +45,10 @@ def is_prey_caught_homogeneous(x1: int, y1: int, x2: int, y2: int) -> (bool, boo
     
     :Return (Bool,Bool): (has hunter 1 caught the prey,has hunter 2 caught the prey)
     """
-    is_caught_hunter_1 = (x1 == 0 == x2 and abs(y1) == 1 == abs(y2) and np.sign(y1) != np.sign(y2)) or \
-                         (y1 == 0 == y2 and abs(x1) == 1 == abs(x2) and np.sign(x1) != np.sign(x2))
+    is_caught_hunter_1 = ((x1 == 0) & (x2 == 0) & (np.abs(y1) == 1) & (np.abs(y2) == 1)
+                          & (np.sign(y1) != np.sign(y2))) | \
+                         ((y1 == 0) & (y2 == 0) & (np.abs(x1) == 1) & (np.abs(x2) == 1)
+                          & (np.sign(x1) != np.sign(x2)))
 
     is_caught_hunter_2 = is_caught_hunter_1
 
@@ -32,6 +62,7 @@ def is_prey_caught_heterogeneous(x1: int, y1: int, x2: int, y2: int) -> (bool, b
     Then hunter 1 gets reward. Hunter 2 only gets a reward if the prey is caught and
     hunter 2 is at the left or bottom of the prey
     function needs to be injected as a parameter in game class 
+    the positions can also be arrays to check several games at once
 
     :param x1 (int): relative x position of hunter 1 vs prey
     :param y1 (int): relative y position of hunter 1 vs prey
@@ -40,19 +71,57 @@ def is_prey_caught_heterogeneous(x1: int, y1: int, x2: int, y2: int) -> (bool, b
 
     :Return (Bool,Bool): (has hunter 1 caught the prey,has hunter 2 caught the prey)
     """
-    is_caught_hunter_1 = (x1 == 0 == x2 and abs(y1) == 1 == abs(y2) and np.sign(y1) != np.sign(y2)) or \
-                         (y1 == 0 == y2 and abs(x1) == 1 == abs(x2) and np.sign(x1) != np.sign(x2))
+    is_caught_hunter_1 = ((x1 == 0) & (x2 == 0) & (np.abs(y1) == 1) & (np.abs(y2) == 1)
+                          & (np.sign(y1) != np.sign(y2))) | \
+                         ((y1 == 0) & (y2 == 0) & (np.abs(x1) == 1) & (np.abs(x2) == 1)
+                          & (np.sign(x1) != np.sign(x2)))
 
     # hunter 2 must be on the left or the bottom (see paper page 6)
     # when prey is catched hunter 1 always gets reward, hunter 2 only gets reward
     # when it is on the left or bottom.
     # x1 and x2 are relative positions, if x2 == 1 then x2 is ont the left
     # same for y only coordinates here go downward
-    is_caught_hunter_2 = is_caught_hunter_1 and (x2 == 1 or y2 == -1)
+    is_caught_hunter_2 = is_caught_hunter_1 & ((x2 == 1) | (y2 == -1))
 
     return is_caught_hunter_1, is_caught_hunter_2
 
 
+def move_prey_between_hunters(positions: np.ndarray, prey_action_prob: np.ndarray, dict_action_to_coord: dict,
+                              playing_field_size: tuple, rng: RandomStream):
+    """
+    Move the prey, never on a cell occupied by a hunter. The moves landing
+    on a hunter are masked out of prey_action_prob and the remaining
+    probabilities renormalized, so a single draw is needed (as in
+    BatchedGame.move_prey). A prey without any valid move stays where it
+    is. Shared by Game and MultiHunterGame.
+
+    :param positions: The positions of the prey (first row) and of the
+        hunters (other rows), the prey position is updated in place.
+    :param prey_action_prob: The probability of each move of the prey.
+    :param dict_action_to_coord: The coordinates of each move.
+    :param playing_field_size: Size of game board (width, height).
+    :param rng: The random stream of the game.
+    """
+    x_max, y_max = playing_field_size
+    x, y = positions[0].tolist()
+    hunter_positions = positions[1:].tolist()
+
+    new_positions, cumulative = [], []
+    total = 0.0
+    for action, probability in enumerate(prey_action_prob.tolist()):
+        if probability > 0:
+            dx, dy = dict_action_to_coord[action]
+            new_position = [(x + dx) % x_max, (y + dy) % y_max]
+            if new_position not in hunter_positions:
+                total += probability
+                new_positions.append(new_position)
+                cumulative.append(total)
+
+    if new_positions:  # otherwise the prey is boxed in
+        index = bisect_right(cumulative, rng.random() * total)
+        positions[0] = new_positions[min(index, len(new_positions) - 1)]
+
+
 class Game:
     """
     Create a game playable step by step.
@@ -63,7 +132,8 @@ class Game:
                  penalty_hunter_1: int,
                  reward_hunter_2=None,
                  penalty_hunter_2=None,
-                 is_prey_caught_function=is_prey_caught_homogeneous):
+                 is_prey_caught_function=is_prey_caught_homogeneous,
+                 seed=None):
         """
         initialize game and place prey and hunters on random positions
 
@@ -73,6 +143,9 @@ class Game:
         :param reward_hunter_2: Reward for hunter 2 if the prey is caught.
         :param penalty_hunter_2: Score for hunter 2 if the prey is NOT caught.
         :param is_prey_caught_function: function to define if the prey is caught (int,int,int,int) -> (bool,bool)
+        :param seed: The seed of the run. The game draws from its random stream
+            and the streams of the agents are spawned from it (see RandomStream).
+            Seeded from the OS entropy if None.
         """
 
         dict_action_to_coord = {MOVE_TOP: (0, -1), MOVE_RIGHT: (1, 0), MOVE_BOTTOM: (0, 1),
@@ -101,16 +174,47 @@ class Game:
 
         self.is_prey_caught = is_prey_caught_function
 
-        self.prey_position, self.hunter_1_position, self.hunter_2_position = None, None, None
+        self.state_encoder = StateEncoder(playing_field_size)
+        self.rng = RandomStream(seed)
+
+        self.x_table, self.y_table = get_relative_location_tables(self.x_max, self.y_max)
+
+        # positions of the prey, hunter 1 and hunter 2 (one row each)
+        self.positions = np.zeros((3, 2), dtype=int)
+        self._relative_locations_key = None
+        self._relative_locations = None
+        self._state_ids = None
         self.reset_positions()
 
+    @property
+    def prey_position(self) -> np.array:
+        return self.positions[0]
+
+    @prey_position.setter
+    def prey_position(self, position: np.array):
+        self.positions[0] = position
+
+    @property
+    def hunter_1_position(self) -> np.array:
+        return self.positions[1]
+
+    @hunter_1_position.setter
+    def hunter_1_position(self, position: np.array):
+        self.positions[1] = position
+
+    @property
+    def hunter_2_position(self) -> np.array:
+        return self.positions[2]
+
+    @hunter_2_position.setter
+    def hunter_2_position(self, position: np.array):
+        self.positions[2] = position
+
     def reset_positions(self):
         """
         Place the prey and hunters randomly in the playing field.
         """
-        self.prey_position = np.array([np.random.randint(self.x_max), np.random.randint(self.y_max)])
-        self.hunter_1_position = np.array([np.random.randint(self.x_max), np.random.randint(self.y_max)])
-        self.hunter_2_position = np.array([np.random.randint(self.x_max), np.random.randint(self.y_max)])
+        self.positions[:] = self.rng.integers((self.x_max, self.y_max), size=(3, 2))
         self.move_prey()  # Forbid that the prey start at the same position as the hunters
 
     def update_position(self, position: np.array, action: int) -> np.array:
@@ -133,29 +237,27 @@ class Game:
     def get_relative_locations(self):
         """
         Transform the hunters absolute positions to the positions
-        relative to the prey.
+        relative to the prey. The result is cached until one of the
+        positions changes, so scoring and both state builders share
+        the same computation.
 
         :return: The relative positions of the hunters.
         """
-
-        def get_relative_location(prey_coord, hunter_coord, max_coord):
-            dist = np.array([
-                (prey_coord - hunter_coord),
-                (prey_coord + max_coord - hunter_coord),
-                (prey_coord - max_coord - hunter_coord)])
-            min_index = np.argmin(np.abs(dist))  # get index of lowest abs distance
-            return dist[min_index]  # return value of index
-
-        rel_loc_hunter_1 = np.array([
-            get_relative_location(self.prey_position[0], self.hunter_1_position[0], self.x_max),
-            get_relative_location(self.prey_position[1], self.hunter_1_position[1], self.y_max)
-        ])
-        rel_loc_hunter_2 = np.array([
-            get_relative_location(self.prey_position[0], self.hunter_2_position[0], self.x_max),
-            get_relative_location(self.prey_position[1], self.hunter_2_position[1], self.y_max)
-        ])
-
-        return rel_loc_hunter_1, rel_loc_hunter_2
+        key = self.positions.tobytes()
+        if key != self._relative_locations_key:
+            diff = self.positions[0] - self.positions[1:]
+            rel_locations = np.column_stack((self.x_table[diff[:, 0] + self.x_max - 1],
+                                             self.y_table[diff[:, 1] + self.y_max - 1]))
+            self._relative_locations = rel_locations[0], rel_locations[1]
+            self._relative_locations_key = key
+
+            position_id_hunter_1 = self.state_encoder.encode_position(rel_locations[0])
+            position_id_hunter_2 = self.state_encoder.encode_position(rel_locations[1])
+            nb_positions = self.state_encoder.nb_positions
+            self._state_ids = (position_id_hunter_1 * nb_positions + position_id_hunter_2,
+                               position_id_hunter_2 * nb_positions + position_id_hunter_1)
+
+        return self._relative_locations
 
     # ADDED on 28/12 KE
     def get_state_hunter_1(self) -> State:
@@ -179,6 +281,26 @@ class Game:
         rel_loc_hunter_1, rel_loc_hunter_2 = self.get_relative_locations()
         return State(tuple(rel_loc_hunter_2), tuple(rel_loc_hunter_1))
 
+    def get_state_id_hunter_1(self) -> int:
+        """
+        Get the id of the current state of hunter 1 (see StateEncoder),
+        without creating a state object.
+
+        :return: The id of the state.
+        """
+        self.get_relative_locations()
+        return self._state_ids[0]
+
+    def get_state_id_hunter_2(self) -> int:
+        """
+        Get the id of the current state of hunter 2 (see StateEncoder),
+        without creating a state object.
+
+        :return: The id of the state.
+        """
+        self.get_relative_locations()
+        return self._state_ids[1]
+
     def compute_score(self) -> float:
         """
         Compute the score of the players.
@@ -201,15 +323,13 @@ class Game:
         return score_hunter_1, score_hunter_2
 
     def move_prey(self):
-        bad_position, new_position = True, None
-        while bad_position:
-            prey_action = np.random.choice(self.prey_action_prob.size, p=self.prey_action_prob)
-            new_position = self.update_position(self.prey_position, prey_action)
-
-            bad_position = np.array_equal(new_position, self.hunter_1_position) \
-                           or np.array_equal(new_position, self.hunter_2_position)
-
-        self.prey_position = new_position
+        """
+        Move the prey, never on a cell occupied by a hunter (see
+        move_prey_between_hunters). A prey without any valid move stays
+        where it is.
+        """
+        move_prey_between_hunters(self.positions, self.prey_action_prob, self.dict_action_to_coord,
+                                  (self.x_max, self.y_max), self.rng)
 
     def play_one_episode(self, hunter_1_action: int, hunter_2_action: int) -> float:
         """
@@ -231,6 +351,433 @@ class Game:
         return self.compute_score()
 
 
+class BatchedGame:
+    """
+    Play several independent games at once. The positions of all the
+    games are stored in (nb_games, 2) arrays and every game is stepped
+    by a single vectorized call.
+    """
+
+    def __init__(self, nb_games: int,
+                 playing_field_size: tuple,
+                 reward_hunter_1: int,
+                 penalty_hunter_1: int,
+                 reward_hunter_2=None,
+                 penalty_hunter_2=None,
+                 is_prey_caught_function=is_prey_caught_homogeneous,
+                 auto_reset=True,
+                 rng=None):
+        """
+        initialize the games and place preys and hunters on random positions
+
+        :param nb_games: Number of games played at once.
+        :param playing_field_size: Size of game board (width, height).
+        :param reward_hunter_1: Reward for hunter 1 if the prey is caught.
+        :param penalty_hunter_1: Score for hunter 1 if the prey is NOT caught.
+        :param reward_hunter_2: Reward for hunter 2 if the prey is caught.
+        :param penalty_hunter_2: Score for hunter 2 if the prey is NOT caught.
+        :param is_prey_caught_function: function to define if the prey is caught, it
+            must accept arrays (array,array,array,array) -> (array,array)
+        :param auto_reset: Place the participants of a game randomly again as soon
+            as its prey is caught.
+        :param rng: The random stream of the games (see RandomStream, one
+            seeded from the OS entropy if None).
+        """
+        self.nb_games = nb_games
+        self.rng = rng if rng is not None else RandomStream()
+
+        self.action_to_coord = np.zeros((NB_MOVES, 2), dtype=int)
+        for action, coord in {MOVE_TOP: (0, -1), MOVE_RIGHT: (1, 0), MOVE_BOTTOM: (0, 1),
+                              MOVE_LEFT: (-1, 0), MOVE_STAY: (0, 0)}.items():
+            self.action_to_coord[action] = coord
+
+        self.prey_action_prob = np.array([0, 1 / 3, 1 / 3, 1 / 3, 0])
+
+        self.x_max = playing_field_size[0]
+        self.y_max = playing_field_size[1]
+        self.field_size = np.array([self.x_max, self.y_max])
+        self.x_table, self.y_table = get_relative_location_tables(self.x_max, self.y_max)
+
+        self.reward_hunter_1 = reward_hunter_1
+        self.penalty_hunter_1 = penalty_hunter_1
+        self.reward_hunter_2 = reward_hunter_1 if reward_hunter_2 is None else reward_hunter_2
+        self.penalty_hunter_2 = penalty_hunter_1 if penalty_hunter_2 is None else penalty_hunter_2
+
+        self.is_prey_caught = is_prey_caught_function
+        self.auto_reset = auto_reset
+
+        self.state_encoder = StateEncoder(playing_field_size)
+
+        self.prey_positions = np.zeros((nb_games, 2), dtype=int)
+        self.hunter_1_positions = np.zeros((nb_games, 2), dtype=int)
+        self.hunter_2_positions = np.zeros((nb_games, 2), dtype=int)
+        self.reset_positions()
+
+    @classmethod
+    def from_game(cls, game: Game, nb_games: int, auto_reset=True, rng=None):
+        """
+        Create a batch of games with the same settings as a game, drawing
+        from a random stream spawned from the one of the game.
+
+        :param game: The game to copy the settings from.
+        :param nb_games: Number of games played at once.
+        :param auto_reset: Place the participants of a game randomly again as soon
+            as its prey is caught.
+        :param rng: The random stream of the batched game, instead of one
+            spawned from the one of the game.
+
+        :return: The batched game.
+        """
+        batched_game = cls(nb_games, (game.x_max, game.y_max),
+                           game.reward_hunter_1, game.penalty_hunter_1,
+                           game.reward_hunter_2, game.penalty_hunter_2,
+                           game.is_prey_caught, auto_reset, rng or game.rng.spawn())
+        batched_game.prey_action_prob = np.array(game.prey_action_prob)
+        for action, coord in game.dict_action_to_coord.items():
+            batched_game.action_to_coord[action] = coord
+        return batched_game
+
+    def reset_positions(self, games=None):
+        """
+        Place the preys and hunters randomly in the playing field.
+
+        :param games: Boolean mask or indices of the games to reset (all
+            the games if None).
+        """
+        if games is None:
+            games = np.arange(self.nb_games)
+        games = np.flatnonzero(games) if np.asarray(games).dtype == bool else np.asarray(games)
+        if games.size == 0:
+            return
+
+        for positions in (self.prey_positions, self.hunter_1_positions, self.hunter_2_positions):
+            positions[games] = self.rng.integers((self.x_max, self.y_max), size=(games.size, 2))
+        self.move_prey(games)  # Forbid that the prey start at the same position as the hunters
+
+    def update_positions(self, positions: np.ndarray, actions: np.ndarray) -> np.ndarray:
+        """
+        Update the given positions considering the actions provided.
+
+        :param positions: The current positions (nb_games, 2).
+        :param actions: The action of each game (MOVE_*).
+
+        :return: The updated positions.
+        """
+        return (positions + self.action_to_coord[actions]) % self.field_size
+
+    def get_relative_locations(self) -> (np.ndarray, np.ndarray):
+        """
+        Transform the hunters absolute positions to the positions
+        relative to the prey, for every game.
+
+        :return: The relative positions of the hunters (nb_games, 2).
+        """
+
+        def get_relative_location(hunter_positions):
+            diff = self.prey_positions - hunter_positions
+            return np.column_stack((self.x_table[diff[:, 0] + self.x_max - 1],
+                                    self.y_table[diff[:, 1] + self.y_max - 1]))
+
+        return get_relative_location(self.hunter_1_positions), get_relative_location(self.hunter_2_positions)
+
+    def get_state_ids(self) -> (np.ndarray, np.ndarray):
+        """
+        Get the ids of the current states of both hunters in every game
+        (see StateEncoder).
+
+        :return: The state ids of hunter 1 and of hunter 2.
+        """
+        hunter_1_rel_pos, hunter_2_rel_pos = self.get_relative_locations()
+        position_ids_hunter_1 = self.state_encoder.encode_position_array(hunter_1_rel_pos)
+        position_ids_hunter_2 = self.state_encoder.encode_position_array(hunter_2_rel_pos)
+        nb_positions = self.state_encoder.nb_positions
+
+        return position_ids_hunter_1 * nb_positions + position_ids_hunter_2, \
+               position_ids_hunter_2 * nb_positions + position_ids_hunter_1
+
+    def keep_games(self, games):
+        """
+        Only keep some of the games in the batch (e.g. to drop the
+        finished ones).
+
+        :param games: Boolean mask or indices of the games to keep.
+        """
+        self.prey_positions = self.prey_positions[games]
+        self.hunter_1_positions = self.hunter_1_positions[games]
+        self.hunter_2_positions = self.hunter_2_positions[games]
+        self.nb_games = len(self.prey_positions)
+
+    def compute_score(self) -> (np.ndarray, np.ndarray):
+        """
+        Compute the score of the players of every game.
+
+        :return: The scores of hunter 1 and hunter 2.
+        """
+        hunter_1_rel_pos, hunter_2_rel_pos = self.get_relative_locations()
+
+        is_caught_hunter_1, is_caught_hunter_2 = self.is_prey_caught(hunter_1_rel_pos[:, 0], hunter_1_rel_pos[:, 1],
+                                                                     hunter_2_rel_pos[:, 0], hunter_2_rel_pos[:, 1])
+
+        score_hunter_1 = np.where(is_caught_hunter_1, self.reward_hunter_1, self.penalty_hunter_1)
+        score_hunter_2 = np.where(is_caught_hunter_2, self.reward_hunter_2, self.penalty_hunter_2)
+
+        return score_hunter_1, score_hunter_2
+
+    def move_prey(self, games=None):
+        """
+        Move the preys, never on a cell occupied by a hunter. The moves
+        landing on a hunter are masked out of prey_action_prob and the
+        remaining probabilities renormalized. A prey without any valid
+        move stays where it is.
+
+        :param games: Indices of the games whose prey moves (all the games
+            if None).
+        """
+        if games is None:
+            games = np.arange(self.nb_games)
+
+        prey_positions = self.prey_positions[games]
+        candidates = (prey_positions[:, np.newaxis, :] + self.action_to_coord) % self.field_size
+        blocked = np.all(candidates == self.hunter_1_positions[games, np.newaxis, :], axis=2) \
+                  | np.all(candidates == self.hunter_2_positions[games, np.newaxis, :], axis=2)
+
+        probs = np.where(blocked, 0.0, self.prey_action_prob)
+        cumulative = np.cumsum(probs, axis=1)
+        draws = self.rng.random(len(prey_positions)) * cumulative[:, -1]
+        prey_actions = np.minimum(np.sum(cumulative <= draws[:, np.newaxis], axis=1), NB_MOVES - 1)
+
+        is_boxed_in = cumulative[:, -1] == 0
+        new_positions = candidates[np.arange(len(prey_positions)), prey_actions]
+        self.prey_positions[games] = np.where(is_boxed_in[:, np.newaxis], prey_positions, new_positions)
+
+    def play_one_episode(self, hunter_1_actions: np.ndarray, hunter_2_actions: np.ndarray):
+        """
+        Play one time step of every game. If auto_reset is set, the games
+        in which the prey got caught are started again.
+
+        :param hunter_1_actions: Action selected by hunter 1 in each game.
+        :param hunter_2_actions: Action selected by hunter 2 in each game.
+
+        :return: The scores of hunter 1, the scores of hunter 2 and the mask
+            of the games in which the prey got caught.
+        """
+        self.hunter_1_positions = self.update_positions(self.hunter_1_positions, hunter_1_actions)
+        self.hunter_2_positions = self.update_positions(self.hunter_2_positions, hunter_2_actions)
+
+        self.move_prey()
+
+        score_hunter_1, score_hunter_2 = self.compute_score()
+        is_finished = (score_hunter_1 == self.reward_hunter_1) | (score_hunter_2 == self.reward_hunter_2)
+
+        if self.auto_reset:
+            self.reset_positions(is_finished)
+
+        return score_hunter_1, score_hunter_2, is_finished
+
+
+def is_prey_caught_opposite(rel_positions: np.ndarray) -> np.ndarray:
+    """
+    check if prey is caught in a game with any number of hunters: two of
+    the hunters should be at each side of the prey, vertically or
+    horizontally (is_prey_caught_homogeneous with two hunters). All the
+    hunters get the reward.
+    function needs to be injected as a parameter in MultiHunterGame class
+
+    :param rel_positions: relative positions of the hunters vs prey (nb_hunters, 2)
+
+    :Return: has each hunter caught the prey (nb_hunters,)
+    """
+    x, y = rel_positions[:, 0], rel_positions[:, 1]
+    is_caught = (np.any((x == 0) & (y == 1)) & np.any((x == 0) & (y == -1))) | \
+                (np.any((y == 0) & (x == 1)) & np.any((y == 0) & (x == -1)))
+    return np.full(len(rel_positions), is_caught)
+
+
+def is_prey_surrounded(rel_positions: np.ndarray) -> np.ndarray:
+    """
+    check if prey is caught by surrounding it: the four cells next to the
+    prey should all be occupied by hunters (so at least 4 hunters are
+    needed). All the hunters get the reward.
+    function needs to be injected as a parameter in MultiHunterGame class
+
+    :param rel_positions: relative positions of the hunters vs prey (nb_hunters, 2)
+
+    :Return: has each hunter caught the prey (nb_hunters,)
+    """
+    x, y = rel_positions[:, 0], rel_positions[:, 1]
+    is_caught = np.any((x == 0) & (y == 1)) & np.any((x == 0) & (y == -1)) & \
+                np.any((y == 0) & (x == 1)) & np.any((y == 0) & (x == -1))
+    return np.full(len(rel_positions), is_caught)
+
+
+class MultiHunterGame:
+    """
+    Create a game with any number of hunters, playable step by step. The
+    positions are stored in one array (the prey first, then the hunters)
+    and every hunter sees the game through one state per other hunter,
+    made of its own relative position and the one of the other hunter
+    (the states of Game, see StateEncoder): the number of states does not
+    grow with the number of hunters.
+    """
+
+    def __init__(self, playing_field_size: tuple,
+                 nb_hunters: int,
+                 rewards,
+                 penalties,
+                 is_prey_caught_function=is_prey_caught_opposite,
+                 seed=None):
+        """
+        initialize game and place prey and hunters on random positions
+
+        :param playing_field_size: Size of game board (width, height).
+        :param nb_hunters: Number of hunters.
+        :param rewards: Reward of each hunter if the prey is caught (one
+            value for all the hunters or one per hunter).
+        :param penalties: Score of each hunter if the prey is NOT caught
+            (one value for all the hunters or one per hunter).
+        :param is_prey_caught_function: function to define if the prey is caught,
+            (relative positions (nb_hunters, 2)) -> (has each hunter caught it)
+        :param seed: The seed of the run (see Game).
+        """
+        if nb_hunters >= playing_field_size[0] * playing_field_size[1]:
+            raise ValueError(f"no free cell for the prey with {nb_hunters} hunters "
+                             f"on a {playing_field_size} playing field")
+
+        self.dict_action_to_coord = {MOVE_TOP: (0, -1), MOVE_RIGHT: (1, 0), MOVE_BOTTOM: (0, 1),
+                                     MOVE_LEFT: (-1, 0), MOVE_STAY: (0, 0)}
+        self.action_to_coord = np.zeros((NB_MOVES, 2), dtype=int)
+        for action, coord in self.dict_action_to_coord.items():
+            self.action_to_coord[action] = coord
+
+        self.prey_action_prob = np.array([0, 1 / 3, 1 / 3, 1 / 3, 0])
+
+        self.x_max = playing_field_size[0]
+        self.y_max = playing_field_size[1]
+        self.field_size = np.array([self.x_max, self.y_max])
+
+        self.nb_hunters = nb_hunters
+        self.rewards = np.broadcast_to(rewards, nb_hunters).tolist()
+        self.penalties = np.broadcast_to(penalties, nb_hunters).tolist()
+
+        self.is_prey_caught = is_prey_caught_function
+
+        self.state_encoder = StateEncoder(playing_field_size)
+        self.rng = RandomStream(seed)
+
+        self.x_table, self.y_table = get_relative_location_tables(self.x_max, self.y_max)
+
+        # positions of the prey and of the hunters (one row each)
+        self.positions = np.zeros((nb_hunters + 1, 2), dtype=int)
+        self._relative_locations_key = None
+        self._relative_locations = None
+        self._state_ids = None
+        self.reset_positions()
+
+    @property
+    def prey_position(self) -> np.array:
+        return self.positions[0]
+
+    @prey_position.setter
+    def prey_position(self, position: np.array):
+        self.positions[0] = position
+
+    @property
+    def hunter_positions(self) -> np.ndarray:
+        return self.positions[1:]
+
+    @hunter_positions.setter
+    def hunter_positions(self, positions: np.ndarray):
+        self.positions[1:] = positions
+
+    def reset_positions(self):
+        """
+        Place the hunters randomly in the playing field, and the prey
+        randomly on one of the cells no hunter occupies.
+        """
+        self.hunter_positions = self.rng.integers((self.x_max, self.y_max), size=(self.nb_hunters, 2))
+        free_cells = np.setdiff1d(np.arange(self.x_max * self.y_max),
+                                  self.hunter_positions[:, 0] * self.y_max + self.hunter_positions[:, 1])
+        self.prey_position = divmod(int(free_cells[self.rng.integers(len(free_cells))]), self.y_max)
+
+    def get_relative_locations(self) -> np.ndarray:
+        """
+        Transform the hunters absolute positions to the positions
+        relative to the prey. The result is cached until one of the
+        positions changes.
+
+        :return: The relative positions of the hunters (nb_hunters, 2).
+        """
+        key = self.positions.tobytes()
+        if key != self._relative_locations_key:
+            diff = self.positions[0] - self.positions[1:]
+            self._relative_locations = np.column_stack((self.x_table[diff[:, 0] + self.x_max - 1],
+                                                        self.y_table[diff[:, 1] + self.y_max - 1]))
+            self._relative_locations_key = key
+
+            # state id of every (hunter, other hunter) pair
+            position_ids = self.state_encoder.encode_position_array(self._relative_locations)
+            pair_ids = (position_ids[:, np.newaxis] * self.state_encoder.nb_positions + position_ids).tolist()
+            self._state_ids = [ids[:hunter] + ids[hunter + 1:] for hunter, ids in enumerate(pair_ids)]
+
+        return self._relative_locations
+
+    def get_state_ids(self, hunter: int) -> [int]:
+        """
+        Get the ids of the current states of a hunter (see StateEncoder),
+        one per other hunter, in the order of the hunters.
+
+        :param hunter: The index of the hunter.
+
+        :return: The ids of the states made of the relative position of the
+            hunter and of each other hunter.
+        """
+        self.get_relative_locations()
+        return self._state_ids[hunter]
+
+    def compute_score(self) -> [float]:
+        """
+        Compute the score of the players.
+
+        :return: The score of each hunter.
+        """
+        is_caught = self.is_prey_caught(self.get_relative_locations())
+        return [reward if caught else penalty
+                for caught, reward, penalty in zip(is_caught.tolist(), self.rewards, self.penalties)]
+
+    def is_finished(self, scores: [float]) -> bool:
+        """
+        Check if an episode is finished, i.e. a hunter got its reward.
+
+        :param scores: The score of each hunter (see compute_score).
+
+        :return: True if the prey is caught.
+        """
+        return any(score == reward for score, reward in zip(scores, self.rewards))
+
+    def move_prey(self):
+        """
+        Move the prey, never on a cell occupied by a hunter (see
+        move_prey_between_hunters). A prey without any valid move stays
+        where it is.
+        """
+        move_prey_between_hunters(self.positions, self.prey_action_prob, self.dict_action_to_coord,
+                                  (self.x_max, self.y_max), self.rng)
+
+    def play_one_episode(self, actions: [int]) -> [float]:
+        """
+        Play one episode of the game.
+
+        :param actions: Action selected by each hunter (MOVE_*).
+
+        :return: The score of each hunter.
+        """
+        self.hunter_positions = (self.positions[1:] + self.action_to_coord[actions]) % self.field_size
+
+        self.move_prey()
+
+        return self.compute_score()
+
+
 #######################################################################################
 # scenario to test class
 #######################################################################################
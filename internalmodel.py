@@ -1,7 +1,10 @@
+import sys
+
 import numpy as np
 
 from agent import State
 from move import *
+from qtable import create_memmap
 
 
 class InternalModel:
@@ -9,15 +12,25 @@ class InternalModel:
     Class to handle the internal model of the other player's actions.
     """
 
-    def __init__(self, initial_theta: float):
+    state_encoder = None
+    _theta_episode = None
+    _theta = None
+
+    def __init__(self, initial_theta: float, state_encoder=None):
         """
         Initialize the internal model.
 
         :param initial_theta: The initial theta value.
+        :param state_encoder: The state encoder of the game, states are
+            then stored by id (optional).
         """
         self.model = {}
         self.init_value = 1 / NB_MOVES  # 0.2 for five possible moves
         self.initial_theta = initial_theta
+        self.state_encoder = state_encoder
+
+    def __len__(self):
+        return len(self.model)
 
     def get_actual_theta(self, episode: int) -> float:
         """
@@ -28,18 +41,23 @@ class InternalModel:
 
         :return: The actual value of theta for the specific episode
         """
-        return 0.2 * (self.initial_theta ** episode)
+        if episode != self._theta_episode:  # only computed once per episode
+            self._theta = 0.2 * (self.initial_theta ** episode)
+            self._theta_episode = episode
+        return self._theta
 
-    def get_dict_key(self, state: State, action: int) -> ((int, int), (int, int), int):
+    def get_dict_key(self, state: State, action: int) -> tuple:
         """
         Create the correct key to be use in the model dictionary.
 
         :param state: The state of the two hunters given by their
-             relative positions
+             relative positions (or its id).
         :param action: The number of the action used by the opponent.
 
         :return: The tuple containing the key components.
         """
+        if self.state_encoder is not None:
+            return self.state_encoder.encode(state), action
         return state.rel_position, state.other_rel_position, action
 
     def get_state_action_estimation(self, state: State, action: int) -> float:
@@ -74,16 +92,18 @@ class InternalModel:
         :param learning_episode: The number of the learning episode.
             Set to 1 by default.
         """
+        theta = self.get_actual_theta(learning_episode)
+
         for action in range(NB_MOVES):
             index = self.get_dict_key(state, action)
             old_estimation = self.get_state_action_estimation(state, action)
 
             if action == actual_action:
-                factor = self.get_actual_theta(learning_episode)
+                factor = theta
             else:
                 factor = 0
 
-            new_estimation = (1 - self.get_actual_theta(learning_episode)) * old_estimation + factor
+            new_estimation = (1 - theta) * old_estimation + factor
             self.model.update({index: new_estimation})
 
     def get_action_prob(self, state: State) -> [float]:
@@ -100,6 +120,390 @@ class InternalModel:
 
         return [self.get_state_action_estimation(state, action) for action in range(NB_MOVES)]
 
+    def get_action_prob_table(self) -> np.ndarray:
+        """
+        Copy the estimations of every state into an array without
+        creating missing entries (needs a state encoder).
+
+        :return: An array (state id, action) with the probability that the
+            other player chooses each action.
+        """
+        table = np.full((self.state_encoder.num_states, NB_MOVES), self.init_value)
+        for (state_id, action), estimation in self.model.items():
+            table[state_id, action] = estimation
+        return table
+
+    def get_action_prob_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Copy the estimations of some states into an array without creating
+        missing entries (needs a state encoder).
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action) with the probability that the
+            other player chooses each action.
+        """
+        rows = [[self.model.get((state_id, action), self.init_value) for action in range(NB_MOVES)]
+                for state_id in np.asarray(state_ids).tolist()]
+        return np.array(rows, dtype=float).reshape(len(rows), NB_MOVES)
+
+    def set_state_encoder(self, state_encoder):
+        """
+        Key the estimations by state id instead of relative positions (for
+        the models pickled before the states were encoded).
+
+        :param state_encoder: The state encoder of the game.
+        """
+        if self.state_encoder is None:
+            self.model = {(state_encoder.encode_positions(rel_position, other_rel_position), action): estimation
+                          for (rel_position, other_rel_position, action), estimation in self.model.items()}
+        self.state_encoder = state_encoder
+
+    def load_action_prob_table(self, table: np.ndarray):
+        """
+        Fill the model from an array of estimations (as returned by
+        get_action_prob_table), the states whose estimations all equal the
+        initial value are not stored.
+
+        :param table: An array (state id, action) of estimations.
+        """
+        self.model = {}
+        for state_id in np.flatnonzero(np.any(table != self.init_value, axis=1)):
+            for action in range(NB_MOVES):
+                self.model[(int(state_id), action)] = float(table[state_id, action])
+
+    def compact(self) -> int:
+        """
+        Remove the estimations holding the initial value (mostly created
+        by reads), they are read as the initial value anyway.
+
+        :return: The number of estimations removed.
+        """
+        model = {key: estimation for key, estimation in self.model.items() if estimation != self.init_value}
+        nb_removed = len(self.model) - len(model)
+        self.model = model
+        return nb_removed
+
+    def count_learned(self) -> int:
+        """
+        Count the estimations differing from the initial value, the same
+        quantity for every backend (see DictQTable.count_learned).
+
+        :return: The number of estimations.
+        """
+        return int(sum(estimation != self.init_value for estimation in self.model.values()))
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory used by the estimations (the dictionary, its
+        keys and its values).
+
+        :return: The number of bytes.
+        """
+        return sys.getsizeof(self.model) + sum(sys.getsizeof(key) + sys.getsizeof(estimation)
+                                               for key, estimation in self.model.items())
+
+
+class SparseInternalModel(InternalModel):
+    """
+    Internal model storing one row of estimations per state, keyed by
+    state id (or by relative positions when there is no state encoder).
+    Reading the estimations of a state which was never updated returns the
+    initial value without storing anything (see SparseQTable).
+    """
+
+    def __init__(self, initial_theta: float, state_encoder=None):
+        """
+        Initialize the internal model.
+
+        :param initial_theta: The initial theta value.
+        :param state_encoder: The state encoder of the game (optional).
+        """
+        super().__init__(initial_theta, state_encoder)
+        # row of the states not stored, shared and read-only
+        self.initial_row = np.full(NB_MOVES, self.init_value)
+        self.initial_row.flags.writeable = False
+
+    def __len__(self):
+        return len(self.model) * NB_MOVES
+
+    def get_state_key(self, state: State):
+        """
+        Create the key of a state.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: The id of the state, or its relative positions if there is no
+            state encoder.
+        """
+        if self.state_encoder is not None:
+            return self.state_encoder.encode(state)
+        return state.rel_position, state.other_rel_position
+
+    def get_state_action_estimation(self, state: State, action: int) -> float:
+        """
+        Get the estimation from the model given the state and the action
+        of the other player.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The number of the action used by the opponent.
+
+        :return: The action estimation.
+        """
+        return self.get_action_prob(state)[action]
+
+    def update_state_action_estimation(self, state: State, actual_action: int, learning_episode=1):
+        """
+        Update the estimations of the given state in place, the row of the
+        state is created at its first update.
+
+        :param state: The state of the two hunters (or its id).
+        :param actual_action: The number of the action used by the
+            opponent.
+        :param learning_episode: The number of the learning episode.
+            Set to 1 by default.
+        """
+        theta = self.get_actual_theta(learning_episode)
+
+        key = self.get_state_key(state)
+        estimations = self.model.get(key)
+        if estimations is None:
+            estimations = self.model[key] = self.initial_row.copy()
+        estimations *= 1 - theta
+        estimations[actual_action] += theta
+
+    def get_action_prob(self, state: State) -> np.ndarray:
+        """
+        Get the probabilities (as stored in the internal model) for
+        all possible actions in given the state.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: The row of the model with the probability, for each action,
+            that the other player chooses that action (read-only if the
+            state is not stored).
+        """
+        return self.model.get(self.get_state_key(state), self.initial_row)
+
+    def get_action_prob_table(self) -> np.ndarray:
+        """
+        Copy the estimations of every state into an array (needs a state
+        encoder).
+
+        :return: An array (state id, action) with the probability that the
+            other player chooses each action.
+        """
+        table = np.full((self.state_encoder.num_states, NB_MOVES), self.init_value)
+        for state_id, estimations in self.model.items():
+            table[state_id] = estimations
+        return table
+
+    def get_action_prob_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Copy the estimations of some states into an array (needs a state
+        encoder).
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action) with the probability that the
+            other player chooses each action.
+        """
+        rows = [self.model.get(state_id, self.initial_row) for state_id in np.asarray(state_ids).tolist()]
+        return np.array(rows, dtype=float).reshape(len(rows), NB_MOVES)
+
+    def load_action_prob_table(self, table: np.ndarray):
+        """
+        Fill the model from an array of estimations (as returned by
+        get_action_prob_table), the states whose estimations all equal the
+        initial value are not stored.
+
+        :param table: An array (state id, action) of estimations.
+        """
+        self.model = {int(state_id): table[state_id].astype(float)
+                      for state_id in np.flatnonzero(np.any(table != self.init_value, axis=1))}
+
+    def compact(self) -> int:
+        """
+        Remove the states whose estimations are all equal to the initial value.
+
+        :return: The number of states removed.
+        """
+        model = {key: estimations for key, estimations in self.model.items()
+                 if np.any(estimations != self.init_value)}
+        nb_removed = len(self.model) - len(model)
+        self.model = model
+        return nb_removed
+
+    def count_learned(self) -> int:
+        """
+        Count the estimations differing from the initial value.
+
+        :return: The number of estimations.
+        """
+        return sum(int(np.count_nonzero(estimations != self.init_value)) for estimations in self.model.values())
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory used by the estimations (the dictionary, its
+        keys and the rows of the states).
+
+        :return: The number of bytes.
+        """
+        return sys.getsizeof(self.model) + sum(sys.getsizeof(key) + sys.getsizeof(estimations)
+                                               for key, estimations in self.model.items())
+
+
+class ArrayInternalModel(InternalModel):
+    """
+    Internal model stored in a (number of states, NB_MOVES) array of
+    probabilities indexed by state id.
+    """
+
+    def __init__(self, initial_theta: float, state_encoder):
+        """
+        Initialize the internal model.
+
+        :param initial_theta: The initial theta value.
+        :param state_encoder: The state encoder of the game.
+        """
+        super().__init__(initial_theta, state_encoder)
+        self.model = np.full((state_encoder.num_states, NB_MOVES), self.init_value)
+
+    def __len__(self):
+        return self.model.size
+
+    def compact(self) -> int:
+        """
+        Nothing to remove, the array is preallocated.
+
+        :return: 0.
+        """
+        return 0
+
+    def count_learned(self) -> int:
+        """
+        Count the estimations differing from the initial value.
+
+        :return: The number of estimations.
+        """
+        return int(np.count_nonzero(self.model != self.init_value))
+
+    def memory_usage(self) -> int:
+        """
+        Get the memory used by the estimations (on disk for
+        MemmapInternalModel).
+
+        :return: The number of bytes.
+        """
+        return self.model.nbytes
+
+    def get_state_action_estimation(self, state: State, action: int) -> float:
+        """
+        Get the estimation from the model given the state and the action
+        of the other player.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The number of the action used by the opponent.
+
+        :return: The action estimation.
+        """
+        return self.model[self.state_encoder.encode(state), action]
+
+    def update_state_action_estimation(self, state: State, actual_action: int, learning_episode=1):
+        """
+        Update the estimations of the given state in place.
+
+        :param state: The state of the two hunters (or its id).
+        :param actual_action: The number of the action used by the
+            opponent.
+        :param learning_episode: The number of the learning episode.
+            Set to 1 by default.
+        """
+        theta = self.get_actual_theta(learning_episode)
+
+        estimations = self.model[self.state_encoder.encode(state)]
+        estimations *= 1 - theta
+        estimations[actual_action] += theta
+
+    def get_action_prob(self, state: State) -> np.ndarray:
+        """
+        Get the probabilities (as stored in the internal model) for
+        all possible actions in given the state.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: A view on the row of the model with the probability,
+            for each action, that the other player chooses that action.
+        """
+        return self.model[self.state_encoder.encode(state)]
+
+    def get_action_prob_table(self) -> np.ndarray:
+        """
+        Copy the estimations of every state into an array.
+
+        :return: An array (state id, action) with the probability that the
+            other player chooses each action.
+        """
+        return self.model.copy()
+
+    def get_action_prob_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Copy the estimations of some states into an array.
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action) with the probability that the
+            other player chooses each action.
+        """
+        return self.model[state_ids]
+
+    def load_action_prob_table(self, table: np.ndarray):
+        """
+        Fill the model from an array of estimations.
+
+        :param table: An array (state id, action) of estimations.
+        """
+        self.model[:] = table
+
+
+class MemmapInternalModel(ArrayInternalModel):
+    """
+    Internal model stored like ArrayInternalModel, in a memory-mapped
+    temporary file instead of memory (see MemmapQTable).
+    """
+
+    def __init__(self, initial_theta: float, state_encoder):
+        """
+        Initialize the internal model.
+
+        :param initial_theta: The initial theta value.
+        :param state_encoder: The state encoder of the game.
+        """
+        InternalModel.__init__(self, initial_theta, state_encoder)
+        self.model = create_memmap((state_encoder.num_states, NB_MOVES), self.init_value)
+
+    def __getstate__(self) -> dict:
+        """
+        Get the attributes to pickle, the estimations are pickled as a
+        regular array since the temporary file does not outlive the process.
+
+        :return: The attributes of the model.
+        """
+        attributes = self.__dict__.copy()
+        attributes['model'] = np.asarray(self.model)
+        return attributes
+
+    def __setstate__(self, attributes: dict):
+        """
+        Restore a pickled model into a new temporary file.
+
+        :param attributes: The pickled attributes of the model.
+        """
+        model = attributes.pop('model')
+        self.__dict__.update(attributes)
+        self.model = create_memmap(model.shape)
+        self.model[:] = model
+
 
 class InternalModelRandom(InternalModel):
     """
@@ -126,25 +530,163 @@ class InternalModelRandom(InternalModel):
         """
         pass
 
+    def get_action_prob_table(self) -> np.ndarray:
+        """
+        Get the estimations of every state.
+
+        :return: An array (state id, action) filled with 1 / NB_MOVES.
+        """
+        return np.full((self.state_encoder.num_states, NB_MOVES), self.init_value)
+
 
 class InternalSelfModel(InternalModelRandom):
     """
     Class  with self-model based action estimation. Action estimation
-        is based on self-policy instead of the internal model function
+        is based on self-policy instead of the internal model function.
+        The policy of a state is computed once and cached until the
+        Q-values of that state or the temperature of the agent change.
     """
 
-    def __init__(self, initial_theta, agent):
-        super().__init__(initial_theta)
+    def __init__(self, initial_theta, agent, state_encoder=None):
+        super().__init__(initial_theta, state_encoder)
         self.agent = agent
+        self.policy_cache = {}
+        self.policy_temperature = None
+
+    def __len__(self):
+        return len(self.policy_cache)
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory used by the policy cache (the model itself
+        stores nothing).
+
+        :return: The number of bytes.
+        """
+        return sys.getsizeof(self.policy_cache) + sum(sys.getsizeof(key) + sys.getsizeof(probas)
+                                                      for key, probas in self.policy_cache.items())
+
+    def __setstate__(self, attributes: dict):
+        """
+        Restore a pickled self-model, with an empty policy cache.
+
+        :param attributes: The pickled attributes of the model.
+        """
+        self.__dict__.update(attributes)
+        self.policy_cache = {}
+        self.policy_temperature = None
+
+    def set_state_encoder(self, state_encoder):
+        """
+        Key the policy cache by state id instead of relative positions (for
+        the models pickled before the states were encoded).
+
+        :param state_encoder: The state encoder of the game.
+        """
+        super().set_state_encoder(state_encoder)
+        self.policy_cache = {}
+
+    def get_state_key(self, state: State):
+        """
+        Create the key of a state in the policy cache.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: The id of the state, or its relative positions if there is no
+            state encoder.
+        """
+        if self.state_encoder is not None:
+            return self.state_encoder.encode(state)
+        return state.rel_position, state.other_rel_position
+
+    def get_action_prob(self, state: State) -> np.ndarray:
+        """
+        Get the probabilities for all possible actions of the other
+        player, estimated with the agent's own policy in the state as
+        seen by the other player.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: An array with the probability, for each action, that the
+            other player chooses that action.
+        """
+        if self.agent.temperature != self.policy_temperature:
+            self.policy_cache.clear()
+            self.policy_temperature = self.agent.temperature
+
+        if self.state_encoder is not None:
+            others_state = self.state_encoder.swap(state)
+        else:
+            others_state = state.swapped()
+
+        key = self.get_state_key(others_state)
+        probas = self.policy_cache.get(key)
+        if probas is None:
+            # softmax over the first action for each second action, the probability
+            # of an action is taken where both actions are equal
+            q_values = self.agent.q_table.get_action_pairs(others_state)
+            exponents = np.exp((q_values - np.max(q_values, axis=0)) / self.agent.temperature)
+            probas = np.diagonal(exponents) / np.sum(exponents, axis=0)
+            self.policy_cache[key] = probas
+
+        return probas
 
     def get_state_action_estimation(self, state: State, action: int) -> float:
-        others_state = State(state.other_rel_position, state.rel_position)
+        return self.get_action_prob(state)[action]
 
-        probas = [np.exp(self.agent.get_q_value_with_random_state(others_state, other_action, action)
-                         / self.agent.temperature) for other_action in range(NB_MOVES)]
-        tot = sum(probas)
+    def get_action_prob_table(self) -> np.ndarray:
+        """
+        Compute the estimations of every state from the current Q-values,
+        without using or filling the policy cache.
+
+        :return: An array (state id, action) with the probability that the
+            other player chooses each action.
+        """
+        return self.get_action_prob_rows(np.arange(self.state_encoder.num_states))
 
-        return probas[action] / tot
+    def get_action_prob_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Compute the estimations of some states from the current Q-values,
+        without using or filling the policy cache.
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action) with the probability that the
+            other player chooses each action.
+        """
+        q_values = self.agent.q_table.get_rows(self.state_encoder.swap_array(np.asarray(state_ids)))[:, :, :NB_MOVES]
+        exponents = np.exp((q_values - np.max(q_values, axis=1, keepdims=True)) / self.agent.temperature)
+        return np.diagonal(exponents, axis1=1, axis2=2) / np.sum(exponents, axis=1)
+
+    def invalidate(self, state: State):
+        """
+        Forget the cached policy of a state, to be called when the
+        Q-values of that state change.
+
+        :param state: The state whose Q-values changed (or its id).
+        """
+        self.policy_cache.pop(self.get_state_key(state), None)
+
+
+def create_internal_model(backend: str, initial_theta: float, state_encoder=None) -> InternalModel:
+    """
+    Create the internal model of an agent, stored like its Q-table.
+
+    :param backend: The storage used for the Q-table ('dict', 'sparse',
+        'array' or 'memmap').
+    :param initial_theta: The initial theta value.
+    :param state_encoder: The state encoder of the game (mandatory for
+        the 'array' and 'memmap' backends).
+
+    :return: The internal model.
+    """
+    if backend == 'sparse':
+        return SparseInternalModel(initial_theta, state_encoder)
+    if backend == 'array':
+        return ArrayInternalModel(initial_theta, state_encoder)
+    if backend == 'memmap':
+        return MemmapInternalModel(initial_theta, state_encoder)
+    return InternalModel(initial_theta, state_encoder)
 
 
 def test():
@@ -0,0 +1,311 @@
+from functools import lru_cache
+
+import numpy as np
+
+from centralized_agent import Agent_Interface, Centralized_Agent
+from internalmodel import ArrayInternalModel, InternalModelRandom
+from move import NB_MOVES
+from qtable import ArrayQTable
+from qwpae_agent import QwProposedAEAgent, QwRandomAEAgent
+
+ACTIONS = np.arange(NB_MOVES)
+
+
+@lru_cache(maxsize=None)
+def get_capture_tables(x_max: int, y_max: int, is_prey_caught) -> (list, list):
+    """
+    Evaluate the capture function once for every state of a playing field.
+
+    :param x_max: Width of the playing field.
+    :param y_max: Height of the playing field.
+    :param is_prey_caught: The capture function of the game (it must accept
+        arrays, see game.py).
+
+    :return: For every state id of hunter 1, whether hunter 1 and whether
+        hunter 2 caught the prey.
+    """
+    x_offset, y_offset = x_max // 2, y_max // 2
+    y_size = 2 * y_offset + 1
+    nb_positions = (2 * x_offset + 1) * y_size
+
+    state_ids = np.arange(nb_positions * nb_positions)
+    position_ids_hunter_1, position_ids_hunter_2 = np.divmod(state_ids, nb_positions)
+    x1, y1 = np.divmod(position_ids_hunter_1, y_size)
+    x2, y2 = np.divmod(position_ids_hunter_2, y_size)
+
+    is_caught_hunter_1, is_caught_hunter_2 = is_prey_caught(x1 - x_offset, y1 - y_offset, x2 - x_offset, y2 - y_offset)
+    return np.broadcast_to(is_caught_hunter_1, state_ids.shape).tolist(), \
+        np.broadcast_to(is_caught_hunter_2, state_ids.shape).tolist()
+
+
+def boltzmann_sample(values: np.ndarray, temperature: float, rng) -> int:
+    """
+    Draw an index from the Boltzmann distribution of some values. Same
+    operations as sample_index(boltzmann_probabilities(values, temperature)),
+    on a single distribution, so the same index is drawn.
+
+    :param values: The values of the possible choices.
+    :param temperature: The temperature (Boltzmann tau).
+    :param rng: The random stream of the agent.
+
+    :return: The index drawn.
+    """
+    exponents = np.exp((values - values.max()) / temperature)
+    cumulative = (exponents / exponents.sum()).cumsum()
+    return int(cumulative.searchsorted(rng.random() * cumulative[-1], side='right'))
+
+
+def check_fast_kernel(hunters: tuple):
+    """
+    Check that the hunters can be trained by the fast kernel: QwPAE or
+    QwRAE hunters, or the centralized learner, with 'array' or 'memmap'
+    Q-tables (and internal models) and a theta.
+
+    :param hunters: A tuple with the 2 hunters.
+
+    :raise ValueError: If the hunters are not supported.
+    """
+    agents = [hunters[0].CA] if isinstance(hunters[0], Agent_Interface) else hunters
+    for agent in agents:
+        if type(agent) not in (QwProposedAEAgent, QwRandomAEAgent, Centralized_Agent):
+            raise ValueError(f"the fast kernel does not support {type(agent).__name__}")
+        if not isinstance(agent.q_table, ArrayQTable) or agent.theta is None:
+            raise ValueError("the fast kernel needs array-backed Q-tables and a theta")
+        if type(agent) is QwProposedAEAgent and not isinstance(agent.internal_model, ArrayInternalModel):
+            raise ValueError("the fast kernel needs array-backed internal models")
+
+
+class KernelGame:
+    """
+    Step a game with plain integers instead of arrays and state objects.
+    The positions are written back to the game at every step, so that the
+    prey is moved by Game.move_prey (and draws from the random stream of
+    the game as in the normal path).
+    """
+
+    def __init__(self, game):
+        """
+        Start a new episode of the game (its positions are reset).
+
+        :param game: The game played.
+        """
+        self.game = game
+        self.moves = [game.dict_action_to_coord[action] for action in range(NB_MOVES)]
+        self.is_caught_hunter_1, self.is_caught_hunter_2 = get_capture_tables(game.x_max, game.y_max,
+                                                                              game.is_prey_caught)
+
+        # position id of every difference of coordinates between the prey and a hunter
+        encoder = game.state_encoder
+        x_ids = (game.x_table + encoder.x_offset) * encoder.y_size
+        y_ids = game.y_table + encoder.y_offset
+        self.position_ids = np.add.outer(x_ids, y_ids).tolist()
+        self.nb_positions = encoder.nb_positions
+
+        game.reset_positions()
+        _, self.hunter_1_position, self.hunter_2_position = game.positions.tolist()
+
+    def get_state_ids(self) -> (int, int):
+        """
+        Get the state ids of both hunters from the positions of the game.
+
+        :return: The state ids of hunter 1 and of hunter 2.
+        """
+        game = self.game
+        (x, y), (x1, y1), (x2, y2) = game.positions.tolist()
+        position_id_hunter_1 = self.position_ids[x - x1 + game.x_max - 1][y - y1 + game.y_max - 1]
+        position_id_hunter_2 = self.position_ids[x - x2 + game.x_max - 1][y - y2 + game.y_max - 1]
+        return position_id_hunter_1 * self.nb_positions + position_id_hunter_2, \
+            position_id_hunter_2 * self.nb_positions + position_id_hunter_1
+
+    def step(self, hunter_1_action: int, hunter_2_action: int) -> (int, int, float, float):
+        """
+        Play one time step (see Game.play_one_episode).
+
+        :param hunter_1_action: Action selected by hunter 1.
+        :param hunter_2_action: Action selected by hunter 2.
+
+        :return: The new state ids and the scores of hunter 1 and hunter 2.
+        """
+        game = self.game
+        for position, action in ((self.hunter_1_position, hunter_1_action),
+                                 (self.hunter_2_position, hunter_2_action)):
+            dx, dy = self.moves[action]
+            position[0] = (position[0] + dx) % game.x_max
+            position[1] = (position[1] + dy) % game.y_max
+        game.positions[1:] = self.hunter_1_position, self.hunter_2_position
+        game.move_prey()
+
+        state_id_hunter_1, state_id_hunter_2 = self.get_state_ids()
+        score_hunter_1 = game.reward_hunter_1 if self.is_caught_hunter_1[state_id_hunter_1] else game.penalty_hunter_1
+        score_hunter_2 = game.reward_hunter_2 if self.is_caught_hunter_2[state_id_hunter_1] else game.penalty_hunter_2
+        return state_id_hunter_1, state_id_hunter_2, score_hunter_1, score_hunter_2
+
+
+class KernelHunter:
+    """
+    The arrays and parameters of a QwPAE or QwRAE hunter, bound once per
+    episode. Every operation is done as in the agent classes so that the
+    results are the same as in the normal path.
+    """
+
+    def __init__(self, agent, episode: int):
+        """
+        Bind the hunter for one learning episode.
+
+        :param agent: The hunter.
+        :param episode: The current episode of the game.
+        """
+        self.agent = agent
+        self.q_values = agent.q_table.values
+        self.learning_rate = agent.learning_rate
+        self.discount_rate = agent.discount_rate
+        self.rng = agent.rng
+        self.temperature = agent.temperature
+        self.state = agent.state_encoder.encode(agent.state)
+
+        internal_model = agent.internal_model
+        self.theta = internal_model.get_actual_theta(episode)
+        self.is_random = isinstance(internal_model, InternalModelRandom)
+        if self.is_random:
+            self.model = np.full((1, NB_MOVES), internal_model.init_value)
+        else:
+            self.model = internal_model.model
+
+    def choose_next_action(self) -> int:
+        """
+        Choose the next action based on the current state (see
+        QwProposedAEAgent.expected_values).
+
+        :return: The action chosen (MOVE_*).
+        """
+        moves_probability = self.model[0 if self.is_random else self.state]
+        expected_values = self.q_values[self.state, :, :NB_MOVES] @ moves_probability
+        return boltzmann_sample(expected_values, self.temperature, self.rng)
+
+    def max_EV_next(self, new_state: int) -> float:
+        """
+        Find the maximal predicted reward in the new state (see
+        QwProposedAEAgent.predict_reward and QwRandomAEAgent.predict_reward).
+
+        :param new_state: The new state id.
+
+        :return: The maximal predicted reward between all the actions.
+        """
+        if self.is_random:
+            other_actions = [self.rng.randint(NB_MOVES) for _ in range(NB_MOVES)]
+            return self.q_values[new_state, ACTIONS, other_actions].max()
+
+        moves_probability = self.model[new_state]
+        most_likely = moves_probability == moves_probability.max()
+        return self.q_values[new_state, :, :NB_MOVES][:, most_likely].max()
+
+    def update(self, new_state: int, action: int, reward: float, other_action: int):
+        """
+        Update the internal model and the Q-table (see QwProposedAEAgent.update).
+
+        :param new_state: The new state id.
+        :param action: The action done by the hunter.
+        :param reward: The reward obtained.
+        :param other_action: The other hunter action.
+        """
+        self.temperature = self.theta
+        if not self.is_random:
+            estimations = self.model[self.state]
+            estimations *= 1 - self.theta
+            estimations[other_action] += self.theta
+
+        q_value = self.q_values[self.state, action, other_action]
+        q_value = (1 - self.learning_rate) * q_value \
+            + self.learning_rate * (reward + self.discount_rate * self.max_EV_next(new_state))
+        self.q_values[self.state, action, other_action] = q_value
+
+        self.state = new_state
+
+    def finish(self):
+        """
+        Store the temperature and the state back into the hunter, and forget
+        its cached maximal expected values (the arrays were changed directly).
+        """
+        self.agent.temperature = self.temperature
+        self.agent.state = self.state
+        self.agent.max_EV_cache.clear()
+
+
+def do_fast_learning_episode(game, hunters: tuple, episode: int):
+    """
+    Play one learning episode as do_learning_episode, on the arrays of the
+    hunters directly (see check_fast_kernel for the supported hunters).
+    The random numbers are drawn from the same streams in the same order,
+    so the hunters learn exactly as in the normal path.
+
+    :param game: The game to be played.
+    :param hunters: A tuple with the 2 hunters.
+    :param episode: The current episode of the game.
+
+    :return: The number of time steps of the episode.
+    """
+    if isinstance(hunters[0], Agent_Interface):
+        return do_fast_centralized_learning_episode(game, hunters[0].CA, episode)
+
+    kernel_game = KernelGame(game)
+    hunter_1, hunter_2 = KernelHunter(hunters[0], episode), KernelHunter(hunters[1], episode)
+
+    score_hunter_1 = game.penalty_hunter_1
+    score_hunter_2 = game.penalty_hunter_2
+    counter = 0
+    while score_hunter_1 != game.reward_hunter_1 and score_hunter_2 != game.reward_hunter_2:
+        action_1, action_2 = hunter_1.choose_next_action(), hunter_2.choose_next_action()
+
+        state_id_hunter_1, state_id_hunter_2, score_hunter_1, score_hunter_2 = kernel_game.step(action_1, action_2)
+
+        hunter_1.update(state_id_hunter_1, action_1, score_hunter_1, action_2)
+        hunter_2.update(state_id_hunter_2, action_2, score_hunter_2, action_1)
+        counter += 1
+
+    hunter_1.finish()
+    hunter_2.finish()
+    return counter
+
+
+def do_fast_centralized_learning_episode(game, agent: Centralized_Agent, episode: int):
+    """
+    Play one learning episode of the centralized learner (see
+    do_fast_learning_episode and Centralized_Agent.update).
+
+    :param game: The game to be played.
+    :param agent: The centralized agent.
+    :param episode: The current episode of the game.
+
+    :return: The number of time steps of the episode.
+    """
+    kernel_game = KernelGame(game)
+    q_values = agent.q_table.values
+    theta = agent.get_actual_theta(episode)
+    temperature = agent.temperature
+    state = agent.state_encoder.encode(agent.state)
+    action_choice = agent.action_choice
+
+    score_hunter_1 = game.penalty_hunter_1
+    score_hunter_2 = game.penalty_hunter_2
+    counter = 0
+    while score_hunter_1 != game.reward_hunter_1 and score_hunter_2 != game.reward_hunter_2:
+        action_choice = divmod(boltzmann_sample(q_values[state, :, :NB_MOVES].ravel(), temperature, agent.rng),
+                               NB_MOVES)
+        action_1, action_2 = action_choice
+
+        new_state, _, score_hunter_1, score_hunter_2 = kernel_game.step(action_1, action_2)
+
+        temperature = theta
+        q_value = q_values[state, action_1, action_2]
+        q_value = (1 - agent.learning_rate) * q_value \
+            + agent.learning_rate * (score_hunter_1 + agent.discount_rate * q_values[new_state, :, :NB_MOVES].max())
+        q_values[state, action_1, action_2] = q_value
+
+        state = new_state
+        counter += 1
+
+    agent.temperature = temperature
+    agent.state = state
+    agent.action_choice = action_choice
+    agent.max_EV_cache.clear()
+    return counter
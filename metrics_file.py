@@ -0,0 +1,270 @@
+import os
+
+import numpy as np
+
+STATISTICS = ('average', 'std', 'max', 'min', 'mae')
+COLUMNS = ('episode',) + STATISTICS + ('time_steps',)
+
+
+def compute_statistics(time_steps: np.ndarray) -> dict:
+    """
+    Compute the statistics of the time steps of one evaluation batch.
+
+    :param time_steps: The number of time steps of each evaluation episode.
+
+    :return: The average, standard deviation, maximum, minimum and mean
+        absolute error of the time steps.
+    """
+    average = np.average(time_steps)
+    return {
+        'average': average,
+        'std': np.std(time_steps),
+        'max': np.max(time_steps),
+        'min': np.min(time_steps),
+        'mae': np.average(np.abs(time_steps - average)),
+    }
+
+
+def format_row(episode: int, statistics: dict, time_steps=()) -> str:
+    """
+    Format one row of a metrics file.
+
+    :param episode: The training episode the evaluation was done at.
+    :param statistics: The statistics of the evaluation (see compute_statistics).
+    :param time_steps: The number of time steps of each evaluation episode.
+
+    :return: The row, ending with a new line.
+    """
+    values = [str(episode)] + [repr(float(statistics[name])) for name in STATISTICS]
+    values.append(' '.join(str(int(steps)) for steps in time_steps))
+    return ';'.join(values) + '\n'
+
+
+def parse_row(line: str) -> (int, dict, list):
+    """
+    Parse one row of a metrics file.
+
+    :param line: The row.
+
+    :return: The episode, the statistics and the time steps of the row.
+
+    :raise ValueError: If the row is incomplete.
+    """
+    if not line.endswith('\n'):
+        raise ValueError("incomplete row")
+    values = line.rstrip('\n').split(';')
+    if len(values) != len(COLUMNS):
+        raise ValueError("incomplete row")
+    statistics = {name: float(value) for name, value in zip(STATISTICS, values[1:-1])}
+    return int(values[0]), statistics, [int(steps) for steps in values[-1].split()]
+
+
+class MetricsWriter:
+    """
+    Write the evaluation results of a simulation into a CSV file as soon
+    as each evaluation batch is finished: one row per batch with the
+    statistics and the time steps of every evaluation episode. Every row
+    is flushed, so a run can be monitored while it is running and the
+    rows of an interrupted run are kept (see load_metrics_file).
+    """
+
+    def __init__(self, filename: str, name: str, total_train_episodes: int, train_episodes_batch: int,
+                 first_episode=0):
+        """
+        Open the file. A new file is started for a new simulation. When a
+        simulation is resumed, the rows of the episodes played before
+        first_episode are kept and the ones played after it (written
+        after the checkpoint) are dropped, as they will be played again.
+
+        :param filename: The name of the file (.csv).
+        :param name: The name of the hunter configuration.
+        :param total_train_episodes: The total amount of training episodes.
+        :param train_episodes_batch: Number of training episodes between
+            two evaluations.
+        :param first_episode: The first training episode of the run.
+        """
+        rows = []
+        if first_episode > 0 and os.path.exists(filename):
+            rows = [row for row in _read_rows(filename) if parse_row(row)[0] < first_episode]
+
+        # the file is replaced (not truncated), so that the readers see it was started again
+        temporary_filename = f"{filename}.tmp"
+        with open(temporary_filename, 'w') as metrics_file:
+            metrics_file.write(f"# {name};{total_train_episodes};{train_episodes_batch}\n")
+            metrics_file.write(';'.join(COLUMNS) + '\n')
+            metrics_file.writelines(rows)
+        os.replace(temporary_filename, filename)
+        self.file = open(filename, 'a')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def write(self, episode: int, statistics: dict, time_steps=()):
+        """
+        Append the results of one evaluation batch and flush them to disk.
+
+        :param episode: The training episode the evaluation was done at.
+        :param statistics: The statistics of the evaluation (see compute_statistics).
+        :param time_steps: The number of time steps of each evaluation episode.
+        """
+        self.file.write(format_row(episode, statistics, time_steps))
+        self.file.flush()
+
+
+def _read_rows(filename: str) -> [str]:
+    """
+    Read the complete rows of a metrics file (the last row of a file being
+    written may be incomplete).
+
+    :param filename: The name of the file.
+
+    :return: The rows, without the header.
+    """
+    rows = []
+    with open(filename) as metrics_file:
+        for line in metrics_file.readlines()[2:]:
+            try:
+                parse_row(line)
+            except ValueError:
+                break
+            rows.append(line)
+    return rows
+
+
+def parse_header(line: str) -> (str, int, int):
+    """
+    Parse the first line of a metrics file.
+
+    :param line: The line.
+
+    :return: The name of the hunter configuration, the total amount of
+        training episodes and the number of training episodes between two
+        evaluations.
+    """
+    name, total_train_episodes, train_episodes_batch = line[2:].rstrip('\n').rsplit(';', 2)
+    return name, int(total_train_episodes), int(train_episodes_batch)
+
+
+class MetricsReader:
+    """
+    Read the rows of a metrics file as they are appended by a running
+    simulation: every call to read_new_rows only reads what was written
+    since the previous one.
+    """
+
+    def __init__(self, filename: str):
+        """
+        :param filename: The name of the file (it may not exist yet).
+        """
+        self.filename = filename
+        self.file_id = None  # inode of the file read, it changes when a simulation starts the file again
+        self.offset = 0  # position of the first byte not read yet
+        self.header = None
+
+    def read_new_rows(self) -> [(int, dict, list)]:
+        """
+        Read the complete rows written since the last call (an incomplete
+        last row is read at the next call, once it is complete).
+
+        :return: The episode, the statistics and the time steps of every new row.
+        """
+        try:
+            metrics_file = open(self.filename, 'rb')
+        except FileNotFoundError:
+            return []
+        with metrics_file:
+            file_id = os.fstat(metrics_file.fileno()).st_ino
+            if file_id != self.file_id:
+                self.file_id = file_id
+                self.offset = 0
+                self.header = None
+            metrics_file.seek(self.offset)
+            data = metrics_file.read()
+
+        # only the complete lines are read
+        data = data[:data.rfind(b'\n') + 1]
+        lines = data.decode().splitlines(keepends=True)
+        if self.header is None:
+            if len(lines) < 2:
+                return []
+            self.header = parse_header(lines[0])
+            lines = lines[2:]
+        self.offset += len(data)
+        return [parse_row(line) for line in lines]
+
+
+def is_metrics_file(filename: str) -> bool:
+    """
+    Check if a CSV file is a metrics file, older CSV files only contain
+    the average time steps.
+
+    :param filename: The name of the file.
+
+    :return: True if it is a metrics file.
+    """
+    with open(filename) as metrics_file:
+        metrics_file.readline()
+        return metrics_file.readline().startswith(COLUMNS[0] + ';')
+
+
+def load_metrics_file(filename: str) -> dict:
+    """
+    Load a metrics file, which may still be written or come from an
+    interrupted run: only its complete rows are read.
+
+    :param filename: The name of the file.
+
+    :return: The name of the hunter configuration, the total amount of
+        training episodes, the number of training episodes between two
+        evaluations, the episodes of the evaluations, an array per
+        statistic and the list of time steps of every evaluation.
+    """
+    with open(filename) as metrics_file:
+        name, total_train_episodes, train_episodes_batch = parse_header(metrics_file.readline())
+
+    episodes, time_steps = [], []
+    statistics = {name: [] for name in STATISTICS}
+    for row in _read_rows(filename):
+        episode, row_statistics, row_time_steps = parse_row(row)
+        episodes.append(episode)
+        time_steps.append(row_time_steps)
+        for statistic, value in row_statistics.items():
+            statistics[statistic].append(value)
+
+    return {
+        'name': name,
+        'total_training_episodes': total_train_episodes,
+        'train_episodes_batch': train_episodes_batch,
+        'episodes': np.array(episodes, dtype=int),
+        **{statistic: np.array(values) for statistic, values in statistics.items()},
+        'time_steps': time_steps,
+    }
+
+
+def save_metrics_file(filename: str, name: str, total_train_episodes: int, train_episodes_batch: int,
+                      statistics: dict):
+    """
+    Write the statistics of a whole simulation into a metrics file at once
+    (the time steps of the evaluation episodes are not known anymore).
+
+    :param filename: The name of the file (.csv).
+    :param name: The name of the hunter configuration.
+    :param total_train_episodes: The total amount of training episodes.
+    :param train_episodes_batch: Number of training episodes between two
+        evaluations.
+    :param statistics: An array per statistic, with one value per evaluation
+        (statistics without values are written as nan). A file without rows
+        is written if there is no average.
+    """
+    nb_evaluations = len(statistics['average']) if statistics.get('average') is not None else 0
+    with MetricsWriter(filename, name, total_train_episodes, train_episodes_batch) as writer:
+        for index in range(nb_evaluations):
+            writer.write(index * train_episodes_batch,
+                         {statistic: statistics[statistic][index] if statistics.get(statistic) is not None
+                          else np.nan for statistic in STATISTICS})
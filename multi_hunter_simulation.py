@@ -0,0 +1,133 @@
+from factored_agent import FactoredAgent
+from game import MultiHunterGame
+from simulation import simulation
+
+
+class MultiHunterConfig:
+    """
+    Contain the configuration of the hunters playing a game with any
+    number of hunters (see MultiHunterGame).
+    """
+
+    def __init__(self, name, game, agent_type=FactoredAgent, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0,
+                 theta=0.998849, backend='dict'):
+        """initialize the hunter configuration
+
+        :param name: Name of the agent type, will be used as label for the plot.
+        :param game: The game that will be played.
+        :param agent_type: The agent class to be used to initialize the agents
+            (see FactoredAgent).
+        :param alpha: Alpha value used by agents. Defaults to 0.3.
+        :param gamma: Gamma value used by agents. Defaults to 0.9.
+        :param tau: Temperature used. Defaults to 0.998849.
+        :param initial_q: The initial Q-value in the Q-tables. Defaults to 0.0.
+        :param theta: Used as initial theta for the internal models.
+        :param backend: The storage used for the Q-tables ('dict', 'sparse',
+            'array' or 'memmap').
+        """
+        self.name = name
+        self.game = game
+        self.hunters = [agent_type(alpha, gamma, tau, game.get_state_ids(hunter), initial_q, theta,
+                                   backend, game.state_encoder, game.rng.spawn())
+                        for hunter in range(game.nb_hunters)]
+        self.average_time_steps = None
+        self.std_time_steps = None
+        self.max_time_steps = None
+        self.min_time_steps = None
+        self.mae_time_Steps = None
+        self.converged_episode = None
+        self.total_training_episodes = 0
+
+
+def do_multi_hunter_learning_episode(game: MultiHunterGame, hunters: list, episode: int) -> int:
+    """
+    Play one learning episode (i.e. the hunters parameters
+    get updated).
+
+    :param game: The game to be played.
+    :param hunters: The hunters, in the order of the game.
+    :param episode: The current episode of the game.
+
+    :return: The number of time steps of the episode.
+    """
+    game.reset_positions()
+
+    counter = 0
+    scores = game.penalties
+    while not game.is_finished(scores):
+        actions = [hunter.choose_next_action() for hunter in hunters]
+
+        scores = game.play_one_episode(actions)
+
+        for index, hunter in enumerate(hunters):
+            hunter.update(game.get_state_ids(index), actions[index], scores[index],
+                          actions[:index] + actions[index + 1:], episode)
+
+        counter += 1
+
+    return counter
+
+
+def do_multi_hunter_evaluation_episode(game: MultiHunterGame, hunters: list) -> int:
+    """
+    Play one evaluation episode (not hunters' parameters update).
+
+    :param game: The game played
+    :param hunters: The hunters, in the order of the game.
+
+    :return: The number of time steps before hunting successfully
+        the prey.
+    """
+    game.reset_positions()
+
+    counter = 0
+    scores = game.penalties
+    while not game.is_finished(scores):
+        actions = [hunter.choose_next_action() for hunter in hunters]
+        scores = game.play_one_episode(actions)
+
+        for index, hunter in enumerate(hunters):
+            hunter.set_state(game.get_state_ids(index))
+
+        counter += 1
+
+    return counter
+
+
+def multi_hunter_simulation(game: MultiHunterGame, hunter_config: MultiHunterConfig, train_episodes_batch: int,
+                            eval_episodes: int, total_train_episodes: int, verbose=True, checkpoint_file=None,
+                            checkpoint_interval=None, profiler=None, metrics_file=None, evaluation_budget=None,
+                            convergence=None):
+    """
+    Launch the complete sim (i.e. training and estimation) for a game with
+    any number of hunters: simulation() playing the episodes with
+    do_multi_hunter_learning_episode and do_multi_hunter_evaluation_episode.
+    The result is stored into the hunter configuration.
+
+    :param game: The game played.
+    :param hunter_config: The hunter configuration object containing the hunters.
+    :param train_episodes_batch: Number of consecutive training episodes to be
+        played before evaluation.
+    :param eval_episodes: number of evaluation episodes to be played between
+        learning.
+    :param total_train_episodes: the total amount of training episodes.
+    :param verbose: Print the progress and the evaluation results.
+    :param checkpoint_file: File where the progress of the simulation is saved
+        (see resume_simulation). No checkpoint is taken if None.
+    :param checkpoint_interval: Number of training episodes between two
+        checkpoints. Defaults to train_episodes_batch.
+    :param profiler: Profiler recording the time spent in each phase and the
+        size of the tables (see profiler.py). No instrumentation if None.
+    :param metrics_file: CSV file where the results of every evaluation are
+        written as soon as it is finished (see metrics_file.py).
+    :param evaluation_budget: Adaptive number of evaluation episodes (see
+        EvaluationBudget), eval_episodes being the maximum.
+    :param convergence: Stop the training once the learning curve has
+        converged (see ConvergenceCriterion and simulation()).
+    """
+    simulation(game, hunter_config, train_episodes_batch, eval_episodes, total_train_episodes, verbose,
+               checkpoint_file=checkpoint_file, checkpoint_interval=checkpoint_interval, profiler=profiler,
+               metrics_file=metrics_file, evaluation_budget=evaluation_budget, convergence=convergence,
+               learning_episode=do_multi_hunter_learning_episode,
+               evaluation_episode=do_multi_hunter_evaluation_episode)
+    hunter_config.total_training_episodes = hunter_config.converged_episode or total_train_episodes
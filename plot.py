@@ -1,3 +1,5 @@
+import argparse
+import glob
 import math
 import os.path
 import pickle
@@ -5,6 +7,9 @@ import pickle
 import matplotlib.pyplot as plt
 import numpy as np
 
+from metrics_file import MetricsReader, is_metrics_file, load_metrics_file
+from result_file import ResultFile
+
 
 def load_hunter_config_from_bin(filename: str):
     """
@@ -34,7 +39,9 @@ def create_data_for_one_plot(filename: str) -> (str, np.array, int):
     Loads all the required data to plot one lineplot.
 
     :param filename: The file to be loaded, can be a CSV file with
-        measurements or a Hunteconfiguration bin file.
+        measurements (see metrics_file.py; a partially written file is
+        plotted up to its last evaluation), a Hunteconfiguration bin file
+        or a .npz result file.
 
     :return: A triple with (in that order): the name of the policy
         used by the hunters, the test results, the total amount of
@@ -56,7 +63,30 @@ def create_data_for_one_plot(filename: str) -> (str, np.array, int):
             min_data = None
             mae_data = None
 
-    if os.path.splitext(filename)[1] == ".csv":
+    if os.path.splitext(filename)[1] == ".npz":
+        # only the metrics are read from the file, not the Q-tables
+        with ResultFile(filename) as result_file:
+            name = result_file.name
+            total_training_episodes = result_file.total_training_episodes
+            average_data = result_file.get_metric('average_time_steps')
+            std_data = result_file.get_metric('std_time_steps')
+            max_data = result_file.get_metric('max_time_steps')
+            min_data = result_file.get_metric('min_time_steps')
+            mae_data = result_file.get_metric('mae_time_steps')
+
+    if os.path.splitext(filename)[1] == ".csv" and is_metrics_file(filename):
+        # the file may still be written or come from an interrupted run
+        metrics = load_metrics_file(filename)
+        name = metrics['name']
+        average_data = metrics['average']
+        std_data = metrics['std']
+        max_data = metrics['max']
+        min_data = metrics['min']
+        mae_data = metrics['mae']
+        total_training_episodes = min(metrics['total_training_episodes'],
+                                      average_data.size * metrics['train_episodes_batch'])
+
+    elif os.path.splitext(filename)[1] == ".csv":
         f = open(filename)
         header = f.readline()
         name = header.split(' ')[1]
@@ -74,8 +104,8 @@ def plot_graph(file_list: [str], is_std_included=True):
     Plot the graphs in the file list.
 
     :param file_list: List of all files for which a plot needs to be
-        created. They can be CSV files with measurements, a Hunteconfiguration
-        bin files or a mix of both.
+        created. They can be CSV files with measurements, Hunteconfiguration
+        bin files, .npz result files or a mix of them.
     """
     color_list = ['b', 'g', 'r', 'c', 'm']
     if is_std_included:
@@ -117,12 +147,156 @@ def plot_graph(file_list: [str], is_std_included=True):
     plt.show()
 
 
+class LiveCurve:
+    """
+    Learning curve of one result file, kept up to date with the file. The
+    rows appended to a metrics file by a running simulation are added to
+    the curve as they arrive, without reading the file again; the other
+    files (older CSV, .bin and .npz files, written at the end of a run)
+    are loaded again when they change.
+    """
+
+    def __init__(self, filename: str, ax, color):
+        """
+        :param filename: The result file (it may not exist yet).
+        :param ax: The axes the curve is drawn on.
+        :param color: The color of the curve.
+        """
+        self.filename = filename
+        self.reader = MetricsReader(filename) if os.path.splitext(filename)[1] == ".csv" else None
+        self.modification_time = None
+        self.name = None
+        self.total_training_episodes = 0
+        self.episodes = []
+        self.average_data = []
+        self.line, = ax.plot([], [], linewidth=0.6, color=color)
+
+    def update(self) -> bool:
+        """
+        Add the new evaluations of the file to the curve.
+
+        :return: True if the curve changed.
+        """
+        if self.reader is not None and (self.reader.header is not None or self.is_metrics_file()):
+            file_id = self.reader.file_id
+            rows = self.reader.read_new_rows()
+            if self.reader.file_id != file_id:
+                # the file was started again, e.g. by a resumed simulation
+                self.episodes, self.average_data = [], []
+            if self.reader.header is None:
+                return False
+            self.name, self.total_training_episodes, _ = self.reader.header
+            if not rows:
+                return False
+            for episode, statistics, _ in rows:
+                self.episodes.append(episode)
+                self.average_data.append(statistics['average'])
+        else:
+            if not os.path.exists(self.filename) or os.path.getmtime(self.filename) == self.modification_time:
+                return False
+            self.modification_time = os.path.getmtime(self.filename)
+            self.name, average_data, *_, self.total_training_episodes = create_data_for_one_plot(self.filename)
+            self.average_data = list(average_data)
+            self.episodes = list(np.linspace(0, self.total_training_episodes, num=len(average_data)))
+
+        self.line.set_data(self.episodes, self.average_data)
+        self.line.set_label(self.get_label())
+        return True
+
+    def is_metrics_file(self) -> bool:
+        """
+        Check if the file is a metrics file, once its header is written.
+
+        :return: True if it is a metrics file, False if it is another file
+            or if the file is not there yet.
+        """
+        try:
+            return is_metrics_file(self.filename)
+        except FileNotFoundError:
+            return False
+
+    def get_label(self) -> str:
+        """
+        Get the label of the curve in the legend, with the last evaluation.
+
+        :return: The name of the hunters, the file and the last average time steps.
+        """
+        label = f"{self.name} ({os.path.splitext(os.path.basename(self.filename))[0]})"
+        if self.average_data:
+            label += f": {self.average_data[-1]:.1f} at {int(self.episodes[-1])}/{self.total_training_episodes}"
+        return label
+
+
+class LiveDashboard:
+    """
+    Plot the learning curves of running simulations and update them as
+    their result files grow. New files matching the patterns (e.g. the
+    runs of a sweep which have just started) are added to the plot.
+    """
+
+    def __init__(self, patterns: [str]):
+        """
+        :param patterns: The result files to follow, as glob patterns
+            (e.g. "results/sweep/metrics_*.csv").
+        """
+        self.patterns = patterns
+        self.fig, self.ax = plt.subplots()
+        self.ax.set_xlabel('number of learning episodes')
+        self.ax.set_ylabel('Average time steps')
+        self.colors = plt.get_cmap('tab20').colors
+        self.curves = {}
+
+    def update(self) -> bool:
+        """
+        Add the new files and the new evaluations of every file to the plot.
+
+        :return: True if the plot changed.
+        """
+        for pattern in self.patterns:
+            for filename in sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]:
+                if filename not in self.curves:
+                    color = self.colors[len(self.curves) % len(self.colors)]
+                    self.curves[filename] = LiveCurve(filename, self.ax, color)
+
+        is_changed = False
+        for curve in self.curves.values():
+            is_changed = curve.update() or is_changed
+        if is_changed:
+            self.ax.relim()
+            self.ax.autoscale_view()
+            max_episodes = max(curve.total_training_episodes for curve in self.curves.values())
+            if max_episodes > 0:
+                self.ax.set_xlim(0, max_episodes)
+            self.ax.legend(fontsize='x-small', ncol=1 + len(self.curves) // 15)
+        return is_changed
+
+    def run(self, interval=5.0):
+        """
+        Update the plot every interval seconds until its window is closed.
+
+        :param interval: The time between two updates in seconds.
+        """
+        while plt.fignum_exists(self.fig.number):
+            if self.update():
+                self.fig.canvas.draw_idle()
+            plt.pause(interval)
+
+
 if __name__ == "__main__":
-    # add filenames in list which you want on plot
-    # both CSV results and hunterconfig binary files can be used
-    file_list = [
-        "results/figure5_V2_with_STD/hunters_Centralized Q-learning_02012021_2115.bin",
-        "results/figure5_V2_with_STD/hunters_Q-learning with proposed action estimation_02012021_2041.bin",
-        "results/figure5_V2_with_STD/hunters_Q-learning with randomly action estimation_02012021_2200.bin",
-    ]
-    plot_graph(file_list)
+    parser = argparse.ArgumentParser(description="Plot the learning curves of result files.")
+    parser.add_argument("files", nargs="*", help="CSV, .bin or .npz result files (glob patterns with --live)")
+    parser.add_argument("--live", action="store_true", help="follow running simulations and update the plot")
+    parser.add_argument("--interval", type=float, default=5.0, help="time between two updates with --live")
+    args = parser.parse_args()
+
+    if args.live:
+        LiveDashboard(args.files).run(args.interval)
+    else:
+        # add filenames in list which you want on plot
+        # CSV results, hunterconfig binary files and .npz result files can be used
+        file_list = args.files or [
+            "results/figure5_V2_with_STD/hunters_Centralized Q-learning_02012021_2115.bin",
+            "results/figure5_V2_with_STD/results_Q-learning with proposed action estimation_02012021_2041.csv",
+            "results/figure5_V2_with_STD/hunters_Q-learning with randomly action estimation_02012021_2200.bin",
+        ]
+        plot_graph(file_list)
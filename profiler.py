@@ -0,0 +1,106 @@
+import json
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+
+class Profiler:
+    """
+    Record the wall time spent in each phase of a simulation and some
+    counters (e.g. the number of steps of each episode), to be exported as
+    a report at the end of the run. Phases can be nested (e.g. the steps
+    of a learning episode are also part of the episode).
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(list)
+        self.start_time = perf_counter()
+
+    def add_time(self, phase: str, duration: float):
+        """
+        Add the duration of one call of a phase.
+
+        :param phase: The name of the phase.
+        :param duration: The duration in seconds (see time.perf_counter).
+        """
+        self.times[phase] += duration
+        self.calls[phase] += 1
+
+    @contextmanager
+    def phase(self, phase: str):
+        """
+        Time the code run inside the context as one call of a phase.
+
+        :param phase: The name of the phase.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, perf_counter() - start)
+
+    def count(self, counter: str, value):
+        """
+        Record one value of a counter.
+
+        :param counter: The name of the counter.
+        :param value: The value (a number or a list of numbers, e.g. one per agent).
+        """
+        self.counters[counter].append(value)
+
+    def report(self) -> dict:
+        """
+        Build the report of the run.
+
+        :return: The total wall time, the time and number of calls of each
+            phase and the values of each counter.
+        """
+        return {
+            'wall_time': perf_counter() - self.start_time,
+            'phases': {phase: {'total': self.times[phase], 'calls': self.calls[phase],
+                               'mean': self.times[phase] / self.calls[phase]} for phase in self.times},
+            'counters': dict(self.counters),
+        }
+
+    def save(self, filename: str):
+        """
+        Save the report as a JSON file.
+
+        :param filename: The name of the file.
+        """
+        with open(filename, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+    def format_report(self) -> str:
+        """
+        Format the phases of the report as a table, the most expensive first.
+
+        :return: The table.
+        """
+        report = self.report()
+        lines = [f"{'phase':<20}{'total (s)':>12}{'calls':>10}{'mean (us)':>12}{'share':>8}"]
+        for phase, stats in sorted(report['phases'].items(), key=lambda item: -item[1]['total']):
+            lines.append(f"{phase:<20}{stats['total']:>12.3f}{stats['calls']:>10}{stats['mean'] * 1e6:>12.1f}"
+                         f"{stats['total'] / report['wall_time']:>8.1%}")
+        return "\n".join(lines)
+
+
+class NullProfiler:
+    """
+    Profiler doing nothing, used when the instrumentation is disabled.
+    """
+
+    enabled = False
+
+    def add_time(self, phase: str, duration: float):
+        pass
+
+    def phase(self, phase: str):
+        return nullcontext()
+
+    def count(self, counter: str, value):
+        pass
@@ -0,0 +1,595 @@
+import sys
+import tempfile
+
+import numpy as np
+
+from move import *
+
+
+class DictQTable:
+    """
+    Q-table stored in a dictionary keyed by (state id, action, other_action),
+    or by (rel_position, other_rel_position, action, other_action) when
+    there is no state encoder. Entries are created when they are first read.
+    """
+
+    def __init__(self, initial_q_value=0.0, state_encoder=None):
+        """
+        Initialize the Q-table.
+
+        :param initial_q_value: The initial values of the Q-table.
+        :param state_encoder: The state encoder of the game (optional).
+        """
+        self.values = dict()
+        self.initial_q_value = initial_q_value
+        self.state_encoder = state_encoder
+
+    def get_key(self, state, action: int, other_action: int = None) -> tuple:
+        """
+        Create the key of an action (pair) in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action taken.
+        :param other_action: The other player action (None if ignored).
+
+        :return: The key in the dictionary.
+        """
+        if self.state_encoder is not None:
+            return self.state_encoder.encode(state), action, other_action
+        return state.rel_position, state.other_rel_position, action, other_action
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, state, action: int, other_action: int = None) -> float:
+        """
+        Get the Q-value of an action (pair) in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action taken.
+        :param other_action: The other player action (None if ignored).
+
+        :return: The Q-value.
+        """
+        qIndex = self.get_key(state, action, other_action)
+        if qIndex in self.values:
+            return self.values[qIndex]
+        else:
+            self.values[qIndex] = self.initial_q_value
+            return self.initial_q_value
+
+    def set(self, state, action: int, other_action: int, q_value: float):
+        """
+        Set the Q-value of an action (pair) in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action taken.
+        :param other_action: The other player action (None if ignored).
+        :param q_value: The new Q-value.
+        """
+        qIndex = self.get_key(state, action, other_action)
+        self.values[qIndex] = q_value
+
+    def get_actions(self, state, other_action: int = None) -> np.ndarray:
+        """
+        Get the Q-values of every action in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param other_action: The other player action (None if ignored).
+
+        :return: An array with the Q-value of each action.
+        """
+        return np.array([self.get(state, action, other_action) for action in range(NB_MOVES)])
+
+    def compact(self) -> int:
+        """
+        Remove the entries holding the initial value (mostly created by
+        reads), they are read as the initial value anyway.
+
+        :return: The number of entries removed.
+        """
+        values = {key: q_value for key, q_value in self.values.items() if q_value != self.initial_q_value}
+        nb_removed = len(self.values) - len(values)
+        self.values = values
+        return nb_removed
+
+    def count_learned(self) -> int:
+        """
+        Count the Q-values differing from the initial value, the same
+        quantity for every backend (unlike len, which counts what is stored).
+
+        :return: The number of Q-values.
+        """
+        return int(sum(q_value != self.initial_q_value for q_value in self.values.values()))
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory used by the Q-values (the dictionary, its keys
+        and its values).
+
+        :return: The number of bytes.
+        """
+        return sys.getsizeof(self.values) + sum(sys.getsizeof(key) + sys.getsizeof(q_value)
+                                                for key, q_value in self.values.items())
+
+    def get_action_pairs(self, state) -> np.ndarray:
+        """
+        Get the Q-values of every action pair in a state.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: An array (action, other action) with the Q-values.
+        """
+        return np.array([[self.get(state, action, other_action) for other_action in range(NB_MOVES)]
+                         for action in range(NB_MOVES)])
+
+    def to_array(self) -> np.ndarray:
+        """
+        Copy the Q-table into a dense array without creating missing
+        entries (needs a state encoder).
+
+        :return: An array (state id, action, other action) of Q-values, the
+            last column of the other action axis holds the Q-values
+            ignoring the other action.
+        """
+        values = np.full((self.state_encoder.num_states, NB_MOVES, NB_MOVES + 1), self.initial_q_value, dtype=float)
+        for (state_id, action, other_action), q_value in self.values.items():
+            values[state_id, action, NB_MOVES if other_action is None else other_action] = q_value
+        return values
+
+    def get_state_ids(self) -> np.ndarray:
+        """
+        Get the ids of the states with a Q-value differing from the initial
+        value (needs a state encoder).
+
+        :return: The sorted ids of the states.
+        """
+        return np.array(sorted({key[0] for key, q_value in self.values.items() if q_value != self.initial_q_value}),
+                        dtype=int)
+
+    def get_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Copy the Q-values of some states into an array without creating
+        missing entries (needs a state encoder).
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action, other action) of Q-values, laid
+            out like the rows of to_array.
+        """
+        other_actions = list(range(NB_MOVES)) + [None]  # the last column ignores the other action
+        rows = [[[self.values.get((state_id, action, other_action), self.initial_q_value)
+                  for other_action in other_actions] for action in range(NB_MOVES)]
+                for state_id in np.asarray(state_ids).tolist()]
+        return np.array(rows, dtype=float).reshape(len(rows), NB_MOVES, NB_MOVES + 1)
+
+    def set_state_encoder(self, state_encoder):
+        """
+        Key the Q-values by state id instead of relative positions (for the
+        Q-tables pickled before the states were encoded).
+
+        :param state_encoder: The state encoder of the game.
+        """
+        if self.state_encoder is None:
+            self.values = {(state_encoder.encode_positions(rel_position, other_rel_position), action, other_action):
+                           q_value for (rel_position, other_rel_position, action, other_action), q_value
+                           in self.values.items()}
+        self.state_encoder = state_encoder
+
+    def load_array(self, values: np.ndarray):
+        """
+        Fill the Q-table from a dense array (as returned by to_array), only
+        the Q-values differing from the initial value are stored.
+
+        :param values: An array (state id, action, other action) of Q-values.
+        """
+        self.values = dict()
+        for state_id, action, other_action in zip(*np.nonzero(values != self.initial_q_value)):
+            key = (int(state_id), int(action), None if other_action == NB_MOVES else int(other_action))
+            self.values[key] = float(values[state_id, action, other_action])
+
+
+class SparseQTable:
+    """
+    Q-table storing one (action, other action) row of Q-values per state,
+    keyed by state id (or by relative positions when there is no state
+    encoder). Unlike DictQTable, reading the Q-values of a state which was
+    never updated returns the initial values without storing anything, so
+    the memory grows with the number of states updated rather than with
+    the number of states looked at. The last column of the other action
+    axis holds the Q-values of agents that ignore the other player action.
+    """
+
+    def __init__(self, initial_q_value=0.0, state_encoder=None):
+        """
+        Initialize the Q-table.
+
+        :param initial_q_value: The initial values of the Q-table.
+        :param state_encoder: The state encoder of the game (optional).
+        """
+        self.values = dict()
+        self.initial_q_value = initial_q_value
+        self.state_encoder = state_encoder
+        # row of the states not stored, shared and read-only
+        self.initial_row = np.full((NB_MOVES, NB_MOVES + 1), initial_q_value, dtype=float)
+        self.initial_row.flags.writeable = False
+
+    def __len__(self):
+        return len(self.values) * self.initial_row.size
+
+    def get_state_key(self, state):
+        """
+        Create the key of a state.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: The id of the state, or its relative positions if there is no
+            state encoder.
+        """
+        if self.state_encoder is not None:
+            return self.state_encoder.encode(state)
+        return state.rel_position, state.other_rel_position
+
+    def get_row(self, state) -> np.ndarray:
+        """
+        Get the Q-values of a state, without storing them if the state was
+        never updated.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: The array (action, other action) of Q-values of the state
+            (read-only if the state is not stored).
+        """
+        return self.values.get(self.get_state_key(state), self.initial_row)
+
+    def get(self, state, action: int, other_action: int = None) -> float:
+        """
+        Get the Q-value of an action (pair) in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action taken.
+        :param other_action: The other player action (None if ignored).
+
+        :return: The Q-value.
+        """
+        if other_action is None:
+            other_action = NB_MOVES
+        return self.get_row(state)[action, other_action]
+
+    def set(self, state, action: int, other_action: int, q_value: float):
+        """
+        Set the Q-value of an action (pair) in a state. The row of the
+        state is only created when a Q-value differs from the initial value.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action taken.
+        :param other_action: The other player action (None if ignored).
+        :param q_value: The new Q-value.
+        """
+        if other_action is None:
+            other_action = NB_MOVES
+        key = self.get_state_key(state)
+        row = self.values.get(key)
+        if row is None:
+            if q_value == self.initial_q_value:
+                return
+            row = self.values[key] = self.initial_row.copy()
+        row[action, other_action] = q_value
+
+    def get_actions(self, state, other_action: int = None) -> np.ndarray:
+        """
+        Get the Q-values of every action in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param other_action: The other player action (None if ignored).
+
+        :return: A view with the Q-value of each action.
+        """
+        if other_action is None:
+            other_action = NB_MOVES
+        return self.get_row(state)[:, other_action]
+
+    def get_action_pairs(self, state) -> np.ndarray:
+        """
+        Get the Q-values of every action pair in a state.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: A view (action, other action) with the Q-values.
+        """
+        return self.get_row(state)[:, :NB_MOVES]
+
+    def compact(self) -> int:
+        """
+        Remove the states whose Q-values are all back to the initial value.
+
+        :return: The number of states removed.
+        """
+        values = {key: row for key, row in self.values.items() if np.any(row != self.initial_q_value)}
+        nb_removed = len(self.values) - len(values)
+        self.values = values
+        return nb_removed
+
+    def count_learned(self) -> int:
+        """
+        Count the Q-values differing from the initial value (see
+        DictQTable.count_learned).
+
+        :return: The number of Q-values.
+        """
+        return sum(int(np.count_nonzero(row != self.initial_q_value)) for row in self.values.values())
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory used by the Q-values (the dictionary, its keys
+        and the rows of the states).
+
+        :return: The number of bytes.
+        """
+        return sys.getsizeof(self.values) + sum(sys.getsizeof(key) + sys.getsizeof(row)
+                                                for key, row in self.values.items())
+
+    def to_array(self) -> np.ndarray:
+        """
+        Copy the Q-table into a dense array (needs a state encoder).
+
+        :return: An array (state id, action, other action) of Q-values, the
+            last column of the other action axis holds the Q-values
+            ignoring the other action.
+        """
+        values = np.full((self.state_encoder.num_states, NB_MOVES, NB_MOVES + 1), self.initial_q_value, dtype=float)
+        for state_id, row in self.values.items():
+            values[state_id] = row
+        return values
+
+    def get_state_ids(self) -> np.ndarray:
+        """
+        Get the ids of the states stored (needs a state encoder).
+
+        :return: The sorted ids of the states.
+        """
+        return np.array(sorted(self.values), dtype=int)
+
+    def get_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Copy the Q-values of some states into an array (needs a state
+        encoder).
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action, other action) of Q-values, laid
+            out like the rows of to_array.
+        """
+        rows = [self.values.get(state_id, self.initial_row) for state_id in np.asarray(state_ids).tolist()]
+        return np.array(rows, dtype=float).reshape(len(rows), NB_MOVES, NB_MOVES + 1)
+
+    def load_array(self, values: np.ndarray):
+        """
+        Fill the Q-table from a dense array (as returned by to_array), only
+        the states with a Q-value differing from the initial value are stored.
+
+        :param values: An array (state id, action, other action) of Q-values.
+        """
+        self.values = {int(state_id): values[state_id].astype(float)
+                       for state_id in np.flatnonzero(np.any(values != self.initial_q_value, axis=(1, 2)))}
+
+
+class ArrayQTable:
+    """
+    Q-table stored in a preallocated array indexed by (state id, action,
+    other action). The last column of the other action axis holds the
+    Q-values of agents that ignore the other player action.
+    """
+
+    def __init__(self, state_encoder, initial_q_value=0.0):
+        """
+        Initialize the Q-table.
+
+        :param state_encoder: The state encoder of the game.
+        :param initial_q_value: The initial values of the Q-table.
+        """
+        self.state_encoder = state_encoder
+        self.initial_q_value = initial_q_value
+        self.values = np.full((state_encoder.num_states, NB_MOVES, NB_MOVES + 1), initial_q_value, dtype=float)
+
+    def __len__(self):
+        return self.values.size
+
+    def compact(self) -> int:
+        """
+        Nothing to remove, the array is preallocated.
+
+        :return: 0.
+        """
+        return 0
+
+    def count_learned(self) -> int:
+        """
+        Count the Q-values differing from the initial value (see
+        DictQTable.count_learned).
+
+        :return: The number of Q-values.
+        """
+        return int(np.count_nonzero(self.values != self.initial_q_value))
+
+    def memory_usage(self) -> int:
+        """
+        Get the memory used by the Q-values (on disk for MemmapQTable).
+
+        :return: The number of bytes.
+        """
+        return self.values.nbytes
+
+    def get(self, state, action: int, other_action: int = None) -> float:
+        """
+        Get the Q-value of an action (pair) in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action taken.
+        :param other_action: The other player action (None if ignored).
+
+        :return: The Q-value.
+        """
+        if other_action is None:
+            other_action = NB_MOVES
+        return self.values[self.state_encoder.encode(state), action, other_action]
+
+    def set(self, state, action: int, other_action: int, q_value: float):
+        """
+        Set the Q-value of an action (pair) in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action taken.
+        :param other_action: The other player action (None if ignored).
+        :param q_value: The new Q-value.
+        """
+        if other_action is None:
+            other_action = NB_MOVES
+        self.values[self.state_encoder.encode(state), action, other_action] = q_value
+
+    def get_actions(self, state, other_action: int = None) -> np.ndarray:
+        """
+        Get the Q-values of every action in a state.
+
+        :param state: The state of the two hunters (or its id).
+        :param other_action: The other player action (None if ignored).
+
+        :return: A view with the Q-value of each action.
+        """
+        if other_action is None:
+            other_action = NB_MOVES
+        return self.values[self.state_encoder.encode(state), :, other_action]
+
+    def get_action_pairs(self, state) -> np.ndarray:
+        """
+        Get the Q-values of every action pair in a state.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: A view (action, other action) with the Q-values.
+        """
+        return self.values[self.state_encoder.encode(state), :, :NB_MOVES]
+
+    def to_array(self) -> np.ndarray:
+        """
+        Copy the Q-table into a dense array.
+
+        :return: An array (state id, action, other action) of Q-values, the
+            last column of the other action axis holds the Q-values
+            ignoring the other action.
+        """
+        return self.values.copy()
+
+    def get_state_ids(self) -> np.ndarray:
+        """
+        Get the ids of the states with a Q-value differing from the initial
+        value.
+
+        :return: The sorted ids of the states.
+        """
+        return np.flatnonzero(np.any(self.values != self.initial_q_value, axis=(1, 2)))
+
+    def get_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Copy the Q-values of some states into an array.
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action, other action) of Q-values.
+        """
+        return self.values[state_ids]
+
+    def load_array(self, values: np.ndarray):
+        """
+        Fill the Q-table from a dense array (as returned by to_array).
+
+        :param values: An array (state id, action, other action) of Q-values.
+        """
+        self.values[:] = values
+
+
+def create_memmap(shape: tuple, fill_value=0.0) -> np.memmap:
+    """
+    Create an array of floats backed by an anonymous temporary file, so
+    that it can be larger than the available memory. The file is created
+    in the temporary directory (see tempfile, the TMPDIR environment
+    variable can point it to a large disk) and removed when the array is
+    no longer used.
+
+    :param shape: The shape of the array.
+    :param fill_value: The initial value of every element.
+
+    :return: The memory-mapped array.
+    """
+    values = np.memmap(tempfile.TemporaryFile(), dtype=float, mode='w+', shape=shape)
+    if fill_value != 0:  # a new file is already filled with zeros
+        values.fill(fill_value)
+    return values
+
+
+class MemmapQTable(ArrayQTable):
+    """
+    Q-table stored like ArrayQTable, in a memory-mapped temporary file
+    instead of memory, for playing fields whose Q-tables do not fit in
+    memory. Only the pages of the states that are visited are loaded.
+    """
+
+    def __init__(self, state_encoder, initial_q_value=0.0):
+        """
+        Initialize the Q-table.
+
+        :param state_encoder: The state encoder of the game.
+        :param initial_q_value: The initial values of the Q-table.
+        """
+        self.state_encoder = state_encoder
+        self.initial_q_value = initial_q_value
+        self.values = create_memmap((state_encoder.num_states, NB_MOVES, NB_MOVES + 1), initial_q_value)
+
+    def __getstate__(self) -> dict:
+        """
+        Get the attributes to pickle, the Q-values are pickled as a regular
+        array since the temporary file does not outlive the process.
+
+        :return: The attributes of the Q-table.
+        """
+        attributes = self.__dict__.copy()
+        attributes['values'] = np.asarray(self.values)
+        return attributes
+
+    def __setstate__(self, attributes: dict):
+        """
+        Restore a pickled Q-table into a new temporary file.
+
+        :param attributes: The pickled attributes of the Q-table.
+        """
+        values = attributes.pop('values')
+        self.__dict__.update(attributes)
+        self.values = create_memmap(values.shape)
+        self.values[:] = values
+
+
+def create_q_table(backend: str, initial_q_value=0.0, state_encoder=None):
+    """
+    Create the Q-table of an agent.
+
+    :param backend: The storage used for the Q-table ('dict', 'sparse',
+        'array' or 'memmap').
+    :param initial_q_value: The initial values of the Q-table.
+    :param state_encoder: The state encoder of the game (mandatory for
+        the 'array' and 'memmap' backends, the 'dict' and 'sparse' backends
+        then use state ids as keys).
+
+    :return: The Q-table.
+    """
+    if backend == 'dict':
+        return DictQTable(initial_q_value, state_encoder)
+    elif backend == 'sparse':
+        return SparseQTable(initial_q_value, state_encoder)
+    elif backend in ('array', 'memmap'):
+        if state_encoder is None:
+            raise ValueError(f"the '{backend}' backend needs a state encoder")
+        if backend == 'memmap':
+            return MemmapQTable(state_encoder, initial_q_value)
+        return ArrayQTable(state_encoder, initial_q_value)
+    else:
+        raise ValueError(f"unknown Q-table backend: {backend}")
@@ -1,32 +1,30 @@
 from agent import State, Agent
-from internalmodel import InternalModel, InternalModelRandom
+from internalmodel import InternalModelRandom, create_internal_model
 from move import *
 import numpy as np
 
 
 class QwProposedAEAgent(Agent):
+    max_EV_cached = True
+
     def __init__(self, learning_rate: float, discount_rate: float, temperature: float, initial_state: State,
-                 initial_q_value=0.0, theta=0.998849):
+                 initial_q_value=0.0, theta=0.998849, backend='dict', state_encoder=None, rng=None):
         Agent.__init__(self, learning_rate, discount_rate, temperature, initial_state,
-                       initial_q_value, theta)
-        self.internal_model = InternalModel(theta)
+                       initial_q_value, theta, backend, state_encoder, rng)
+        self.internal_model = create_internal_model(backend, theta, state_encoder)
 
     def get_q_value_with_random_state(self, state: State, action: int, other_action: int = None) -> float:
         """
-        Get the q value based on the current state.
+        Get the q value based on the given state.
 
+        :param state: The state to consider.
         :param action: The action taken.
         :param other_action: The other player action (None if
             ignored).
 
         :return: The q value.
         """
-        qIndex = (state.rel_position, state.other_rel_position, action, other_action)
-        if qIndex in self.q_table:
-            return self.q_table[qIndex]
-        else:
-            self.q_table[qIndex] = self.initial_q_value
-            return self.initial_q_value
+        return self.q_table.get(state, action, other_action)
 
     def expected_value(self, action: int) -> float:
         """
@@ -43,6 +41,56 @@ class QwProposedAEAgent(Agent):
                          self.get_q_value(action, other_action))
         return sum
 
+    def expected_values(self) -> np.ndarray:
+        """
+        Compute the expected value of every action for the current
+        state (used by the boltzmann function).
+
+        :return: An array with the expected value of each action.
+        """
+        moves_probability = np.asarray(self.internal_model.get_action_prob(self.state))
+        return self.q_table.get_action_pairs(self.state) @ moves_probability
+
+    def get_expected_values_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """
+        Compute the expected value of every action in some states,
+        without modifying the agent.
+
+        :param state_ids: The ids of the states.
+
+        :return: An array (state, action) with the expected values.
+        """
+        return np.einsum('sao,so->sa', self.q_table.get_rows(state_ids)[:, :, :NB_MOVES],
+                         self.internal_model.get_action_prob_rows(state_ids))
+
+    def get_most_likely_actions(self, state: State) -> [int]:
+        """
+        Get the actions of the other agent with the highest estimation in
+        the internal model.
+
+        :param state: The state of the two hunters (or its id).
+
+        :return: The most likely actions.
+        """
+        moves_probability = self.internal_model.get_action_prob(state)
+        max_probability = max(moves_probability)
+        return [other_action for other_action in range(NB_MOVES)
+                if moves_probability[other_action] == max_probability]
+
+    def is_max_EV_candidate(self, state: State, action: int, other_action: int) -> bool:
+        """
+        Check if a Q-value is one of the values the maximal expected value
+        of a state is taken from: the Q-values of the most likely actions of
+        the other agent (see predict_reward).
+
+        :param state: The state of the two hunters (or its id).
+        :param action: The action.
+        :param other_action: The other agent action (None if ignored).
+
+        :return: True if the Q-value counts in the maximal expected value.
+        """
+        return other_action in self.get_most_likely_actions(state)
+
     def predict_reward(self, future_state: State, action: int) -> float:
         """
         Predict the reward if we go into future_state by
@@ -77,16 +125,26 @@ class QwProposedAEAgent(Agent):
         :param episode: the episode of the game
         """
         self.temperature = self.internal_model.get_actual_theta(episode)  # in paper theta and tau are equal
+
+        # the cached maximal expected value of the state stays valid as long as
+        # the most likely actions of the other agent do not change
+        key = self.get_state_key(self.state) if self.max_EV_cached else None
+        most_likely = self.get_most_likely_actions(self.state) if key in self.max_EV_cache else None
         self.internal_model.update_state_action_estimation(self.state, other_action, episode)
+        if most_likely is not None and self.get_most_likely_actions(self.state) != most_likely:
+            del self.max_EV_cache[key]
+
         super().update(new_state, action, reward, other_action)
 
 
 class QwRandomAEAgent(QwProposedAEAgent):
+    max_EV_cached = False  # the other actions are drawn at random (see predict_reward)
+
     def __init__(self, learning_rate: float, discount_rate: float, temperature: float, initial_state: State,
-                 initial_q_value=0.0, theta=0.998849):
+                 initial_q_value=0.0, theta=0.998849, backend='dict', state_encoder=None, rng=None):
         Agent.__init__(self, learning_rate, discount_rate, temperature, initial_state,
-                       initial_q_value, theta)
-        self.internal_model = InternalModelRandom(theta)
+                       initial_q_value, theta, backend, state_encoder, rng)
+        self.internal_model = InternalModelRandom(theta, state_encoder)
 
     def predict_reward(self, future_state: State, action: int) -> float:
         """
@@ -99,7 +157,7 @@ class QwRandomAEAgent(QwProposedAEAgent):
 
         :return: The predicted reward.
         """
-        return self.get_q_value_with_random_state(future_state, action, np.random.choice(NB_MOVES))
+        return self.get_q_value_with_random_state(future_state, action, self.rng.randint(NB_MOVES))
 
 
 def test():
@@ -5,10 +5,25 @@ from qwpae_agent import QwProposedAEAgent
 
 
 class QwSelfModelBaseAEAgent(QwProposedAEAgent):
+    max_EV_cached = False  # the self-model depends on the Q-values of the swapped state and on the temperature
+
     def __init__(self, learning_rate: float, discount_rate: float, temperature: float, initial_state: State,
-                 initial_q_value=0.0, theta=0.998849):
-        super().__init__(learning_rate, discount_rate, temperature, initial_state, initial_q_value, theta)
-        self.internal_model = InternalSelfModel(theta, self)
+                 initial_q_value=0.0, theta=0.998849, backend='dict', state_encoder=None, rng=None):
+        super().__init__(learning_rate, discount_rate, temperature, initial_state, initial_q_value, theta,
+                         backend, state_encoder, rng)
+        self.internal_model = InternalSelfModel(theta, self, state_encoder)
+
+    def update_q_value(self, q_value: float, action: int, other_action=None):
+        """
+        Update the Q-table (for the state we are in) and forget the
+        self-model policy computed from the old Q-values.
+
+        :param q_value: The new Q-value.
+        :param action: The action done.
+        :param other_action: The other agent action (ignored if None).
+        """
+        super().update_q_value(q_value, action, other_action)
+        self.internal_model.invalidate(self.state)
 
 
 def test():
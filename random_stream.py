@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class RandomStream:
+    """
+    Stream of random numbers owned by one component of a run (the game or
+    an agent). Every stream has its own numpy Generator, the streams of a
+    run are spawned from a single seed (see spawn), so a run is
+    reproducible and the streams of parallel runs are not correlated.
+    The uniform numbers drawn one at a time are taken from blocks drawn
+    at once, which is much cheaper than one call to the generator each.
+    """
+
+    def __init__(self, seed=None, block_size=1024):
+        """
+        Initialize the stream.
+
+        :param seed: The seed (an int), a numpy SeedSequence (e.g. spawned
+            by another stream) or None to seed it from the OS entropy.
+        :param block_size: The number of uniform numbers drawn at once.
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.generator = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.block = []
+        self.index = 0
+
+    def spawn(self):
+        """
+        Create an independent stream derived from this one. The streams
+        spawned successively are different but always the same for a
+        given seed.
+
+        :return: The new stream.
+        """
+        return RandomStream(self.seed_sequence.spawn(1)[0], self.block_size)
+
+    def random(self, size=None):
+        """
+        Draw uniform numbers in [0, 1), with the same interface as
+        np.random.random so that both can be used by the sampling functions.
+
+        :param size: The number of numbers drawn (a single float if None).
+
+        :return: The number(s) drawn.
+        """
+        if size is not None:
+            return self.generator.random(size)
+
+        if self.index == len(self.block):
+            self.block = self.generator.random(self.block_size).tolist()
+            self.index = 0
+        self.index += 1
+        return self.block[self.index - 1]
+
+    def randint(self, high: int) -> int:
+        """
+        Draw an integer uniformly in [0, high) from the block of uniform
+        numbers.
+
+        :param high: The number of possible integers.
+
+        :return: The integer drawn.
+        """
+        return int(self.random() * high)
+
+    def integers(self, high, size=None):
+        """
+        Draw integers uniformly in [0, high) directly from the generator
+        (for arrays of integers).
+
+        :param high: The upper bound(s), broadcast against size.
+        :param size: The shape of the array drawn (a single integer if None).
+
+        :return: The integer(s) drawn.
+        """
+        return self.generator.integers(high, size=size)
@@ -0,0 +1,140 @@
+import json
+
+import numpy as np
+
+from internalmodel import InternalModelRandom
+
+METRICS = ('average_time_steps', 'std_time_steps', 'max_time_steps', 'min_time_steps', 'mae_time_steps')
+
+
+def get_agents(hunter_config) -> list:
+    """
+    Get the learning agents of a hunter configuration.
+
+    :param hunter_config: The hunter configuration.
+
+    :return: The centralized agent alone, both hunters, or the factors of
+        every hunter of a MultiHunterConfig (see FactoredAgent).
+    """
+    if hasattr(hunter_config, 'hunters'):
+        return [factor for hunter in hunter_config.hunters for factor in hunter.factors]
+    if hasattr(hunter_config.hunter_1, 'CA'):
+        return [hunter_config.hunter_1.CA]
+    return [hunter_config.hunter_1, hunter_config.hunter_2]
+
+
+def save_result_file(filename: str, hunter_config, total_train_episodes: int):
+    """
+    Save the results of a simulation into a compressed .npz file. The
+    metrics, the metadata of the run and the Q-tables / internal models
+    of the agents are stored as separate arrays, so that each of them can
+    be loaded on its own.
+
+    :param filename: The name of the file (.npz).
+    :param hunter_config: The hunter configuration (where the results
+        are stored).
+    :param total_train_episodes: The total number of episodes the agents
+        were trained.
+    """
+    agents = get_agents(hunter_config)
+    game = hunter_config.game
+    metadata = {
+        'name': hunter_config.name,
+        'total_training_episodes': total_train_episodes,
+        'agent_type': type(agents[0]).__name__,
+        'playing_field_size': [game.x_max, game.y_max],
+        'reward_hunter_1': game.reward_hunter_1,
+        'penalty_hunter_1': game.penalty_hunter_1,
+        'reward_hunter_2': game.reward_hunter_2,
+        'penalty_hunter_2': game.penalty_hunter_2,
+        'is_prey_caught_function': game.is_prey_caught.__name__,
+        'alpha': agents[0].learning_rate,
+        'gamma': agents[0].discount_rate,
+        'temperature': agents[0].temperature,
+        'initial_q': agents[0].initial_q_value,
+        'theta': agents[0].theta,
+        'backend': agents[0].backend,
+    }
+
+    arrays = {'metadata': np.array(json.dumps(metadata))}
+    for metric in METRICS:
+        # the mae was stored under mae_time_Steps in the hunter configurations
+        values = getattr(hunter_config, metric if metric != 'mae_time_steps' else 'mae_time_Steps', None)
+        if values is not None:
+            arrays[metric] = np.asarray(values)
+
+    for index, agent in enumerate(agents):
+        arrays[f'hunter_{index + 1}_q_table'] = agent.q_table.to_array()
+        internal_model = getattr(agent, 'internal_model', None)
+        if internal_model is not None and not isinstance(internal_model, InternalModelRandom):
+            arrays[f'hunter_{index + 1}_internal_model'] = internal_model.get_action_prob_table()
+
+    np.savez_compressed(filename, **arrays)
+
+
+class ResultFile:
+    """
+    Lazy reader of a .npz result file: an array is only read from the
+    file when it is accessed, so reading the metrics never loads the
+    Q-tables.
+    """
+
+    def __init__(self, filename: str):
+        """
+        Open a result file.
+
+        :param filename: The name of the file (.npz).
+        """
+        self.filename = filename
+        self.arrays = np.load(filename)
+        self.metadata = json.loads(str(self.arrays['metadata']))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.arrays.close()
+
+    @property
+    def name(self) -> str:
+        return self.metadata['name']
+
+    @property
+    def total_training_episodes(self) -> int:
+        return self.metadata['total_training_episodes']
+
+    def get_metric(self, metric: str) -> np.ndarray:
+        """
+        Read one of the metrics.
+
+        :param metric: The metric (one of METRICS).
+
+        :return: The values of the metric for each evaluation, None if the
+            metric was not stored.
+        """
+        return self.arrays[metric] if metric in self.arrays.files else None
+
+    def get_q_table(self, hunter: int) -> np.ndarray:
+        """
+        Read the Q-table of a hunter.
+
+        :param hunter: The hunter (1 or 2, only 1 for the centralized agent).
+
+        :return: The array (state id, action, other action) of Q-values.
+        """
+        return self.arrays[f'hunter_{hunter}_q_table']
+
+    def get_internal_model(self, hunter: int) -> np.ndarray:
+        """
+        Read the internal model of a hunter.
+
+        :param hunter: The hunter (1 or 2).
+
+        :return: The array (state id, action) of estimations, None if the
+            hunter has no stored internal model.
+        """
+        key = f'hunter_{hunter}_internal_model'
+        return self.arrays[key] if key in self.arrays.files else None
@@ -0,0 +1,286 @@
+"""
+Measure the speed of the game, of the agents and of short training runs
+on several playing field sizes, save the results into a JSON file and
+compare them with the results of a previous version (the baseline).
+
+Example, measure and compare with the results saved before a change:
+
+    python -m sim.benchmark --output before.json
+    python -m sim.benchmark --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+
+from centralized_agent import Centralized_Agent
+from game import is_prey_caught_homogeneous
+from move import NB_MOVES
+from qwpae_agent import QwRandomAEAgent
+from qwsae_agent import QwSelfModelBaseAEAgent
+from simulation import *
+
+# agent type -> agent class
+AGENTS = {
+    "CQ": Centralized_Agent,
+    "QwPAE": QwProposedAEAgent,
+    "QwRAE": QwRandomAEAgent,
+    "QwSAE": QwSelfModelBaseAEAgent,
+}
+
+# agents of figure 5 (see sim/simulation_figure_5.py)
+FIGURE_5_AGENTS = ("CQ", "QwPAE", "QwRAE")
+
+NB_STATES = 1000  # number of different states the agents are benchmarked on
+
+
+def measure_rate(run, min_time=0.2, repeat=3) -> float:
+    """
+    Measure how many operations per second a function does. The number of
+    operations is doubled until a run lasts min_time, then the best of
+    repeat runs is kept.
+
+    :param run: The function, called with a number of operations to do.
+    :param min_time: The minimal duration of a run in seconds.
+    :param repeat: The number of runs.
+
+    :return: The number of operations per second.
+    """
+    nb_operations = 1
+    while True:
+        start = perf_counter()
+        run(nb_operations)
+        duration = perf_counter() - start
+        if duration >= min_time:
+            break
+        nb_operations *= 2
+
+    for _ in range(repeat - 1):
+        start = perf_counter()
+        run(nb_operations)
+        duration = min(duration, perf_counter() - start)
+
+    return nb_operations / duration
+
+
+def benchmark_game(size: int, min_time=0.2, repeat=3) -> float:
+    """
+    Measure the time steps per second of Game.play_one_episode.
+
+    :param size: The width and height of the playing field.
+
+    :return: The number of time steps per second.
+    """
+    game = Game((size, size), 1, 0, seed=0)
+    actions = game.rng.integers(NB_MOVES, size=(NB_STATES, 2)).tolist()
+
+    def run(nb_operations):
+        for i in range(nb_operations):
+            hunter_1_action, hunter_2_action = actions[i % NB_STATES]
+            game.play_one_episode(hunter_1_action, hunter_2_action)
+
+    return measure_rate(run, min_time, repeat)
+
+
+def create_agent(agent: str, game: Game, backend: str):
+    """
+    Create an agent with the parameters of the figures.
+
+    :param agent: The agent type (key of AGENTS).
+    :param game: The game the agent plays.
+    :param backend: The storage used for the Q-table.
+
+    :return: The agent.
+    """
+    return AGENTS[agent](0.3, 0.9, 0.998849, game.get_state_id_hunter_1(), 0.0, 0.998849, backend,
+                         game.state_encoder, game.rng.spawn())
+
+
+def benchmark_agent(agent: str, backend: str, size: int, min_time=0.2, repeat=3) -> (float, float):
+    """
+    Measure the action selections and the updates per second of an agent,
+    on random states.
+
+    :param agent: The agent type (key of AGENTS).
+    :param backend: The storage used for the Q-table.
+    :param size: The width and height of the playing field.
+
+    :return: The number of action selections and of updates per second.
+    """
+    game = Game((size, size), 1, 0, seed=0)
+    hunter = create_agent(agent, game, backend)
+    states = game.rng.integers(game.state_encoder.num_states, size=(NB_STATES, 2)).tolist()
+    actions = game.rng.integers(NB_MOVES, size=(NB_STATES, 2)).tolist()
+    rewards = (game.rng.random(NB_STATES) < 0.01).astype(int).tolist()
+    choose_next_action = hunter.choose_joint_action if agent == "CQ" else hunter.choose_next_action
+
+    def run_action_selection(nb_operations):
+        for i in range(nb_operations):
+            hunter.set_state(states[i % NB_STATES][0])
+            choose_next_action()
+
+    def run_update(nb_operations):
+        for i in range(nb_operations):
+            state, new_state = states[i % NB_STATES]
+            action, other_action = actions[i % NB_STATES]
+            hunter.set_state(state)
+            hunter.update(new_state, action, rewards[i % NB_STATES], other_action, 100)
+
+    return measure_rate(run_action_selection, min_time, repeat), measure_rate(run_update, min_time, repeat)
+
+
+def benchmark_figure_5(agent: str, backend: str, size: int, total_train_episodes=50, eval_episodes=20,
+                       fast_kernel=False) -> float:
+    """
+    Measure the duration of a shortened figure 5 run (see
+    sim/simulation_figure_5.py).
+
+    :param agent: The agent type (key of FIGURE_5_AGENTS).
+    :param backend: The storage used for the Q-tables.
+    :param size: The width and height of the playing field.
+    :param total_train_episodes: The number of training episodes.
+    :param eval_episodes: The number of evaluation episodes every 10
+        training episodes.
+    :param fast_kernel: Play the learning episodes with the fast kernel.
+
+    :return: The duration of the run in seconds.
+    """
+    game = Game((size, size), 1, 0, 1, 0, is_prey_caught_homogeneous, seed=0)
+    if agent == "CQ":
+        config = Centralized_Config_Std("CQ", game, 0.3, 0.9, 0.998849, 0.0, 0.998849, backend)
+    else:
+        config = HunterConfig_Std(agent, AGENTS[agent], game, 0.3, 0.9, 0.998849, 0.0, 0.998849, backend)
+
+    start = perf_counter()
+    simulation(game, config, 10, eval_episodes, total_train_episodes, verbose=False, fast_kernel=fast_kernel)
+    return perf_counter() - start
+
+
+def run_benchmarks(sizes=(5, 7), backends=('dict', 'array'), min_time=0.2, repeat=3, total_train_episodes=50,
+                   eval_episodes=20, verbose=True) -> dict:
+    """
+    Run every benchmark on every playing field size.
+
+    :param sizes: The widths (and heights) of the playing fields.
+    :param backends: The storages of the Q-tables the agents are measured with.
+    :param min_time: The minimal duration of a measure in seconds.
+    :param repeat: The number of measures, the best one is kept.
+    :param total_train_episodes: The number of training episodes of the
+        figure 5 runs.
+    :param eval_episodes: The number of evaluation episodes of the figure 5 runs.
+    :param verbose: Print every result when it is measured.
+
+    :return: The results, with the name of every benchmark as key and its
+        value, unit and direction (higher or lower is better) as value.
+    """
+    results = {}
+
+    def add_result(name, value, unit, higher_is_better=True):
+        results[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+        if verbose:
+            print(f"{name:<45}{value:>14.3f} {unit}")
+
+    for size in sizes:
+        field = f"{size}x{size}"
+        add_result(f"game_step/{field}", benchmark_game(size, min_time, repeat), "steps/s")
+
+        for agent in AGENTS:
+            for backend in backends:
+                action_rate, update_rate = benchmark_agent(agent, backend, size, min_time, repeat)
+                add_result(f"action_selection/{agent}/{backend}/{field}", action_rate, "actions/s")
+                add_result(f"update/{agent}/{backend}/{field}", update_rate, "updates/s")
+
+        for agent in FIGURE_5_AGENTS:
+            for backend in backends:
+                add_result(f"figure_5/{agent}/{backend}/{field}",
+                           benchmark_figure_5(agent, backend, size, total_train_episodes, eval_episodes), "s",
+                           higher_is_better=False)
+            if 'array' in backends:
+                add_result(f"figure_5/{agent}/array_fast_kernel/{field}",
+                           benchmark_figure_5(agent, 'array', size, total_train_episodes, eval_episodes, True),
+                           "s", higher_is_better=False)
+
+    return results
+
+
+def get_metadata() -> dict:
+    """
+    Describe the environment the benchmarks were run in.
+
+    :return: The date, the versions of Python and NumPy and the machine.
+    """
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'processor': platform.processor(),
+    }
+
+
+def compare_results(results: dict, baseline: dict, threshold=0.1) -> [(str, float, float, float, bool)]:
+    """
+    Compare results with the results of a baseline.
+
+    :param results: The results (see run_benchmarks).
+    :param baseline: The results of the baseline.
+    :param threshold: The relative slowdown from which a change is a regression.
+
+    :return: For every benchmark present in both, its name, its baseline and
+        current values, the speedup (above 1 when faster, whatever the
+        unit) and whether it is a regression.
+    """
+    comparison = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        baseline_value, value = baseline[name]['value'], result['value']
+        speedup = value / baseline_value if result['higher_is_better'] else baseline_value / value
+        comparison.append((name, baseline_value, value, speedup, speedup < 1 - threshold))
+    return comparison
+
+
+def print_comparison(comparison: [(str, float, float, float, bool)]):
+    """
+    Print the comparison with a baseline as a table.
+
+    :param comparison: The comparison (see compare_results).
+    """
+    print(f"{'benchmark':<45}{'baseline':>14}{'current':>14}{'speedup':>10}")
+    for name, baseline_value, value, speedup, is_regression in comparison:
+        flag = "  REGRESSION" if is_regression else ""
+        print(f"{name:<45}{baseline_value:>14.3f}{value:>14.3f}{speedup:>9.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the speed of the game, the agents and training runs.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[5, 7], help="widths of the playing fields")
+    parser.add_argument("--backends", nargs="+", default=["dict", "array"], choices=["dict", "sparse", "array", "memmap"])
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimal duration of a measure (seconds)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of measures, the best one is kept")
+    parser.add_argument("--episodes", type=int, default=50, help="training episodes of the figure 5 runs")
+    parser.add_argument("--eval-episodes", type=int, default=20, help="evaluation episodes of the figure 5 runs")
+    parser.add_argument("--output", default="benchmark.json", help="file where the results are saved")
+    parser.add_argument("--compare", default=None, help="results of a baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.backends, args.min_time, args.repeat, args.episodes,
+                             args.eval_episodes)
+    with open(args.output, 'w') as output_file:
+        json.dump({'metadata': get_metadata(), 'results': results}, output_file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        comparison = compare_results(results, baseline['results'], args.threshold)
+        print()
+        print_comparison(comparison)
+        if any(is_regression for *_, is_regression in comparison):
+            sys.exit(1)
@@ -0,0 +1,47 @@
+from game import MultiHunterGame, is_prey_surrounded
+from multi_hunter_simulation import MultiHunterConfig, multi_hunter_simulation
+
+
+def simulation_multi_hunter():
+    # NOTE: to be sure, all parameters are set explicitly !!!!!
+    # game parameters: 4 hunters have to surround the prey
+
+    playing_field = (7, 7)
+    nb_hunters = 4
+    is_prey_caught_function = is_prey_surrounded
+    reward_all = 1
+    penalty_all = 0
+
+    game = MultiHunterGame(playing_field, nb_hunters, reward_all, penalty_all, is_prey_caught_function)
+
+    # general hunter parameters
+    alpha = 0.3
+    gamma = 0.9
+    tau = 0.998849
+    initial_q = 0.0
+    theta = 0.998849
+
+    config = MultiHunterConfig(name="Factored Q-learning with proposed action estimation (4 hunters)",
+                               game=game,
+                               alpha=alpha,
+                               gamma=gamma,
+                               tau=tau,
+                               initial_q=initial_q,
+                               theta=theta,
+                               backend='array')
+
+    # sim parameters
+    train_episodes_batch = 10
+    eval_episodes = 100
+    total_train_episodes = 2000
+
+    multi_hunter_simulation(game=game,
+                            hunter_config=config,
+                            train_episodes_batch=train_episodes_batch,
+                            eval_episodes=eval_episodes,
+                            total_train_episodes=total_train_episodes,
+                            metrics_file="metrics_multi_hunter.csv")
+
+
+if __name__ == "__main__":
+    simulation_multi_hunter()
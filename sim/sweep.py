@@ -0,0 +1,173 @@
+"""
+Run a grid of simulations (agent types x reward setups x seeds) in
+parallel, one process per run, and save the results of every run.
+
+Example, all agents of figure 5 with 8 seeds each:
+
+    python -m sim.sweep --agents CQ QwPAE QwRAE --setups homogeneous --seeds 0 1 2 3 4 5 6 7
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+
+from early_stopping import ConvergenceCriterion, EvaluationBudget
+from game import is_prey_caught_heterogeneous, is_prey_caught_homogeneous
+from qwpae_agent import QwRandomAEAgent
+from profiler import Profiler
+from qwsae_agent import QwSelfModelBaseAEAgent
+from simulation import *
+
+# agent type -> (name used as plot label, agent class, None for the centralized learner)
+AGENTS = {
+    "CQ": ("Centralized Q-learning", None),
+    "QwPAE": ("Q-learning with proposed action estimation", QwProposedAEAgent),
+    "QwRAE": ("Q-learning with randomly action estimation", QwRandomAEAgent),
+    "QwSAE": ("Q-learning with self-model based estimation", QwSelfModelBaseAEAgent),
+}
+
+# reward setup -> (reward hunter 1, penalty hunter 1, reward hunter 2, penalty hunter 2, capture function)
+REWARD_SETUPS = {
+    "homogeneous": (1, 0, 1, 0, is_prey_caught_homogeneous),  # figures 5 and 7
+    "different_rewards": (1, -0.01, 0.5, 0, is_prey_caught_homogeneous),  # figure 6
+    "heterogeneous": (1, 0, 1, 0, is_prey_caught_heterogeneous),  # figure 8
+}
+
+
+def run_one(agent: str, setup: str, seed: int, output_dir: str, playing_field=(7, 7), alpha=0.3, gamma=0.9,
+            tau=0.998849, initial_q=0.0, theta=0.998849, train_episodes_batch=10, eval_episodes=100,
+            total_train_episodes=2000, backend=None, batched_evaluation=False,
+            fast_kernel=False, async_evaluation=False, evaluation_budget=None, convergence=None,
+            profile=False) -> (str, str, int, str, str):
+    """
+    Train and evaluate one configuration with one seed and save its results.
+    The evaluation results are also written to a metrics_*.csv file while
+    the run goes on, so it can be monitored (see metrics_file.py).
+
+    :param agent: The agent type (key of AGENTS).
+    :param setup: The reward setup (key of REWARD_SETUPS).
+    :param seed: The seed of the run.
+    :param output_dir: The directory where the results are written.
+    :param backend: The storage used for the Q-tables (the default one of
+        the hunter configuration if None: 'array' for the centralized
+        learner and 'dict' for the other agents).
+    :param profile: Record the time spent in each phase of the run and save
+        the report into a profile_*.json file (see profiler.py).
+
+    The other parameters are the ones of the game, the hunters and
+    the simulation (see simulation.py).
+
+    :return: The agent type, the reward setup, the seed and the names of
+        the .csv and .npz files.
+    """
+    reward_hunter_1, penalty_hunter_1, reward_hunter_2, penalty_hunter_2, is_prey_caught_function = \
+        REWARD_SETUPS[setup]
+    game = Game(playing_field, reward_hunter_1, penalty_hunter_1, reward_hunter_2, penalty_hunter_2,
+                is_prey_caught_function, seed)
+
+    name, agent_type = AGENTS[agent]
+    backend_parameters = {} if backend is None else {'backend': backend}
+    if agent_type is None:
+        config = Centralized_Config_Std(name=name, game=game, alpha=alpha, gamma=gamma, tau=tau,
+                                        initial_q=initial_q, theta=theta, **backend_parameters)
+    else:
+        config = HunterConfig_Std(name=name, agent_type=agent_type, game=game, alpha=alpha, gamma=gamma, tau=tau,
+                                  initial_q=initial_q, theta=theta, **backend_parameters)
+
+    profiler = Profiler() if profile else None
+    simulation(game=game,
+               hunter_config=config,
+               train_episodes_batch=train_episodes_batch,
+               eval_episodes=eval_episodes,
+               total_train_episodes=total_train_episodes,
+               verbose=False,
+               batched_evaluation=batched_evaluation,
+               fast_kernel=fast_kernel,
+               async_evaluation=async_evaluation,
+               evaluation_workers=1,
+               evaluation_budget=evaluation_budget,
+               convergence=convergence,
+               profiler=profiler,
+               metrics_file=os.path.join(output_dir, f"metrics_{agent}_{setup}_seed{seed}.csv"))
+
+    filename_results, filename_hunter_config = save_results(config, total_train_episodes, output_dir,
+                                                            f"{setup}_seed{seed}")
+    if profiler is not None:
+        profiler.save(os.path.join(output_dir, f"profile_{agent}_{setup}_seed{seed}.json"))
+    return agent, setup, seed, filename_results, filename_hunter_config
+
+
+def run_sweep(agents: [str], setups: [str], seeds: [int], output_dir='results', max_workers=None,
+              **simulation_parameters) -> [(str, str, int, str, str)]:
+    """
+    Run every combination of agent type, reward setup and seed in a pool
+    of processes (one per core by default).
+
+    :param agents: The agent types (keys of AGENTS).
+    :param setups: The reward setups (keys of REWARD_SETUPS).
+    :param seeds: The seeds, every configuration is run once per seed.
+    :param output_dir: The directory where the results are written.
+    :param max_workers: The number of processes (number of cores if None).
+    :param simulation_parameters: Other parameters passed to run_one.
+
+    :return: The list of what run_one returned, in order of completion.
+    """
+    for agent in agents:
+        if agent not in AGENTS:
+            raise ValueError(f"unknown agent type: {agent}")
+    for setup in setups:
+        if setup not in REWARD_SETUPS:
+            raise ValueError(f"unknown reward setup: {setup}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    runs = list(product(agents, setups, seeds))
+    results = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_one, agent, setup, seed, output_dir, **simulation_parameters)
+                   for agent, setup, seed in runs]
+        for future in as_completed(futures):
+            results.append(future.result())
+            agent, setup, seed, filename_results, _ = results[-1]
+            print(f"[{len(results)}/{len(runs)}] {agent} {setup} seed {seed}: {filename_results}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a grid of simulations in parallel.")
+    parser.add_argument("--agents", nargs="+", default=["CQ", "QwPAE", "QwRAE"], choices=list(AGENTS))
+    parser.add_argument("--setups", nargs="+", default=["homogeneous"], choices=list(REWARD_SETUPS))
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--output-dir", default="results")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--episodes", type=int, default=2000, help="total number of training episodes")
+    parser.add_argument("--eval-episodes", type=int, default=100)
+    parser.add_argument("--backend", default=None, choices=["dict", "sparse", "array", "memmap"],
+                        help="storage of the Q-tables (default: array for CQ, dict for the other agents)")
+    parser.add_argument("--batched-evaluation", action="store_true",
+                        help="play the evaluation episodes of a batch at once")
+    parser.add_argument("--fast-kernel", action="store_true",
+                        help="play the learning episodes with the fast kernel (array or memmap backend)")
+    parser.add_argument("--async-evaluation", action="store_true",
+                        help="play the evaluations of every run in an extra process while it trains")
+    parser.add_argument("--eval-width", type=float, default=None,
+                        help="play the evaluation episodes until the 95%% confidence interval of the mean is "
+                             "within +/- this fraction of it (--eval-episodes at most)")
+    parser.add_argument("--convergence-window", type=int, default=None,
+                        help="stop a run once the averages of this number of last evaluations are converged")
+    parser.add_argument("--convergence-tolerance", type=float, default=0.05,
+                        help="relative band the last averages must lie in (default: 0.05)")
+    parser.add_argument("--profile", action="store_true",
+                        help="save the time spent in each phase of every run (profile_*.json)")
+    args = parser.parse_args()
+    evaluation_budget = EvaluationBudget(args.eval_width) if args.eval_width is not None else None
+    convergence = ConvergenceCriterion(args.convergence_window, args.convergence_tolerance) \
+        if args.convergence_window is not None else None
+
+    run_sweep(args.agents, args.setups, args.seeds, args.output_dir, args.workers,
+              total_train_episodes=args.episodes, eval_episodes=args.eval_episodes, backend=args.backend,
+              batched_evaluation=args.batched_evaluation, fast_kernel=args.fast_kernel,
+              async_evaluation=args.async_evaluation, evaluation_budget=evaluation_budget, convergence=convergence,
+              profile=args.profile)
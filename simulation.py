@@ -1,11 +1,28 @@
+import os
 import pickle
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 from datetime import datetime
+from time import perf_counter
 
 import numpy as np
 
+from agent import StateEncoder, sample_indices
 from centralized_agent import Centralized_Agent, Agent_Interface
-from game import Game
-from qwpae_agent import QwProposedAEAgent
+from checkpoint import CheckpointWriter, load_checkpoint
+from early_stopping import ConvergenceCriterion, EvaluationBudget
+import game as game_module
+from game import BatchedGame, Game
+from learning_kernel import check_fast_kernel, do_fast_learning_episode
+from metrics_file import MetricsWriter, compute_statistics, save_metrics_file
+from move import NB_MOVES
+from profiler import NullProfiler, Profiler
+from qwpae_agent import QwProposedAEAgent, QwRandomAEAgent
+from qwsae_agent import QwSelfModelBaseAEAgent
+from result_file import ResultFile, get_agents, save_result_file
+
+# agent classes that can be restored from a result file, by name
+AGENT_TYPES = {agent_type.__name__: agent_type
+               for agent_type in (QwProposedAEAgent, QwRandomAEAgent, QwSelfModelBaseAEAgent)}
 
 
 class HunterConfig:
@@ -13,7 +30,8 @@ class HunterConfig:
     Contain the configuration of the hunters playing the game.
     """
 
-    def __init__(self, name, agent_type, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None):
+    def __init__(self, name, agent_type, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None,
+                 backend='dict'):
         """initialize the hunter configuration
 
         :param name: Name of the agent type, will be used as label for the plot.
@@ -24,10 +42,15 @@ class HunterConfig:
         :param tau: Temperature used. Defaults to 0.998849.
         :param initial_q: The initial Q-value in the Q-table. Defaults to 0.0.
         :param theta: Used as initial theta for agents with internal model.
+        :param backend: The storage used for the Q-tables ('dict', 'sparse',
+            'array' or 'memmap').
         """
         self.name = name
-        self.hunter_1 = agent_type(alpha, gamma, tau, game.get_state_hunter_1(), initial_q, theta)
-        self.hunter_2 = agent_type(alpha, gamma, tau, game.get_state_hunter_2(), initial_q, theta)
+        self.game = game
+        self.hunter_1 = agent_type(alpha, gamma, tau, game.get_state_id_hunter_1(), initial_q, theta,
+                                   backend, game.state_encoder, game.rng.spawn())
+        self.hunter_2 = agent_type(alpha, gamma, tau, game.get_state_id_hunter_2(), initial_q, theta,
+                                   backend, game.state_encoder, game.rng.spawn())
         self.average_time_steps = None
         self.std_time_steps = None
         self.total_training_episodes = 0
@@ -36,8 +59,9 @@ class HunterConfig:
 class HunterConfig_Std(HunterConfig):
     """adds Std to the Hunter configuration"""
 
-    def __init__(self, name, agent_type, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None):
-        HunterConfig.__init__(self, name, agent_type, game, alpha, gamma, tau, initial_q, theta)
+    def __init__(self, name, agent_type, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None,
+                 backend='dict'):
+        HunterConfig.__init__(self, name, agent_type, game, alpha, gamma, tau, initial_q, theta, backend)
         self.std_time_steps = None
         self.max_time_steps = None
         self.min_time_steps = None
@@ -49,7 +73,8 @@ class Centralized_Config:
     Contain the configuration an agent coordinating the action of two hunters.
     """
 
-    def __init__(self, name, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None):
+    def __init__(self, name, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None,
+                 backend='array'):
         """initialize the hunter configuration
 
         :param name: Name of the agent type, will be used as label for the plot.
@@ -60,9 +85,15 @@ class Centralized_Config:
         :param tau: Temperature used. Defaults to 0.998849.
         :param initial_q: The initial Q-value in the Q-table. Defaults to 0.0.
         :param theta: Used as initial theta for agents with internal model.
+        :param backend: The storage used for the Q-tables ('dict', 'sparse',
+            'array' or 'memmap'). Defaults to 'array', whose rows of action
+            pairs are read at once by the action selection and the maximal
+            expected value (the 'dict' backend reads the 25 Q-values one by one).
         """
         self.name = name
-        hunter_manager = Centralized_Agent(alpha, gamma, tau, game.get_state_hunter_1(), initial_q, theta)
+        self.game = game
+        hunter_manager = Centralized_Agent(alpha, gamma, tau, game.get_state_id_hunter_1(), initial_q, theta,
+                                           backend, game.state_encoder, game.rng.spawn())
         self.hunter_1 = Agent_Interface(0, hunter_manager)
         self.hunter_2 = Agent_Interface(1, hunter_manager)
         self.std_time_steps = None
@@ -73,15 +104,30 @@ class Centralized_Config:
 class Centralized_Config_Std(Centralized_Config):
     """adds Std to centralized Configuration """
 
-    def __init__(self, name, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None):
-        Centralized_Config.__init__(self, name, game, alpha, gamma, tau, initial_q, theta)
+    def __init__(self, name, game, alpha=0.3, gamma=0.9, tau=0.998849, initial_q=0.0, theta=None,
+                 backend='array'):
+        Centralized_Config.__init__(self, name, game, alpha, gamma, tau, initial_q, theta, backend)
         self.std_time_steps = None
         self.max_time_steps = None
         self.min_time_steps = None
         self.mae_time_Steps = None
 
 
-def do_learning_episode(game: Game, hunters, episode: int):
+def choose_actions(hunters: tuple) -> (int, int):
+    """
+    Choose the next actions of both hunters, in a single call to the
+    centralized learner if it controls them.
+
+    :param hunters: A tuple with the 2 hunters.
+
+    :return: The actions of hunter 1 and hunter 2 (MOVE_*).
+    """
+    if isinstance(hunters[0], Agent_Interface):
+        return hunters[0].CA.choose_joint_action()
+    return hunters[0].choose_next_action(), hunters[1].choose_next_action()
+
+
+def do_learning_episode(game: Game, hunters, episode: int) -> int:
     """
     Play one learning episode (i.e. the hunters parameters
     get updated).
@@ -89,19 +135,67 @@ def do_learning_episode(game: Game, hunters, episode: int):
     :param game: The game to be played.
     :param hunters: A tuple with the 2 hunters.
     :param episode: The current episode of the game.
+
+    :return: The number of time steps of the episode.
     """
 
     score_hunter_1 = game.penalty_hunter_1
     score_hunter_2 = game.penalty_hunter_2
     game.reset_positions()
 
+    counter = 0
     while score_hunter_1 != game.reward_hunter_1 and score_hunter_2 != game.reward_hunter_2:
-        actions = hunters[0].choose_next_action(), hunters[1].choose_next_action()
+        actions = choose_actions(hunters)
 
         score_hunter_1, score_hunter_2 = game.play_one_episode(actions[0], actions[1])
 
-        hunters[0].update(game.get_state_hunter_1(), actions[0], score_hunter_1, actions[1], episode)
-        hunters[1].update(game.get_state_hunter_2(), actions[1], score_hunter_2, actions[0], episode)
+        hunters[0].update(game.get_state_id_hunter_1(), actions[0], score_hunter_1, actions[1], episode)
+        hunters[1].update(game.get_state_id_hunter_2(), actions[1], score_hunter_2, actions[0], episode)
+
+        counter += 1
+
+    return counter
+
+
+def do_profiled_learning_episode(game: Game, hunters, episode: int, profiler: Profiler) -> int:
+    """
+    Play one learning episode as do_learning_episode, recording the time
+    spent in each phase of the time steps.
+
+    :param game: The game to be played.
+    :param hunters: A tuple with the 2 hunters.
+    :param episode: The current episode of the game.
+    :param profiler: The profiler recording the phases.
+
+    :return: The number of time steps of the episode.
+    """
+    score_hunter_1 = game.penalty_hunter_1
+    score_hunter_2 = game.penalty_hunter_2
+    game.reset_positions()
+
+    counter = 0
+    while score_hunter_1 != game.reward_hunter_1 and score_hunter_2 != game.reward_hunter_2:
+        start = perf_counter()
+        actions = choose_actions(hunters)
+        action_time = perf_counter()
+
+        score_hunter_1, score_hunter_2 = game.play_one_episode(actions[0], actions[1])
+        game_time = perf_counter()
+
+        state_id_hunter_1, state_id_hunter_2 = game.get_state_id_hunter_1(), game.get_state_id_hunter_2()
+        state_time = perf_counter()
+
+        hunters[0].update(state_id_hunter_1, actions[0], score_hunter_1, actions[1], episode)
+        hunters[1].update(state_id_hunter_2, actions[1], score_hunter_2, actions[0], episode)
+        update_time = perf_counter()
+
+        profiler.add_time('action_selection', action_time - start)
+        profiler.add_time('play_one_episode', game_time - action_time)
+        profiler.add_time('state_construction', state_time - game_time)
+        profiler.add_time('update', update_time - state_time)
+        counter += 1
+
+    return counter
 
 
 def do_evaluation_episode(game: Game, hunters: tuple) -> int:
@@ -120,19 +214,204 @@ def do_evaluation_episode(game: Game, hunters: tuple) -> int:
 
     counter = 0
     while score_hunter_1 != game.reward_hunter_1 and score_hunter_2 != game.reward_hunter_2:
-        actions = hunters[0].choose_next_action(), hunters[1].choose_next_action()
+        actions = choose_actions(hunters)
         score_hunter_1, score_hunter_2 = game.play_one_episode(actions[0], actions[1])
 
-        hunters[0].set_state(game.get_state_hunter_1())
-        hunters[1].set_state(game.get_state_hunter_2())
+        hunters[0].set_state(game.get_state_id_hunter_1())
+        hunters[1].set_state(game.get_state_id_hunter_2())
 
         counter += 1
 
     return counter
 
 
+def get_policies(hunters: tuple) -> (tuple, tuple):
+    """
+    Freeze the policies of the hunters (see Agent.get_policy and Policy).
+
+    :param hunters: A tuple with the first and second hunters.
+
+    :return: The policies (the joint policy alone for the centralized
+        learner, a policy per hunter otherwise) and the random streams
+        the actions are drawn from.
+    """
+    if isinstance(hunters[0], Agent_Interface):
+        return (hunters[0].CA.get_policy(),), (hunters[0].CA.rng,)
+    return (hunters[0].get_policy(), hunters[1].get_policy()), (hunters[0].rng, hunters[1].rng)
+
+
+def get_evaluation_snapshot(game: Game, hunters: tuple) -> tuple:
+    """
+    Snapshot the policies of the hunters for a batched evaluation (see
+    play_snapshot_evaluation), with random streams spawned for it. The
+    evaluation neither changes the hunters nor draws from the streams of
+    the training, so the training goes on exactly as if there was no
+    evaluation, whether it is played in place or in the background.
+
+    :param game: The game played.
+    :param hunters: A tuple with the first and second hunters.
+
+    :return: The random stream of the batched games, the policies and
+        their random streams.
+    """
+    policies, rngs = get_policies(hunters)
+    return game.rng.spawn(), policies, tuple(rng.spawn() for rng in rngs)
+
+
+def play_batched_evaluation(batched_game: BatchedGame, policies: tuple, rngs: tuple) -> (np.ndarray, np.ndarray):
+    """
+    Play the evaluation episodes of a batched game in lockstep, with frozen
+    policies (see get_policies). Nothing but the arrays is used, so the
+    evaluation can be played in another process.
+
+    :param batched_game: The batched game, one game per evaluation episode
+        (without auto reset).
+    :param policies: The joint policy, or the policies of both hunters.
+    :param rngs: The random streams of the policies.
+
+    :return: The number of time steps before hunting successfully the
+        prey and the final state ids of both hunters, for each episode.
+    """
+    eval_episodes = batched_game.nb_games
+    episodes = np.arange(eval_episodes)  # episode played in each game of the batch
+    time_steps = np.zeros(eval_episodes, dtype=int)
+    final_states = np.zeros((eval_episodes, 2), dtype=int)
+
+    counter = 0
+    while batched_game.nb_games > 0:
+        state_ids_hunter_1, state_ids_hunter_2 = batched_game.get_state_ids()
+        if len(policies) == 2:
+            actions_hunter_1 = sample_indices(policies[0][state_ids_hunter_1], rngs[0])
+            actions_hunter_2 = sample_indices(policies[1][state_ids_hunter_2], rngs[1])
+        else:
+            actions_hunter_1, actions_hunter_2 = np.divmod(sample_indices(policies[0][state_ids_hunter_1], rngs[0]),
+                                                           NB_MOVES)
+
+        _, _, is_finished = batched_game.play_one_episode(actions_hunter_1, actions_hunter_2)
+        counter += 1
+
+        if np.any(is_finished):
+            finished_episodes = episodes[is_finished]
+            time_steps[finished_episodes] = counter
+            final_states[finished_episodes] = np.column_stack(batched_game.get_state_ids())[is_finished]
+
+            batched_game.keep_games(~is_finished)
+            episodes = episodes[~is_finished]
+
+    return time_steps, final_states
+
+
+def do_batched_evaluation(game: Game, hunters: tuple, eval_episodes: int, budget=None) -> np.ndarray:
+    """
+    Play all the evaluation episodes at once: the policies of the hunters
+    are frozen into arrays and the episodes are played in lockstep on
+    batched games (see get_evaluation_snapshot and play_snapshot_evaluation).
+    The hunters are not changed.
+
+    :param game: The game played (only its settings are used).
+    :param hunters: A tuple with the first and second hunters.
+    :param eval_episodes: The (maximal) number of evaluation episodes.
+    :param budget: The adaptive evaluation budget (see play_evaluation_rounds).
+
+    :return: The number of time steps before hunting successfully
+        the prey, for each episode.
+    """
+    return play_snapshot_evaluation(game, *get_evaluation_snapshot(game, hunters), eval_episodes, budget)
+
+
+def play_evaluation_rounds(play_round, eval_episodes: int, budget=None) -> np.ndarray:
+    """
+    Play the evaluation episodes at once, or in rounds until the budget
+    says the results are precise enough (see EvaluationBudget).
+
+    :param play_round: Function playing a number of evaluation episodes
+        and returning their time steps.
+    :param eval_episodes: The (maximal) number of evaluation episodes.
+    :param budget: The adaptive evaluation budget, all the episodes are
+        played at once if None.
+
+    :return: The number of time steps of each evaluation episode played.
+    """
+    if budget is None:
+        return np.asarray(play_round(eval_episodes))
+
+    time_steps = np.zeros(0)
+    while len(time_steps) < eval_episodes:
+        round_episodes = min(budget.round_episodes, eval_episodes - len(time_steps))
+        time_steps = np.concatenate((time_steps, play_round(round_episodes)))
+        if budget.is_enough(time_steps):
+            break
+    return time_steps
+
+
+def do_evaluation(game: Game, hunters: tuple, eval_episodes: int, batched_evaluation=False,
+                  budget=None, evaluation_episode=do_evaluation_episode) -> np.ndarray:
+    """
+    Play the evaluation episodes of one evaluation (see do_evaluation_episode
+    and do_batched_evaluation).
+
+    :param game: The game played.
+    :param hunters: A tuple with the first and second hunters.
+    :param eval_episodes: The (maximal) number of evaluation episodes.
+    :param batched_evaluation: Play the episodes of a round at once.
+    :param budget: The adaptive evaluation budget (see play_evaluation_rounds).
+    :param evaluation_episode: The function playing one evaluation episode
+        (game, hunters) -> time steps, when they are not batched.
+
+    :return: The number of time steps of each evaluation episode played.
+    """
+    if batched_evaluation:
+        return do_batched_evaluation(game, hunters, eval_episodes, budget)
+    return play_evaluation_rounds(lambda round_episodes: [evaluation_episode(game, hunters)
+                                                          for _ in range(round_episodes)],
+                                  eval_episodes, budget)
+
+
+def play_snapshot_evaluation(game: Game, game_rng, policies: tuple, rngs: tuple, eval_episodes: int,
+                             budget=None) -> np.ndarray:
+    """
+    Play the evaluation episodes of a snapshot of the policies, in rounds of
+    batched games (see play_batched_evaluation and play_evaluation_rounds).
+
+    :param game: The game played (only its settings are used).
+    :param game_rng: The random stream the batched games are spawned from.
+    :param policies: The joint policy, or the policies of both hunters.
+    :param rngs: The random streams of the policies.
+    :param eval_episodes: The (maximal) number of evaluation episodes.
+    :param budget: The adaptive evaluation budget.
+
+    :return: The number of time steps of each evaluation episode played.
+    """
+    def play_round(round_episodes):
+        batched_game = BatchedGame.from_game(game, round_episodes, auto_reset=False, rng=game_rng.spawn())
+        return play_batched_evaluation(batched_game, policies, rngs)[0]
+
+    return play_evaluation_rounds(play_round, eval_episodes, budget)
+
+
+def submit_evaluation(executor: Executor, game: Game, hunters: tuple, eval_episodes: int, budget=None) -> Future:
+    """
+    Snapshot the policies of the hunters and play the evaluation episodes
+    in the background (see get_evaluation_snapshot), the results are the
+    ones of do_batched_evaluation.
+
+    :param executor: The pool the evaluation is played in.
+    :param game: The game played (only its settings are used).
+    :param hunters: A tuple with the first and second hunters.
+    :param eval_episodes: The (maximal) number of evaluation episodes.
+    :param budget: The adaptive evaluation budget.
+
+    :return: The future of the time steps of the evaluation episodes.
+    """
+    return executor.submit(play_snapshot_evaluation, game, *get_evaluation_snapshot(game, hunters), eval_episodes,
+                           budget)
+
+
 def simulation(game: Game, hunter_config: HunterConfig, train_episodes_batch: int, eval_episodes: int,
-               total_train_episodes: int):
+               total_train_episodes: int, verbose=True, batched_evaluation=False, checkpoint_file=None,
+               checkpoint_interval=None, fast_kernel=False, profiler=None, metrics_file=None,
+               async_evaluation=False, evaluation_workers=None, evaluation_budget=None, convergence=None,
+               learning_episode=None, evaluation_episode=None):
     """
     Launch the complete sim (i.e. training and estimation) for one set
     of hunters. The result is stored into the hunter configuration.
@@ -144,42 +423,289 @@ def simulation(game: Game, hunter_config: HunterConfig, train_episodes_batch: in
     :param eval_episodes: number of evaluation episodes to be played between
         learning.
     :param total_train_episodes: the total amount of training episodes.
+    :param verbose: Print the progress and the evaluation results.
+    :param batched_evaluation: Play all the evaluation episodes of a batch at
+        once with the frozen policies of the hunters (needs hunters with a
+        state encoder), see do_batched_evaluation.
+    :param checkpoint_file: File where the progress of the simulation is saved
+        (see resume_simulation). No checkpoint is taken if None.
+    :param checkpoint_interval: Number of training episodes between two
+        checkpoints. Defaults to train_episodes_batch.
+    :param fast_kernel: Play the learning episodes with the fast kernel (see
+        learning_kernel.py), the hunters learn exactly as with the normal path.
+        Needs QwPAE, QwRAE or centralized hunters with array-backed tables.
+    :param profiler: Profiler recording the time spent in each phase and the
+        size of the tables (see profiler.py). No instrumentation if None.
+    :param metrics_file: CSV file where the results of every evaluation are
+        written as soon as it is finished (see metrics_file.py).
+    :param async_evaluation: Play the evaluations in a pool of processes
+        while the training goes on (see submit_evaluation). The training and
+        the curves are exactly the ones of batched_evaluation, whatever the
+        number of workers.
+    :param evaluation_workers: Number of processes playing the evaluations.
+        Defaults to the number of cores.
+    :param evaluation_budget: Adaptive number of evaluation episodes (see
+        EvaluationBudget), eval_episodes being the maximum. All the
+        eval_episodes are played if None.
+    :param convergence: Stop the training once the learning curve has
+        converged (see ConvergenceCriterion). The training is stopped at
+        the next evaluation, the results then only cover the episodes
+        trained (see hunter_config.converged_episode).
+    :param learning_episode: The function playing one learning episode
+        (game, hunters, episode) -> time steps, do_learning_episode if None
+        (e.g. do_multi_hunter_learning_episode for a MultiHunterGame).
+        Must be a module level function, as it is saved in the checkpoints.
+    :param evaluation_episode: The function playing one evaluation episode
+        (game, hunters) -> time steps, do_evaluation_episode if None.
+    """
+    if learning_episode is not None and fast_kernel:
+        raise ValueError("the fast kernel cannot play the episodes of learning_episode")
+    if evaluation_episode is not None and (batched_evaluation or async_evaluation):
+        raise ValueError("the batched evaluations cannot play the episodes of evaluation_episode")
+    if fast_kernel:
+        check_fast_kernel((hunter_config.hunter_1, hunter_config.hunter_2))
+
+    settings = {
+        'train_episodes_batch': train_episodes_batch,
+        'eval_episodes': eval_episodes,
+        'total_train_episodes': total_train_episodes,
+        'batched_evaluation': batched_evaluation,
+        'checkpoint_file': checkpoint_file,
+        'checkpoint_interval': checkpoint_interval or train_episodes_batch,
+        'fast_kernel': fast_kernel,
+        'metrics_file': metrics_file,
+        'async_evaluation': async_evaluation,
+        'evaluation_workers': evaluation_workers,
+        'evaluation_budget': evaluation_budget,
+        'convergence': convergence,
+        'learning_episode': learning_episode,
+        'evaluation_episode': evaluation_episode,
+    }
+    results = {name: np.zeros(total_train_episodes // train_episodes_batch)
+               for name in ('average', 'std', 'max', 'min', 'mae')}
+
+    run_simulation(game, hunter_config, settings, results, 0, verbose, profiler)
+
+
+def resume_simulation(checkpoint_file: str, verbose=True, profiler=None) -> (Game, HunterConfig, int):
     """
+    Continue a simulation from its last checkpoint. The random streams of
+    the game and of the hunters are restored with them, so the simulation
+    goes on exactly as if it had never been interrupted.
 
-    hunter_1 = hunter_config.hunter_1
-    hunter_2 = hunter_config.hunter_2
+    :param checkpoint_file: The checkpoint file given to simulation().
+    :param verbose: Print the progress and the evaluation results.
+    :param profiler: Profiler of the rest of the run (see simulation()).
 
-    average_time_steps = np.zeros(total_train_episodes // train_episodes_batch)
-    std_time_steps = np.zeros(total_train_episodes // train_episodes_batch)
-    max_time_steps = np.zeros(total_train_episodes // train_episodes_batch)
-    min_time_steps = np.zeros(total_train_episodes // train_episodes_batch)
-    mae_time_steps = np.zeros(total_train_episodes // train_episodes_batch)
+    :return: The game, the hunter configuration (where the results are
+        stored) and the total amount of training episodes.
+    """
+    checkpoint = load_checkpoint(checkpoint_file)
 
-    start_time = datetime.now()
+    game = checkpoint['game']
+    hunter_config = checkpoint['hunter_config']
+    settings = checkpoint['settings']
+    settings['checkpoint_file'] = checkpoint_file
+
+    run_simulation(game, hunter_config, settings, checkpoint['results'], checkpoint['episode'], verbose, profiler)
+
+    return game, hunter_config, settings['total_train_episodes']
 
-    for episode in range(total_train_episodes):
-        if episode % 10 == 0:
-            print(f"learning episode {episode}")
-
-        # Estimate the performances
-        if episode % train_episodes_batch == 0:
-            time_steps = np.zeros(eval_episodes)
-            for eval_episode in range(eval_episodes):
-                time_steps[eval_episode] = do_evaluation_episode(game, (hunter_1, hunter_2))
-
-            index = episode // train_episodes_batch
-            average_time_steps[index] = np.average(time_steps)
-            std_time_steps[index] = np.std(time_steps)
-            max_time_steps[index] = np.max(time_steps)
-            min_time_steps[index] = np.min(time_steps)
-            mae_time_steps[index] = np.average(np.abs(time_steps - average_time_steps[index]))
+
+def get_hunters(hunter_config) -> tuple:
+    """
+    Get the hunters of a hunter configuration, in the order of the game.
+
+    :param hunter_config: The hunter configuration.
+
+    :return: The hunters of a MultiHunterConfig, or the first and second
+        hunters.
+    """
+    if hasattr(hunter_config, 'hunters'):
+        return tuple(hunter_config.hunters)
+    return hunter_config.hunter_1, hunter_config.hunter_2
+
+
+def get_memory_usage(agent) -> int:
+    """
+    Estimate the memory used by the Q-table and the internal model of an
+    agent (see DictQTable.memory_usage).
+
+    :param agent: The agent.
+
+    :return: The number of bytes.
+    """
+    memory_usage = agent.q_table.memory_usage()
+    if hasattr(agent, 'internal_model'):
+        memory_usage += agent.internal_model.memory_usage()
+    return memory_usage
+
+
+def compact_tables(agents: list) -> int:
+    """
+    Remove the entries of the Q-tables and internal models holding their
+    initial value (see DictQTable.compact). The tables are rewritten in
+    place, but the learned values and the behaviour of the agents are
+    unchanged.
+
+    :param agents: The agents.
+
+    :return: The number of entries removed.
+    """
+    nb_removed = 0
+    for agent in agents:
+        nb_removed += agent.q_table.compact()
+        if hasattr(agent, 'internal_model'):
+            nb_removed += agent.internal_model.compact()
+    return nb_removed
+
+
+def run_simulation(game: Game, hunter_config: HunterConfig, settings: dict, results: dict, first_episode: int,
+                   verbose=True, profiler=None):
+    """
+    Play the training and evaluation episodes of a simulation, starting
+    from a given episode, and store the results in the hunter configuration.
+
+    :param game: The game played.
+    :param hunter_config: The hunter configuration object containing the hunters.
+    :param settings: The parameters of the simulation (see simulation()).
+    :param results: The arrays of the evaluation statistics ('average', 'std',
+        'max', 'min' and 'mae'), filled up to first_episode.
+    :param first_episode: The first training episode to play.
+    :param verbose: Print the progress and the evaluation results.
+    :param profiler: Profiler recording the phases and counters (see
+        simulation()).
+    """
+    profiler = profiler if profiler is not None else NullProfiler()
+    agents = get_agents(hunter_config)
+    hunters = get_hunters(hunter_config)
+
+    # the episode functions of the game played (see simulation())
+    learning_episode = settings.get('learning_episode') or do_learning_episode
+    evaluation_episode = settings.get('evaluation_episode') or do_evaluation_episode
+
+    train_episodes_batch = settings['train_episodes_batch']
+    eval_episodes = settings['eval_episodes']
+    total_train_episodes = settings['total_train_episodes']
+    checkpoint_file = settings['checkpoint_file']
+
+    average_time_steps = results['average']
+    std_time_steps = results['std']
+    max_time_steps = results['max']
+    min_time_steps = results['min']
+    mae_time_steps = results['mae']
+
+    metrics_writer = None
+    if settings.get('metrics_file') is not None:
+        metrics_writer = MetricsWriter(settings['metrics_file'], hunter_config.name, total_train_episodes,
+                                       train_episodes_batch, first_episode)
+    checkpoint_writer = CheckpointWriter(checkpoint_file) if checkpoint_file is not None else None
+
+    evaluation_budget = settings.get('evaluation_budget')
+    convergence = settings.get('convergence')
+    nb_evaluations = -(-first_episode // train_episodes_batch)  # evaluations done before first_episode
+    is_converged = convergence is not None and nb_evaluations > 0 and \
+        convergence.is_converged(average_time_steps[:nb_evaluations], (nb_evaluations - 1) * train_episodes_batch)
+
+    def record_evaluation(episode, time_steps):
+        nonlocal is_converged
+        index = episode // train_episodes_batch
+        statistics = compute_statistics(time_steps)
+        for name, values in results.items():
+            values[index] = statistics[name]
+        if metrics_writer is not None:
+            metrics_writer.write(episode, statistics, time_steps)
+        if verbose:
             print(f"timesteps evaluation: (average: {average_time_steps[index]}," +
                   f" std: {round(std_time_steps[index])})" +
                   f" min: {min_time_steps[index]}, max: {max_time_steps[index]}," +
                   f" MAE: {mae_time_steps[index]}")
+        profiler.count('eval_episodes', len(time_steps))
+        if convergence is not None:
+            is_converged = is_converged or convergence.is_converged(average_time_steps[:index + 1], episode)
+
+    # evaluations played in the background (episode, future), recorded in order when they are finished
+    executor = ProcessPoolExecutor(settings['evaluation_workers']) if settings.get('async_evaluation') else None
+    pending_evaluations = []
 
-        # Do one learning episode
-        do_learning_episode(game, (hunter_1, hunter_2), episode)
+    def record_finished_evaluations(wait=False):
+        while pending_evaluations and (wait or pending_evaluations[0][1].done()):
+            episode, future = pending_evaluations.pop(0)
+            with profiler.phase('evaluation_wait'):
+                time_steps = future.result()
+            record_evaluation(episode, time_steps)
+
+    start_time = datetime.now()
+    converged_episode = None
+
+    try:
+        for episode in range(first_episode, total_train_episodes):
+            if verbose and episode % 10 == 0:
+                print(f"learning episode {episode}")
+
+            # Estimate the performances
+            if episode % train_episodes_batch == 0:
+                if is_converged:
+                    converged_episode = episode
+                    break
+
+                with profiler.phase('evaluation'):
+                    if executor is not None:
+                        pending_evaluations.append((episode, submit_evaluation(
+                            executor, game, hunters, eval_episodes, evaluation_budget)))
+                    else:
+                        time_steps = do_evaluation(game, hunters, eval_episodes, settings['batched_evaluation'],
+                                                   evaluation_budget, evaluation_episode)
+
+                if profiler.enabled:
+                    profiler.count('learned_q_values', [agent.q_table.count_learned() for agent in agents])
+                    profiler.count('learned_estimations', [agent.internal_model.count_learned() for agent in agents
+                                                           if hasattr(agent, 'internal_model')])
+                    profiler.count('memory_usage', [get_memory_usage(agent) for agent in agents])
+
+                if executor is None:
+                    record_evaluation(episode, time_steps)
+            record_finished_evaluations()
+
+            # Do one learning episode
+            with profiler.phase('learning_episode'):
+                if settings.get('fast_kernel'):
+                    steps = do_fast_learning_episode(game, hunters, episode)
+                elif profiler.enabled and learning_episode is do_learning_episode:
+                    steps = do_profiled_learning_episode(game, hunters, episode, profiler)
+                else:
+                    steps = learning_episode(game, hunters, episode)
+            profiler.count('steps_per_episode', steps)
+
+            if checkpoint_file is not None and (episode + 1) % settings['checkpoint_interval'] == 0:
+                # the results of a checkpoint must be complete up to its episode
+                record_finished_evaluations(wait=True)
+                with profiler.phase('checkpoint'):
+                    checkpoint_size = checkpoint_writer.save({
+                        'game': game,
+                        'hunter_config': hunter_config,
+                        'settings': settings,
+                        'results': results,
+                        'episode': episode + 1,
+                    }, agents)
+                profiler.count('checkpoint_size', checkpoint_size)
+        record_finished_evaluations(wait=True)
+    finally:
+        if executor is not None:
+            for _, future in pending_evaluations:
+                future.cancel()
+            executor.shutdown()
+        if metrics_writer is not None:
+            metrics_writer.close()
+
+    if converged_episode is not None:
+        nb_evaluations = converged_episode // train_episodes_batch
+        average_time_steps, std_time_steps, max_time_steps, min_time_steps, mae_time_steps = \
+            (results[name][:nb_evaluations] for name in ('average', 'std', 'max', 'min', 'mae'))
+        if verbose:
+            print(f"learning curve converged, training stopped at episode {converged_episode}")
+    hunter_config.converged_episode = converged_episode
+    hunter_config.train_episodes_batch = train_episodes_batch
 
     hunter_config.average_time_steps = average_time_steps
 
@@ -191,29 +717,115 @@ def simulation(game: Game, hunter_config: HunterConfig, train_episodes_batch: in
         hunter_config.mae_time_Steps = mae_time_steps
 
     end_time = datetime.now()
-    print(f"\nduration testrun:{end_time - start_time}")
+    if verbose:
+        print(f"\nduration testrun:{end_time - start_time}")
 
 
-def save_results(hunter_config: HunterConfig, total_train_episodes: int):
+def save_results(hunter_config: HunterConfig, total_train_episodes: int, directory='.', run_id=None,
+                 train_episodes_batch=None):
     """
-    Save the result into a .csv and .bin files.
+    Save the result into a .csv (see metrics_file.py) and a .npz files (see
+    result_file.py).
 
     :param hunter_config: The hunter configuration (where
         the results are stored).
     :param total_train_episodes: The total number of episodes
-        the agents were trained.
+        the agents were trained (replaced by the episode the training
+        was stopped at if the learning curve converged).
+    :param directory: The directory where the files are written.
+    :param run_id: Identifier added to the file names (e.g. the seed),
+        so that runs finishing in the same minute do not overwrite
+        each other.
+    :param train_episodes_batch: Number of training episodes between two
+        evaluations. Defaults to the one of the simulation of the hunter
+        configuration (see simulation()).
+
+    :return: The names of the .csv and .npz files.
     """
     now = datetime.now()
     timestamp = now.strftime('%d%m%Y_%H%M')
-    filename_results = f"results_{hunter_config.name}_{timestamp}.csv"
-    filename_hunter_config = f"hunters_{hunter_config.name}_{timestamp}.bin"
+    if run_id is not None:
+        timestamp = f"{run_id}_{timestamp}"
+    filename_results = os.path.join(directory, f"results_{hunter_config.name}_{timestamp}.csv")
+    filename_hunter_config = os.path.join(directory, f"hunters_{hunter_config.name}_{timestamp}.npz")
+    if getattr(hunter_config, 'converged_episode', None) is not None:
+        # the training was stopped early (see simulation())
+        total_train_episodes = hunter_config.converged_episode
     hunter_config.total_training_episodes = total_train_episodes
 
-    np.savetxt(filename_results, hunter_config.average_time_steps,
-               header=f"{hunter_config.name} {total_train_episodes}", delimiter=';', fmt='%u')
+    if train_episodes_batch is None:
+        train_episodes_batch = getattr(hunter_config, 'train_episodes_batch', None)
+    if train_episodes_batch is None:
+        # configurations of older versions or loaded from a result file do not store it
+        nb_evaluations = len(hunter_config.average_time_steps) if hunter_config.average_time_steps is not None else 0
+        train_episodes_batch = total_train_episodes // max(nb_evaluations, 1)
 
-    with open(filename_hunter_config, 'wb') as hunter_config_list_file:
-        pickle.dump(hunter_config, hunter_config_list_file)
+    save_metrics_file(filename_results, hunter_config.name, total_train_episodes, train_episodes_batch, {
+        'average': hunter_config.average_time_steps,
+        'std': getattr(hunter_config, 'std_time_steps', None),
+        'max': getattr(hunter_config, 'max_time_steps', None),
+        'min': getattr(hunter_config, 'min_time_steps', None),
+        'mae': getattr(hunter_config, 'mae_time_Steps', None),
+    })
+
+    save_result_file(filename_hunter_config, hunter_config, total_train_episodes)
+
+    return filename_results, filename_hunter_config
+
+
+def load_hunter_config(filename: str, playing_field_size: tuple = (7, 7)) -> HunterConfig:
+    """
+    Load a hunter configuration saved by save_results, from a .npz result
+    file or from a pickled .bin file of an older version.
+
+    :param filename: The name of the file.
+    :param playing_field_size: Size of game board (width, height) of a
+        .bin file, which does not record it (the size of the .npz files
+        is read from their metadata).
+
+    :return: The hunter configuration, with its game, agents and results.
+    """
+    if os.path.splitext(filename)[1] == ".bin":
+        with open(filename, 'rb') as hunter_config_file:
+            hunter_config = pickle.load(hunter_config_file)
+        # agents pickled before the states were encoded are keyed by relative positions
+        state_encoder = StateEncoder(playing_field_size)
+        for agent in get_agents(hunter_config):
+            if agent.state_encoder is None:
+                agent.set_state_encoder(state_encoder)
+        return hunter_config
+
+    with ResultFile(filename) as result_file:
+        metadata = result_file.metadata
+        game = Game(tuple(metadata['playing_field_size']),
+                    metadata['reward_hunter_1'], metadata['penalty_hunter_1'],
+                    metadata['reward_hunter_2'], metadata['penalty_hunter_2'],
+                    getattr(game_module, metadata['is_prey_caught_function']))
+        parameters = dict(game=game, alpha=metadata['alpha'], gamma=metadata['gamma'],
+                          tau=metadata['temperature'], initial_q=metadata['initial_q'], theta=metadata['theta'],
+                          backend=metadata['backend'])
+
+        if metadata['agent_type'] == Centralized_Agent.__name__:
+            hunter_config = Centralized_Config_Std(metadata['name'], **parameters)
+            agents = [hunter_config.hunter_1.CA]
+        else:
+            hunter_config = HunterConfig_Std(metadata['name'], AGENT_TYPES[metadata['agent_type']], **parameters)
+            agents = [hunter_config.hunter_1, hunter_config.hunter_2]
+
+        for hunter, agent in enumerate(agents, start=1):
+            agent.q_table.load_array(result_file.get_q_table(hunter))
+            internal_model = result_file.get_internal_model(hunter)
+            if internal_model is not None:
+                agent.internal_model.load_action_prob_table(internal_model)
+
+        hunter_config.average_time_steps = result_file.get_metric('average_time_steps')
+        hunter_config.std_time_steps = result_file.get_metric('std_time_steps')
+        hunter_config.max_time_steps = result_file.get_metric('max_time_steps')
+        hunter_config.min_time_steps = result_file.get_metric('min_time_steps')
+        hunter_config.mae_time_Steps = result_file.get_metric('mae_time_steps')
+        hunter_config.total_training_episodes = result_file.total_training_episodes
+
+    return hunter_config
 
 
 def start_simulation(train_episodes_batch=10, eval_episodes=100, total_train_episodes=2000):
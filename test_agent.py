@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+
+from agent import boltzmann_probabilities, sample_index
+from game import Game
+from move import NB_MOVES
+from qtable import ArrayQTable
+from qwpae_agent import QwProposedAEAgent
+from simulation import Centralized_Config, HunterConfig, do_learning_episode
+
+
+class TestBoltzmann(unittest.TestCase):
+
+    def test_small_temperature(self):
+        """ Test if tiny temperatures give a valid (greedy) distribution instead of overflowing """
+        probabilities = boltzmann_probabilities(np.array([0.5, 1.0, 0.2, 0.0, 0.9]), 1e-4)
+        self.assertFalse(np.any(np.isnan(probabilities)))
+        np.testing.assert_allclose(probabilities, [0, 1, 0, 0, 0])
+
+    def test_uniform_values(self):
+        """ Test if equal values give a uniform distribution """
+        np.testing.assert_allclose(boltzmann_probabilities(np.zeros(5), 0.2), np.full(5, 0.2))
+
+    def test_sample_index(self):
+        """ Test if indices with a probability of zero are never drawn """
+        np.random.seed(0)
+        probabilities = np.array([0, 0.5, 0, 0.5, 0])
+        samples = [sample_index(probabilities) for _ in range(200)]
+        self.assertEqual(set(samples), {1, 3})
+
+
+class TestMaxEVCache(unittest.TestCase):
+
+    def check_cache(self, config, agents):
+        """ Check that every cached maximal expected value is the one computed from the tables """
+        for episode in range(10):
+            do_learning_episode(config.game, (config.hunter_1, config.hunter_2), episode)
+
+        for agent in agents:
+            self.assertGreater(len(agent.max_EV_cache), 0)
+            for state_id, ev_max in agent.max_EV_cache.items():
+                self.assertEqual(ev_max, agent.compute_max_EV_next(state_id))
+
+    def test_proposed_action_estimation(self):
+        """ Test the cache of QwPAE hunters, invalidated by the Q-values and the internal model """
+        for backend in ('dict', 'array'):
+            config = HunterConfig("test", QwProposedAEAgent, Game((5, 5), 1, 0, seed=2), theta=0.998849,
+                                  backend=backend)
+            self.check_cache(config, [config.hunter_1, config.hunter_2])
+
+    def test_centralized(self):
+        """ Test the cache of the centralized learner """
+        for backend in ('dict', 'array'):
+            config = Centralized_Config("test", Game((5, 5), 1, 0, seed=2), theta=0.998849, backend=backend)
+            self.check_cache(config, [config.hunter_1.CA])
+
+
+class TestJointAction(unittest.TestCase):
+
+    def test_same_actions(self):
+        """ Test if the joint action is the one chosen through the two agent interfaces """
+        for backend in ('dict', 'array'):
+            configs = [Centralized_Config("test", Game((5, 5), 1, 0, seed=3), theta=0.998849, backend=backend)
+                       for _ in range(2)]
+            for config in configs:
+                for episode in range(5):
+                    do_learning_episode(config.game, (config.hunter_1, config.hunter_2), episode)
+
+            joint, interfaces = configs[0], configs[1]
+            for state_id in range(0, joint.game.state_encoder.num_states, 7):
+                joint.hunter_1.CA.set_state(state_id)
+                interfaces.hunter_1.CA.set_state(state_id)
+                self.assertEqual(joint.hunter_1.CA.choose_joint_action(),
+                                 (interfaces.hunter_1.choose_next_action(), interfaces.hunter_2.choose_next_action()))
+
+    def test_default_backend(self):
+        """ Test if the centralized learner stores its action pairs in an array by default """
+        config = Centralized_Config("test", Game((5, 5), 1, 0, seed=3), theta=0.998849)
+        self.assertIsInstance(config.hunter_1.CA.q_table, ArrayQTable)
+
+    def test_max_EV_next(self):
+        """ Test if the maximal expected value is the maximum over every action pair """
+        config = Centralized_Config("test", Game((5, 5), 1, 0, seed=3), theta=0.998849, backend='array')
+        for episode in range(5):
+            do_learning_episode(config.game, (config.hunter_1, config.hunter_2), episode)
+
+        agent = config.hunter_1.CA
+        for state_id in range(config.game.state_encoder.num_states):
+            expected = max(agent.predict_reward(state_id, (action_1, action_2))
+                           for action_1 in range(NB_MOVES) for action_2 in range(NB_MOVES))
+            self.assertEqual(agent.compute_max_EV_next(state_id), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
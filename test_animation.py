@@ -0,0 +1,39 @@
+import os
+import unittest
+from unittest import mock
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import animation
+from game import Game
+from move import NB_MOVES
+
+
+class TestShowcase(unittest.TestCase):
+
+    def test_showcase_from_file(self):
+        """ Test if the hunters of a .bin file of the results folder are loaded and play the game shown """
+        filename = os.path.join(os.path.dirname(__file__), "results", "figure5_V2_with_STD",
+                                "hunters_Q-learning with randomly action estimation_02012021_2200.bin")
+        game = Game((7, 7), 1, -1, seed=0)
+        with mock.patch.object(animation, 'game_showcase') as game_showcase:
+            animation.showcase_from_file(game, filename)
+        shown_game, hunter_config = game_showcase.call_args.args
+        self.assertIs(shown_game, game)
+
+        hunter_1, hunter_2 = hunter_config.hunter_1, hunter_config.hunter_2
+        game.reset_positions()
+        hunter_1.set_state(game.get_state_hunter_1())
+        hunter_2.set_state(game.get_state_hunter_2())
+        for _ in range(10):
+            actions = hunter_1.choose_next_action(), hunter_2.choose_next_action()
+            self.assertTrue(all(0 <= action < NB_MOVES for action in actions))
+            game.play_one_episode(*actions)
+            hunter_1.set_state(game.get_state_hunter_1())
+            hunter_2.set_state(game.get_state_hunter_2())
+
+
+if __name__ == '__main__':
+    unittest.main()
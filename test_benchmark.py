@@ -0,0 +1,40 @@
+import unittest
+
+from sim.benchmark import benchmark_agent, compare_results, measure_rate
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_measure_rate(self):
+        """ Test if the rate is measured on runs lasting at least the minimal time """
+        durations = []
+
+        def run(nb_operations):
+            durations.append(nb_operations)
+            sum(range(nb_operations * 100))
+
+        rate = measure_rate(run, min_time=0.01, repeat=2)
+        self.assertGreater(rate, 0)
+        self.assertEqual(durations[-1], durations[-2])
+
+    def test_agents(self):
+        """ Test if every agent type can be measured """
+        for agent in ("CQ", "QwPAE", "QwRAE", "QwSAE"):
+            action_rate, update_rate = benchmark_agent(agent, 'array', 5, min_time=0.001, repeat=1)
+            self.assertGreater(action_rate, 0)
+            self.assertGreater(update_rate, 0)
+
+    def test_compare_results(self):
+        """ Test if the speedups take the direction of each benchmark into account """
+        baseline = {'game_step/7x7': {'value': 1000.0, 'unit': 'steps/s', 'higher_is_better': True},
+                    'figure_5/QwPAE/dict/7x7': {'value': 10.0, 'unit': 's', 'higher_is_better': False}}
+        results = {'game_step/7x7': {'value': 800.0, 'unit': 'steps/s', 'higher_is_better': True},
+                   'figure_5/QwPAE/dict/7x7': {'value': 5.0, 'unit': 's', 'higher_is_better': False},
+                   'game_step/9x9': {'value': 500.0, 'unit': 'steps/s', 'higher_is_better': True}}
+        comparison = {name: (speedup, is_regression)
+                      for name, _, _, speedup, is_regression in compare_results(results, baseline, 0.1)}
+        self.assertEqual(comparison, {'game_step/7x7': (0.8, True), 'figure_5/QwPAE/dict/7x7': (2.0, False)})
+
+
+if __name__ == '__main__':
+    unittest.main()
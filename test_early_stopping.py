@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from early_stopping import ConvergenceCriterion, EvaluationBudget
+
+
+class TestEvaluationBudget(unittest.TestCase):
+
+    def test_is_enough(self):
+        """ Test if the evaluation stops once the confidence interval is narrow enough """
+        budget = EvaluationBudget(relative_width=0.1)
+        self.assertFalse(budget.is_enough(np.array([10])))
+        self.assertTrue(budget.is_enough(np.array([10, 10, 10])))
+        self.assertFalse(budget.is_enough(np.array([1, 19, 10])))
+        self.assertTrue(budget.is_enough(np.array([9, 11] * 50)))
+
+    def test_half_width(self):
+        """ Test the half-width of the 95% confidence interval """
+        budget = EvaluationBudget()
+        self.assertAlmostEqual(budget.get_half_width(np.array([8, 12, 8, 12])), 1.96 * np.std([8, 12, 8, 12], ddof=1) / 2)
+
+
+class TestConvergenceCriterion(unittest.TestCase):
+
+    def test_is_converged(self):
+        """ Test if the curve converged once its last averages are within the band """
+        criterion = ConvergenceCriterion(window=3, tolerance=0.1)
+        self.assertFalse(criterion.is_converged(np.array([100, 10]), 10))
+        self.assertFalse(criterion.is_converged(np.array([100, 10, 11, 13]), 30))
+        self.assertTrue(criterion.is_converged(np.array([100, 10, 11, 10.5]), 30))
+
+    def test_min_episodes(self):
+        """ Test if the training is never stopped before the minimal number of episodes """
+        criterion = ConvergenceCriterion(window=2, tolerance=0.1, min_episodes=100)
+        self.assertFalse(criterion.is_converged(np.array([10, 10]), 90))
+        self.assertTrue(criterion.is_converged(np.array([10, 10, 10]), 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
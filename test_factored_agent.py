@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from checkpoint import CheckpointWriter
+from factored_agent import FactoredAgent
+from game import MultiHunterGame
+from metrics_file import load_metrics_file
+from multi_hunter_simulation import MultiHunterConfig, do_multi_hunter_learning_episode, multi_hunter_simulation
+from qwpae_agent import QwProposedAEAgent
+from simulation import resume_simulation
+
+
+class TestFactoredAgent(unittest.TestCase):
+
+    def setUp(self):
+        self.game = MultiHunterGame((5, 5), 3, 1, 0, seed=0)
+        self.config = MultiHunterConfig("test", self.game, backend='array')
+        for episode in range(3):
+            do_multi_hunter_learning_episode(self.game, self.config.hunters, episode)
+
+    def test_one_factor_per_other_hunter(self):
+        """ Test if every hunter has a factor on its state with each other hunter """
+        for hunter, agent in enumerate(self.config.hunters):
+            self.assertEqual(len(agent.factors), 2)
+            self.assertTrue(all(isinstance(factor, QwProposedAEAgent) for factor in agent.factors))
+            self.assertEqual(agent.state, self.game.get_state_ids(hunter))
+
+    def test_expected_values(self):
+        """ Test if the expected values are the average of the expectations of the factors """
+        for agent in self.config.hunters:
+            expected = np.mean([[factor.expected_value(action) for action in range(5)]
+                                for factor in agent.factors], axis=0)
+            np.testing.assert_allclose(agent.expected_values(), expected)
+
+    def test_update(self):
+        """ Test if each factor learns from the action of its other hunter """
+        agent = FactoredAgent(0.5, 0.9, 0.998849, [0, 1], backend='array', state_encoder=self.game.state_encoder)
+        agent.update([2, 3], 1, 1, [4, 0])
+        self.assertEqual(agent.factors[0].q_table.get(0, 1, 4), 0.5)
+        self.assertEqual(agent.factors[1].q_table.get(1, 1, 0), 0.5)
+        self.assertEqual(agent.state, [2, 3])
+
+
+class TestMultiHunterSimulation(unittest.TestCase):
+
+    def run_simulation(self, backend, metrics_file=None, checkpoint_file=None):
+        game = MultiHunterGame((5, 5), 3, 1, 0, seed=1)
+        config = MultiHunterConfig("test", game, backend=backend)
+        multi_hunter_simulation(game, config, 5, 5, 20, verbose=False, metrics_file=metrics_file,
+                                checkpoint_file=checkpoint_file, checkpoint_interval=10)
+        return config
+
+    def test_backends(self):
+        """ Test if the dict and array backends give the same results """
+        np.testing.assert_array_equal(self.run_simulation('dict').average_time_steps,
+                                      self.run_simulation('array').average_time_steps)
+
+    def test_metrics_file(self):
+        """ Test if the evaluations are written into the metrics file """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "metrics.csv")
+            config = self.run_simulation('array', filename)
+            metrics = load_metrics_file(filename)
+        np.testing.assert_array_equal(metrics['episodes'], [0, 5, 10, 15])
+        np.testing.assert_array_equal(metrics['average'], config.average_time_steps)
+
+    def test_resume(self):
+        """ Test if a simulation resumed after its first checkpoint gives the results of an uninterrupted one """
+        expected_config = self.run_simulation('array')
+
+        save = CheckpointWriter.save
+
+        def crashing_save(checkpoint_writer, checkpoint, agents):
+            save(checkpoint_writer, checkpoint, agents)
+            raise KeyboardInterrupt
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_file = os.path.join(directory, "checkpoint.pkl")
+            with mock.patch.object(CheckpointWriter, 'save', crashing_save):
+                self.assertRaises(KeyboardInterrupt, self.run_simulation, 'array', checkpoint_file=checkpoint_file)
+            _, config, _ = resume_simulation(checkpoint_file, verbose=False)
+
+        np.testing.assert_array_equal(config.average_time_steps, expected_config.average_time_steps)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import numpy as np
-from game import Game
+from game import BatchedGame, Game, MultiHunterGame, get_relative_location_tables, is_prey_caught_heterogeneous, \
+    is_prey_caught_homogeneous, is_prey_caught_opposite, is_prey_surrounded
+from move import MOVE_BOTTOM, MOVE_STAY
 
 
 #########################################################################################
@@ -149,5 +151,183 @@ class TestGame(unittest.TestCase):
                 self.assertEqual(self.game.compute_score(), 1)
 
 
+class TestRelativeLocationTables(unittest.TestCase):
+
+    def test_tables(self):
+        """ Test if the tables give the shortest relative distance, also on fields of even size """
+        for max_coord in (2, 6, 7, 10):
+            table, _ = get_relative_location_tables(max_coord, max_coord)
+            for prey_coord in range(max_coord):
+                for hunter_coord in range(max_coord):
+                    dist = [prey_coord - hunter_coord, prey_coord + max_coord - hunter_coord,
+                            prey_coord - max_coord - hunter_coord]
+                    self.assertEqual(table[prey_coord - hunter_coord + max_coord - 1],
+                                     dist[int(np.argmin(np.abs(dist)))])
+
+    def test_cache_follows_positions(self):
+        """ Test if the cached relative locations are recomputed when a position changes """
+        game = Game((7, 7), 1, 0)
+        set_positions(game, [3, 3], [1, 2], [6, 5])
+        np.testing.assert_array_equal(game.get_relative_locations()[0], np.array([2, 1]))
+        game.hunter_1_position[0] += 1
+        np.testing.assert_array_equal(game.get_relative_locations()[0], np.array([1, 1]))
+        self.assertEqual(game.get_state_hunter_2().other_rel_position, (1, 1))
+
+
+class TestMovePrey(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Game((7, 7), 1, 0, seed=0)
+
+    def test_blocked_move(self):
+        """ Test if a move landing on a hunter is never taken and the others share its probability """
+        counts = {(3, 2): 0, (3, 4): 0}
+        for _ in range(3000):
+            set_positions(self.game, [3, 3], [4, 3], [0, 0])
+            self.game.move_prey()
+            counts[tuple(self.game.prey_position)] += 1
+        self.assertAlmostEqual(counts[(3, 4)] / 3000, 0.5, delta=0.05)
+
+    def test_boxed_in(self):
+        """ Test if a prey without any valid move stays where it is """
+        self.game.prey_action_prob = np.array([0, 1.0, 0, 0, 0])
+        set_positions(self.game, [6, 3], [0, 3], [0, 0])
+        self.game.move_prey()
+        np.testing.assert_array_equal(self.game.prey_position, [6, 3])
+
+    def test_batched_game_blocked_moves(self):
+        """ Test if the preys of a batched game only take the move left to them as well """
+        batched_game = BatchedGame.from_game(self.game, 3000)
+        batched_game.prey_positions[:] = [3, 3]
+        batched_game.hunter_1_positions[:] = [3, 2]
+        batched_game.hunter_2_positions[:] = [3, 4]
+        batched_game.move_prey()
+        np.testing.assert_array_equal(batched_game.prey_positions, np.tile([4, 3], (3000, 1)))
+
+
+class TestBatchedGame(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Setup a batch of standard games for every test
+        """
+        np.random.seed(0)
+        self.playing_field = (7, 7)
+        self.nb_games = 50
+        self.game = Game(self.playing_field, 1, 0, seed=0)
+        self.batched_game = BatchedGame.from_game(self.game, self.nb_games)
+
+    def test_relative_locations(self):
+        """ Test if the relative locations are the same as in a single game """
+        rel_loc_hunter_1, rel_loc_hunter_2 = self.batched_game.get_relative_locations()
+        for i in range(self.nb_games):
+            set_positions(self.game, self.batched_game.prey_positions[i],
+                          self.batched_game.hunter_1_positions[i], self.batched_game.hunter_2_positions[i])
+            expected_hunter_1, expected_hunter_2 = self.game.get_relative_locations()
+            np.testing.assert_array_equal(rel_loc_hunter_1[i], expected_hunter_1)
+            np.testing.assert_array_equal(rel_loc_hunter_2[i], expected_hunter_2)
+
+    def test_prey_never_on_hunter(self):
+        """ Test if the preys stay in the field and never move on a hunter """
+        for _ in range(100):
+            actions = np.random.randint(5, size=(2, self.nb_games))
+            self.batched_game.play_one_episode(actions[0], actions[1])
+            for positions in (self.batched_game.prey_positions, self.batched_game.hunter_1_positions):
+                self.assertTrue(np.all((positions >= 0) & (positions < self.playing_field)))
+            self.assertFalse(np.any(np.all(self.batched_game.prey_positions
+                                           == self.batched_game.hunter_1_positions, axis=1)))
+            self.assertFalse(np.any(np.all(self.batched_game.prey_positions
+                                           == self.batched_game.hunter_2_positions, axis=1)))
+
+    def test_capture_reset(self):
+        """ Test if a caught prey gives the reward and restarts its game """
+        self.batched_game.prey_positions[0] = [1, 1]
+        self.batched_game.hunter_1_positions[0] = [1, 0]
+        self.batched_game.hunter_2_positions[0] = [1, 2]
+        self.batched_game.prey_action_prob = np.array([0, 0, 0, 0, 1.0])
+        score_hunter_1, score_hunter_2, is_finished = self.batched_game.play_one_episode(
+            np.full(self.nb_games, 4), np.full(self.nb_games, 4))
+        self.assertEqual(score_hunter_1[0], 1)
+        self.assertEqual(score_hunter_2[0], 1)
+        self.assertTrue(is_finished[0])
+
+    def test_vectorized_capture(self):
+        """ Test if the capture functions give the same result on arrays and on single positions """
+        rel_positions = np.random.randint(-3, 4, size=(4, 500))
+        rel_positions[:, :100] = [[0], [1], [0], [-1]]
+        for is_prey_caught in (is_prey_caught_homogeneous, is_prey_caught_heterogeneous):
+            caught_hunter_1, caught_hunter_2 = is_prey_caught(*rel_positions)
+            for i in range(rel_positions.shape[1]):
+                self.assertEqual((caught_hunter_1[i], caught_hunter_2[i]),
+                                 tuple(bool(c) for c in is_prey_caught(*[int(p) for p in rel_positions[:, i]])))
+
+
+class TestMultiHunterGame(unittest.TestCase):
+
+    def setUp(self):
+        self.playing_field = (7, 7)
+        self.game = MultiHunterGame(self.playing_field, 4, 1, 0, is_prey_surrounded, seed=0)
+
+    def test_two_hunters(self):
+        """ Test if a game with two hunters gives the relative locations, states and scores of Game """
+        game = Game(self.playing_field, 1, 0, seed=0)
+        multi_hunter_game = MultiHunterGame(self.playing_field, 2, 1, 0, seed=1)
+        rng = np.random.default_rng(0)
+        for i in range(300):
+            positions = rng.integers(7, size=(3, 2))
+            if i % 3 == 0:  # a capture
+                positions[1:] = positions[0] + [[0, 1], [0, -1]]
+            game.positions[:] = positions % 7
+            multi_hunter_game.positions[:] = positions % 7
+            np.testing.assert_array_equal(multi_hunter_game.get_relative_locations(),
+                                          np.array(game.get_relative_locations()))
+            self.assertEqual(multi_hunter_game.get_state_ids(0), [game.get_state_id_hunter_1()])
+            self.assertEqual(multi_hunter_game.get_state_ids(1), [game.get_state_id_hunter_2()])
+            self.assertEqual(multi_hunter_game.compute_score(), list(game.compute_score()))
+
+    def test_state_ids(self):
+        """ Test if every hunter gets the state of each other hunter, in order """
+        rel_positions = self.game.get_relative_locations()
+        encoder = self.game.state_encoder
+        for hunter in range(4):
+            self.assertEqual(self.game.get_state_ids(hunter),
+                             [encoder.encode_positions(rel_positions[hunter], rel_positions[other])
+                              for other in range(4) if other != hunter])
+
+    def test_capture_functions(self):
+        """ Test if the prey is caught by two opposite hunters or by four surrounding hunters """
+        sides = np.array([[0, 1], [0, -1], [1, 0], [-1, 0]])
+        far = np.array([[3, 3], [2, 3]])
+        self.assertTrue(np.all(is_prey_caught_opposite(np.vstack((sides[:2], far)))))
+        self.assertFalse(np.any(is_prey_caught_opposite(np.vstack((sides[[0, 2]], far)))))
+        self.assertFalse(np.any(is_prey_surrounded(np.vstack((sides[:3], far)))))
+        self.assertTrue(np.all(is_prey_surrounded(sides)))
+
+    def test_surround(self):
+        """ Test if surrounding the prey gives the reward to every hunter and ends the episode """
+        self.game.prey_action_prob = np.array([0, 0, 0, 0, 1.0])
+        self.game.prey_position = [3, 3]
+        self.game.hunter_positions = [[3, 1], [3, 4], [4, 3], [2, 3]]
+        scores = self.game.play_one_episode([MOVE_BOTTOM, MOVE_STAY, MOVE_STAY, MOVE_STAY])
+        self.assertEqual(scores, [1, 1, 1, 1])
+        self.assertTrue(self.game.is_finished(scores))
+
+    def test_prey_never_on_hunter(self):
+        """ Test if the prey stays in the field and never moves on a hunter """
+        for _ in range(200):
+            self.game.play_one_episode(np.random.randint(5, size=4).tolist())
+            self.assertTrue(np.all((self.game.positions >= 0) & (self.game.positions < self.playing_field)))
+            self.assertFalse(np.any(np.all(self.game.hunter_positions == self.game.prey_position, axis=1)))
+
+    def test_prey_starts_on_free_cell(self):
+        """ Test if the prey starts on a cell without hunter, even when it could not move away """
+        game = MultiHunterGame((3, 2), 5, 1, 0, seed=0)
+        for _ in range(100):
+            game.reset_positions()
+            self.assertFalse(np.any(np.all(game.hunter_positions == game.prey_position, axis=1)))
+        with self.assertRaises(ValueError):
+            MultiHunterGame((3, 2), 6, 1, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
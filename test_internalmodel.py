@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+
+from agent import State, StateEncoder
+from internalmodel import ArrayInternalModel, InternalModel, MemmapInternalModel, SparseInternalModel
+from qwsae_agent import QwSelfModelBaseAEAgent
+
+
+class TestInternalModel(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = StateEncoder((7, 7))
+        self.states = [State((-1, 2), (2, 2)), State((3, 3), (2, 2))]
+
+    def test_array_model_matches_dict_model(self):
+        """ Test if the array internal model gives the same estimations as the dictionary one """
+        dict_model = InternalModel(0.998849, self.encoder)
+        array_models = [ArrayInternalModel(0.998849, self.encoder), MemmapInternalModel(0.998849, self.encoder),
+                        SparseInternalModel(0.998849, self.encoder)]
+        np.random.seed(0)
+        for episode in range(50):
+            state = self.states[episode % 2]
+            action = np.random.randint(5)
+            dict_model.update_state_action_estimation(state, action, episode)
+            for array_model in array_models:
+                array_model.update_state_action_estimation(self.encoder.encode(state), action, episode)
+                for other_state in self.states:
+                    np.testing.assert_array_equal(array_model.get_action_prob(other_state),
+                                                  dict_model.get_action_prob(other_state))
+        for array_model in array_models:
+            self.assertEqual(array_model.count_learned(), dict_model.count_learned())
+        self.assertEqual(dict_model.count_learned(), 10)
+
+    def test_sparse_model_reads(self):
+        """ Test if the sparse internal model only stores the states updated """
+        model = SparseInternalModel(0.998849, self.encoder)
+        np.testing.assert_array_equal(model.get_action_prob(self.states[0]), np.full(5, 0.2))
+        self.assertEqual(model.get_state_action_estimation(self.states[1], 3), 0.2)
+        self.assertEqual(len(model.model), 0)
+        model.update_state_action_estimation(self.states[0], 1)
+        self.assertEqual(list(model.model), [self.encoder.encode(self.states[0])])
+        self.assertEqual(model.compact(), 0)
+
+        restored = SparseInternalModel(0.998849, self.encoder)
+        restored.load_action_prob_table(model.get_action_prob_table())
+        np.testing.assert_array_equal(restored.get_action_prob(self.states[0]), model.get_action_prob(self.states[0]))
+        self.assertEqual(len(restored.model), 1)
+
+    def test_probabilities_sum_to_one(self):
+        """ Test if the estimations of a state stay a probability distribution """
+        model = ArrayInternalModel(0.998849, self.encoder)
+        np.testing.assert_allclose(model.get_action_prob(self.states[0]), np.full(5, 0.2))
+        for action in (0, 0, 3, 1):
+            model.update_state_action_estimation(self.states[0], action)
+        self.assertAlmostEqual(np.sum(model.get_action_prob(self.states[0])), 1.0)
+        self.assertEqual(np.argmax(model.get_action_prob(self.states[0])), 0)
+
+
+class TestInternalSelfModel(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = StateEncoder((7, 7))
+        self.state = self.encoder.encode(State((-1, 2), (2, 2)))
+        self.agent = QwSelfModelBaseAEAgent(0.3, 0.9, 0.2, self.state, 0.0, 0.998849, 'array', self.encoder)
+        np.random.seed(0)
+        self.agent.q_table.values[:] = np.random.random(self.agent.q_table.values.shape)
+
+    def get_expected_estimation(self, action):
+        """ Self-model estimation of one action as computed for every query before the policy cache """
+        others_state = self.encoder.swap(self.state)
+        probas = [np.exp(self.agent.get_q_value_with_random_state(others_state, other_action, action)
+                         / self.agent.temperature) for other_action in range(5)]
+        return probas[action] / sum(probas)
+
+    def test_cached_policy(self):
+        """ Test if the cached policy gives the same estimations as computing each of them """
+        for action in range(5):
+            self.assertAlmostEqual(self.agent.internal_model.get_state_action_estimation(self.state, action),
+                                   self.get_expected_estimation(action))
+
+    def test_invalidation(self):
+        """ Test if the policy is computed again after a Q-value or the temperature changed """
+        self.agent.internal_model.get_action_prob(self.state)
+        self.agent.set_state(self.encoder.swap(self.state))
+        self.agent.update_q_value(5.0, 2, 2)
+        self.agent.set_state(self.state)
+        self.assertAlmostEqual(self.agent.internal_model.get_state_action_estimation(self.state, 2),
+                               self.get_expected_estimation(2))
+        self.agent.temperature = 0.1
+        self.assertAlmostEqual(self.agent.internal_model.get_state_action_estimation(self.state, 2),
+                               self.get_expected_estimation(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
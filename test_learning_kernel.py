@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from game import Game
+from learning_kernel import check_fast_kernel, do_fast_learning_episode
+from qwpae_agent import QwProposedAEAgent, QwRandomAEAgent
+from qwsae_agent import QwSelfModelBaseAEAgent
+from simulation import Centralized_Config, HunterConfig, do_learning_episode, simulation
+
+
+class TestLearningKernel(unittest.TestCase):
+
+    def play(self, create_config, learning_episode):
+        """ Play a few learning episodes from a fixed seed and return the game and the learning agents """
+        game = Game((5, 5), 1, 0, 0.5, -0.1, seed=4)
+        config = create_config(game)
+        for episode in range(5):
+            learning_episode(game, (config.hunter_1, config.hunter_2), episode)
+        agents = [config.hunter_1.CA] if hasattr(config.hunter_1, 'CA') else [config.hunter_1, config.hunter_2]
+        return game, agents
+
+    def check_same_learning(self, create_config):
+        """ Check that the kernel and the normal path leave the game and the agents in the same state """
+        game, agents = self.play(create_config, do_learning_episode)
+        kernel_game, kernel_agents = self.play(create_config, do_fast_learning_episode)
+
+        np.testing.assert_array_equal(kernel_game.positions, game.positions)
+        for agent, kernel_agent in zip(agents, kernel_agents):
+            np.testing.assert_array_equal(kernel_agent.q_table.to_array(), agent.q_table.to_array())
+            self.assertEqual(kernel_agent.state, agent.state)
+            self.assertEqual(kernel_agent.temperature, agent.temperature)
+            if hasattr(agent, 'internal_model'):
+                np.testing.assert_array_equal(kernel_agent.internal_model.get_action_prob_table(),
+                                              agent.internal_model.get_action_prob_table())
+
+    def test_proposed_action_estimation(self):
+        """ Test if QwPAE hunters learn exactly as with the normal path """
+        for backend in ('array', 'memmap'):
+            self.check_same_learning(lambda game: HunterConfig("test", QwProposedAEAgent, game, theta=0.998849,
+                                                               backend=backend))
+
+    def test_random_action_estimation(self):
+        """ Test if QwRAE hunters learn exactly as with the normal path """
+        self.check_same_learning(lambda game: HunterConfig("test", QwRandomAEAgent, game, theta=0.998849,
+                                                           backend='array'))
+
+    def test_centralized(self):
+        """ Test if the centralized learner learns exactly as with the normal path """
+        self.check_same_learning(lambda game: Centralized_Config("test", game, theta=0.998849, backend='array'))
+
+    def test_mixed_paths(self):
+        """ Test if the hunters can go on learning with the normal path after the kernel """
+        def alternate_learning_episode(game, hunters, episode):
+            if episode % 2 == 0:
+                return do_fast_learning_episode(game, hunters, episode)
+            return do_learning_episode(game, hunters, episode)
+
+        for create_config in (lambda game: HunterConfig("test", QwProposedAEAgent, game, theta=0.998849,
+                                                        backend='array'),
+                              lambda game: Centralized_Config("test", game, theta=0.998849, backend='array')):
+            _, agents = self.play(create_config, do_learning_episode)
+            _, mixed_agents = self.play(create_config, alternate_learning_episode)
+            for agent, mixed_agent in zip(agents, mixed_agents):
+                np.testing.assert_array_equal(mixed_agent.q_table.to_array(), agent.q_table.to_array())
+
+    def test_unsupported_hunters(self):
+        """ Test if hunters without array-backed tables or with a self-model are refused """
+        game = Game((5, 5), 1, 0)
+        for config in (HunterConfig("test", QwProposedAEAgent, game, theta=0.998849),
+                       HunterConfig("test", QwSelfModelBaseAEAgent, game, theta=0.998849, backend='array')):
+            self.assertRaises(ValueError, check_fast_kernel, (config.hunter_1, config.hunter_2))
+            self.assertRaises(ValueError, simulation, game, config, 5, 5, 10, verbose=False, fast_kernel=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
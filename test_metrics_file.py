@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from metrics_file import MetricsWriter, compute_statistics, is_metrics_file, load_metrics_file, save_metrics_file
+
+
+class TestMetricsFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "metrics.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_evaluations(self, episodes, first_episode=0):
+        """ Write one evaluation of 3 episodes at each given training episode """
+        with MetricsWriter(self.filename, "test; name", 30, 10, first_episode) as writer:
+            for episode in episodes:
+                writer.write(episode, compute_statistics(np.array([1, 2, 6]) + episode), [1 + episode, 2, 6])
+
+    def test_round_trip(self):
+        """ Test if every statistic and the time steps are loaded back """
+        self.write_evaluations([0, 10, 20])
+        self.assertTrue(is_metrics_file(self.filename))
+
+        metrics = load_metrics_file(self.filename)
+        self.assertEqual(metrics['name'], "test; name")
+        self.assertEqual(metrics['total_training_episodes'], 30)
+        self.assertEqual(metrics['train_episodes_batch'], 10)
+        np.testing.assert_array_equal(metrics['episodes'], [0, 10, 20])
+        np.testing.assert_allclose(metrics['average'], [3, 13, 23])
+        np.testing.assert_allclose(metrics['max'], [6, 16, 26])
+        np.testing.assert_allclose(metrics['min'], [1, 11, 21])
+        np.testing.assert_allclose(metrics['std'], np.std([1, 2, 6]))
+        np.testing.assert_allclose(metrics['mae'], 2)
+        self.assertEqual(metrics['time_steps'][1], [11, 2, 6])
+
+    def test_incomplete_file(self):
+        """ Test if the last row of a file being written is ignored """
+        self.write_evaluations([0, 10])
+        with open(self.filename, 'a') as metrics_file:
+            metrics_file.write("20;3.0;1.6")
+
+        np.testing.assert_array_equal(load_metrics_file(self.filename)['episodes'], [0, 10])
+
+    def test_resume(self):
+        """ Test if the rows after the first episode of a resumed run are replaced """
+        self.write_evaluations([0, 10, 20])
+        self.write_evaluations([10], first_episode=10)
+        np.testing.assert_array_equal(load_metrics_file(self.filename)['episodes'], [0, 10])
+
+    def test_save(self):
+        """ Test if the statistics of a whole run are saved, the missing ones as nan """
+        save_metrics_file(self.filename, "test", 20, 10, {'average': np.array([10.0, 5.0]), 'std': None})
+        metrics = load_metrics_file(self.filename)
+        np.testing.assert_array_equal(metrics['episodes'], [0, 10])
+        np.testing.assert_array_equal(metrics['average'], [10.0, 5.0])
+        self.assertTrue(np.all(np.isnan(metrics['std'])))
+        self.assertEqual(metrics['time_steps'], [[], []])
+
+    def test_save_without_evaluation(self):
+        """ Test if the results of a run without any evaluation are saved as a file without rows """
+        for average in (np.array([]), None):
+            save_metrics_file(self.filename, "test", 0, 10, {'average': average})
+            metrics = load_metrics_file(self.filename)
+            self.assertEqual(metrics['train_episodes_batch'], 10)
+            self.assertEqual(len(metrics['episodes']), 0)
+
+    def test_old_csv_file(self):
+        """ Test if the CSV files with the average time steps only are told apart """
+        np.savetxt(self.filename, [10, 5], header="test 20", delimiter=';', fmt='%u')
+        self.assertFalse(is_metrics_file(self.filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np
+
+from metrics_file import MetricsWriter, compute_statistics
+from plot import LiveDashboard, create_data_for_one_plot
+
+
+class TestLiveDashboard(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_update(self):
+        """ Test if the evaluations written by running simulations are added to their curves """
+        filenames = [os.path.join(self.directory.name, f"metrics_seed{seed}.csv") for seed in range(2)]
+        writer = MetricsWriter(filenames[0], "test", 30, 10)
+        dashboard = LiveDashboard([os.path.join(self.directory.name, "metrics_*.csv")])
+        self.assertFalse(dashboard.update())
+
+        writer.write(0, compute_statistics(np.array([4, 6])))
+        self.assertTrue(dashboard.update())
+        self.assertFalse(dashboard.update())
+
+        writer.write(10, compute_statistics(np.array([2, 4])))
+        with MetricsWriter(filenames[1], "test", 30, 10) as other_writer:
+            other_writer.write(0, compute_statistics(np.array([8])))
+        self.assertTrue(dashboard.update())
+        writer.close()
+
+        curve, other_curve = (dashboard.curves[filename] for filename in filenames)
+        np.testing.assert_array_equal(curve.line.get_xdata(), [0, 10])
+        np.testing.assert_array_equal(curve.line.get_ydata(), [5, 3])
+        np.testing.assert_array_equal(other_curve.line.get_ydata(), [8])
+        self.assertEqual(dashboard.ax.get_xlim(), (0, 30))
+
+    def test_restarted_file(self):
+        """ Test if the curve of a file started again by a resumed simulation is read again """
+        filename = os.path.join(self.directory.name, "metrics.csv")
+        with MetricsWriter(filename, "test", 30, 10) as writer:
+            writer.write(0, compute_statistics(np.array([4])))
+            writer.write(10, compute_statistics(np.array([2])))
+        dashboard = LiveDashboard([filename])
+        dashboard.update()
+
+        with MetricsWriter(filename, "test", 30, 10, first_episode=10) as writer:
+            writer.write(10, compute_statistics(np.array([3])))
+        dashboard.update()
+        np.testing.assert_array_equal(dashboard.curves[filename].line.get_ydata(), [4, 3])
+
+    def test_old_csv_file(self):
+        """ Test if the CSV files with the average time steps only are plotted """
+        filename = os.path.join(self.directory.name, "results.csv")
+        np.savetxt(filename, [10, 5], header="test 20", delimiter=';', fmt='%u')
+        dashboard = LiveDashboard([filename])
+        self.assertTrue(dashboard.update())
+        self.assertFalse(dashboard.update())
+        np.testing.assert_array_equal(dashboard.curves[filename].line.get_ydata(), [10, 5])
+
+
+class TestResultFiles(unittest.TestCase):
+
+    def test_bin_file(self):
+        """ Test if the curves of a .bin file of the results folder are loaded """
+        filename = os.path.join(os.path.dirname(__file__), "results", "figure5_V2_with_STD",
+                                "hunters_Q-learning with randomly action estimation_02012021_2200.bin")
+        name, average_data, std_data, _, _, _, total_training_episodes = create_data_for_one_plot(filename)
+        self.assertEqual(name, "Q-learning with randomly action estimation")
+        self.assertEqual(total_training_episodes, 2000)
+        self.assertEqual(average_data.shape, (200,))
+        self.assertEqual(std_data.shape, (200,))
+
+
+if __name__ == '__main__':
+    unittest.main()
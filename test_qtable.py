@@ -0,0 +1,157 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from agent import State, StateEncoder
+from game import Game
+from qtable import ArrayQTable, DictQTable, MemmapQTable, SparseQTable, create_q_table
+
+
+class TestStateEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = StateEncoder((7, 7))
+
+    def test_round_trip(self):
+        """ Test if every encoded state is decoded to the same relative positions """
+        for state_id in range(self.encoder.num_states):
+            state = self.encoder.decode(state_id)
+            self.assertEqual(self.encoder.encode(state), state_id)
+
+    def test_state_space_size(self):
+        """ Test if the relative positions of a 7x7 torus give 49 * 49 states """
+        self.assertEqual(self.encoder.num_states, 49 * 49)
+        self.assertEqual(self.encoder.encode(State((-3, -3), (-3, -3))), 0)
+        self.assertEqual(self.encoder.encode(State((3, 3), (3, 3))), 49 * 49 - 1)
+
+    def test_swap(self):
+        """ Test if swapping a state id inverts the relative positions """
+        state = State((1, -2), (0, 3))
+        self.assertEqual(self.encoder.swap(state), self.encoder.encode(State((0, 3), (1, -2))))
+        self.assertEqual(self.encoder.swap(self.encoder.swap(state)), self.encoder.encode(state))
+
+    def test_game_state_ids(self):
+        """ Test if the state ids of the game match the encoded states """
+        game = Game((7, 7), 1, 0)
+        for _ in range(20):
+            game.play_one_episode(0, 3)
+            self.assertEqual(game.get_state_id_hunter_1(), self.encoder.encode(game.get_state_hunter_1()))
+            self.assertEqual(game.get_state_id_hunter_2(), self.encoder.encode(game.get_state_hunter_2()))
+
+
+class TestQTable(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = StateEncoder((7, 7))
+        self.state = State((1, -2), (0, 3))
+        self.other_state = State((0, 3), (1, -2))
+
+    def check_backend(self, q_table):
+        """ Check that a Q-table stores values per state, action and other action """
+        self.assertEqual(q_table.get(self.state, 1, 2), 0.5)
+        q_table.set(self.state, 1, 2, 3.0)
+        q_table.set(self.state, 1, None, -1.0)
+        self.assertEqual(q_table.get(self.state, 1, 2), 3.0)
+        self.assertEqual(q_table.get(self.state, 1, None), -1.0)
+        self.assertEqual(q_table.get(self.state, 2, 1), 0.5)
+        self.assertEqual(q_table.get(self.other_state, 1, 2), 0.5)
+
+    def test_dict_backend(self):
+        """ Test if the dictionary backend stores the Q-values """
+        self.check_backend(DictQTable(0.5))
+        self.check_backend(DictQTable(0.5, self.encoder))
+
+    def test_state_ids(self):
+        """ Test if a state and its id give the same Q-value """
+        q_table = DictQTable(0.5, self.encoder)
+        q_table.set(self.encoder.encode(self.state), 1, 2, 3.0)
+        self.assertEqual(q_table.get(self.state, 1, 2), 3.0)
+
+    def test_array_backend(self):
+        """ Test if the array backend stores the Q-values """
+        self.check_backend(ArrayQTable(self.encoder, 0.5))
+
+    def test_memmap_backend(self):
+        """ Test if the memory-mapped backend stores the Q-values and survives pickling """
+        q_table = MemmapQTable(self.encoder, 0.5)
+        self.check_backend(q_table)
+        restored = pickle.loads(pickle.dumps(q_table))
+        self.assertIsInstance(restored.values, np.memmap)
+        self.assertTrue(np.array_equal(restored.to_array(), q_table.to_array()))
+        restored.set(self.state, 1, 2, 4.0)
+        self.assertEqual(q_table.get(self.state, 1, 2), 3.0)
+
+    def test_sparse_backend(self):
+        """ Test if the sparse backend stores the Q-values without storing the ones only read """
+        self.check_backend(SparseQTable(0.5))
+        q_table = SparseQTable(0.5, self.encoder)
+        self.check_backend(q_table)
+        self.assertEqual(list(q_table.values), [self.encoder.encode(self.state)])
+
+        q_table.set(self.other_state, 0, 0, 0.5)  # the initial value is not stored
+        q_table.get_action_pairs(3)
+        self.assertEqual(len(q_table.values), 1)
+        np.testing.assert_array_equal(q_table.get_action_pairs(3), np.full((5, 5), 0.5))
+
+        restored = SparseQTable(0.5, self.encoder)
+        restored.load_array(q_table.to_array())
+        self.assertEqual(list(restored.values), list(q_table.values))
+        self.assertTrue(np.array_equal(restored.to_array(), q_table.to_array()))
+
+    def test_compact(self):
+        """ Test if compacting removes the initial values without changing the Q-values """
+        for q_table in (DictQTable(0.5, self.encoder), SparseQTable(0.5, self.encoder)):
+            q_table.set(self.state, 1, 2, 3.0)
+            q_table.set(self.other_state, 1, 2, 3.0)
+            q_table.set(self.other_state, 1, 2, 0.5)
+            q_table.get_action_pairs(7)
+            values = q_table.to_array()
+            memory_usage = q_table.memory_usage()
+            self.assertGreater(q_table.compact(), 0)
+            self.assertLess(q_table.memory_usage(), memory_usage)
+            self.assertTrue(np.array_equal(q_table.to_array(), values))
+            self.assertEqual(q_table.compact(), 0)
+
+    def test_rows(self):
+        """ Test if the rows of the states with a learned Q-value are the ones of the dense array """
+        state_id = self.encoder.encode(self.state)
+        for q_table in (DictQTable(0.5, self.encoder), SparseQTable(0.5, self.encoder),
+                        ArrayQTable(self.encoder, 0.5)):
+            q_table.set(self.state, 1, 2, 3.0)
+            q_table.set(self.state, 1, None, -1.0)
+            q_table.get_action_pairs(7)  # only read
+            np.testing.assert_array_equal(q_table.get_state_ids(), [state_id])
+            state_ids = np.array([7, state_id])
+            np.testing.assert_array_equal(q_table.get_rows(state_ids), q_table.to_array()[state_ids])
+
+    def test_count_learned(self):
+        """ Test if every backend counts the Q-values differing from the initial value """
+        for q_table in (DictQTable(0.5, self.encoder), SparseQTable(0.5, self.encoder),
+                        ArrayQTable(self.encoder, 0.5)):
+            q_table.set(self.state, 1, 2, 3.0)
+            q_table.set(self.state, 1, None, -1.0)
+            q_table.set(self.other_state, 1, 2, 0.5)
+            q_table.get_action_pairs(7)  # only read
+            self.assertEqual(q_table.count_learned(), 2)
+
+    def test_legacy_keys(self):
+        """ Test if the Q-values keyed by relative positions are keyed by state id once given an encoder """
+        q_table = DictQTable(0.5)
+        q_table.set(self.state, 1, 2, 3.0)
+        q_table.set_state_encoder(self.encoder)
+        self.assertEqual(q_table.get(self.encoder.encode(self.state), 1, 2), 3.0)
+
+    def test_create_q_table(self):
+        """ Test if the backends are created by name """
+        self.assertIsInstance(create_q_table('dict', 0.5), DictQTable)
+        self.assertIsInstance(create_q_table('sparse', 0.5), SparseQTable)
+        self.assertIsInstance(create_q_table('array', 0.5, self.encoder), ArrayQTable)
+        self.assertIsInstance(create_q_table('memmap', 0.5, self.encoder), MemmapQTable)
+        self.assertRaises(ValueError, create_q_table, 'memmap', 0.5)
+        self.assertRaises(ValueError, create_q_table, 'array', 0.5)
+        self.assertRaises(ValueError, create_q_table, 'unknown', 0.5, self.encoder)
+
+
+if __name__ == '__main__':
+    unittest.main()
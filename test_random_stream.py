@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from game import Game
+from qwpae_agent import QwRandomAEAgent
+from random_stream import RandomStream
+from simulation import HunterConfig, do_learning_episode
+
+
+class TestRandomStream(unittest.TestCase):
+
+    def test_same_seed(self):
+        """ Test if streams with the same seed draw the same numbers, whatever the size of the blocks """
+        streams = RandomStream(3, block_size=4), RandomStream(3, block_size=16), RandomStream(3)
+        draws = [[stream.random() for _ in range(10)] for stream in streams[:2]]
+        self.assertEqual(draws[0], draws[1])
+        self.assertEqual(draws[0], streams[2].random(size=10).tolist())
+
+    def test_spawned_streams(self):
+        """ Test if the spawned streams are reproducible and independent of each other """
+        children = [RandomStream(3).spawn() for _ in range(2)]
+        self.assertEqual(children[0].random(), children[1].random())
+
+        stream = RandomStream(3)
+        first_child, second_child = stream.spawn(), stream.spawn()
+        self.assertNotEqual(first_child.random(size=4).tolist(), second_child.random(size=4).tolist())
+        self.assertNotEqual(first_child.random(), stream.random())
+
+    def test_randint(self):
+        """ Test if the integers drawn from the block cover [0, high) """
+        stream = RandomStream(0)
+        self.assertEqual(set(stream.randint(5) for _ in range(200)), set(range(5)))
+
+    def check_run(self, seed):
+        """ Play a few learning episodes from a seed and return the Q-table of the first hunter """
+        game = Game((5, 5), 1, 0, seed=seed)
+        config = HunterConfig("test", QwRandomAEAgent, game, theta=0.998849, backend='array')
+        for episode in range(3):
+            do_learning_episode(game, (config.hunter_1, config.hunter_2), episode)
+        return config.hunter_1.q_table.to_array()
+
+    def test_reproducible_run(self):
+        """ Test if a run only depends on its seed, not on the global random state """
+        np.random.seed(1)
+        q_values = self.check_run(7)
+        np.random.seed(2)
+        np.testing.assert_array_equal(self.check_run(7), q_values)
+        self.assertFalse(np.array_equal(self.check_run(8), q_values))
+
+
+if __name__ == '__main__':
+    unittest.main()
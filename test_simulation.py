@@ -0,0 +1,423 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import simulation
+
+from early_stopping import ConvergenceCriterion, EvaluationBudget
+from agent import boltzmann_probabilities
+from checkpoint import CheckpointWriter, load_checkpoint
+from game import Game
+from metrics_file import load_metrics_file
+from move import NB_MOVES
+from profiler import Profiler
+from qwpae_agent import QwProposedAEAgent
+from qwsae_agent import QwSelfModelBaseAEAgent
+from result_file import ResultFile, get_agents
+from simulation import Centralized_Config, Centralized_Config_Std, HunterConfig, HunterConfig_Std, \
+    compact_tables, do_batched_evaluation, do_learning_episode, load_hunter_config, resume_simulation, save_results
+
+
+class TestBatchedEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.game = Game((5, 5), 1, 0)
+
+    def check_evaluation(self, config):
+        """ Check that a batched evaluation plays every episode and leaves the Q-tables untouched """
+        hunters = (config.hunter_1, config.hunter_2)
+        for episode in range(3):
+            do_learning_episode(self.game, hunters, episode)
+
+        q_table = config.hunter_1.q_table if not hasattr(config.hunter_1, 'CA') else config.hunter_1.CA.q_table
+        q_table_size = len(q_table)
+        time_steps = do_batched_evaluation(self.game, hunters, 20)
+
+        self.assertEqual(time_steps.shape, (20,))
+        self.assertTrue(np.all(time_steps >= 1))
+        self.assertEqual(len(q_table), q_table_size)
+
+    def test_agents(self):
+        """ Test the batched evaluation of agents with an internal model or a self-model """
+        for agent_type in (QwProposedAEAgent, QwSelfModelBaseAEAgent):
+            for backend in ('dict', 'array'):
+                self.check_evaluation(HunterConfig("test", agent_type, self.game, theta=0.998849, backend=backend))
+
+    def test_centralized(self):
+        """ Test the batched evaluation of the centralized learner """
+        self.check_evaluation(Centralized_Config("test", self.game, theta=0.998849))
+
+    def test_policy_matches_expected_values(self):
+        """ Test if the frozen policy gives the same probabilities as the Boltzmann function """
+        config = HunterConfig("test", QwProposedAEAgent, self.game, theta=0.998849)
+        do_learning_episode(self.game, (config.hunter_1, config.hunter_2), 0)
+        agent = config.hunter_1
+        policy = agent.get_policy()
+        expected_values = agent.expected_values()
+        probabilities = np.exp(expected_values / agent.temperature) / np.sum(np.exp(expected_values / agent.temperature))
+        np.testing.assert_allclose(policy[agent.state_encoder.encode(agent.state)], probabilities)
+
+    def test_sparse_policy(self):
+        """ Test if the policy stored for the visited states only gives the probabilities of every state """
+        state_ids = np.arange(self.game.state_encoder.num_states)
+        for backend in ('dict', 'sparse', 'array'):
+            for agent_type in (QwProposedAEAgent, QwSelfModelBaseAEAgent):
+                config = HunterConfig("test", agent_type, self.game, theta=0.998849, backend=backend)
+                do_learning_episode(self.game, (config.hunter_1, config.hunter_2), 0)
+                agent = config.hunter_1
+                q_values = agent.q_table.to_array()[:, :, :NB_MOVES]
+                expected_values = np.einsum('sao,so->sa', q_values, agent.internal_model.get_action_prob_table())
+                policy = agent.get_policy()
+                np.testing.assert_allclose(policy[state_ids], boltzmann_probabilities(expected_values,
+                                                                                      agent.temperature))
+                self.assertLess(len(policy), len(state_ids))
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def run_simulation(self, checkpoint_file=None, crash_episode=None, metrics_file=None, backend='dict'):
+        """ Run a short simulation, interrupted by an exception at crash_episode """
+        game = Game((5, 5), 1, 0, seed=0)
+        config = HunterConfig_Std("test", QwProposedAEAgent, game, theta=0.998849, backend=backend)
+
+        def crashing_learning_episode(game, hunters, episode):
+            if episode == crash_episode:
+                raise KeyboardInterrupt
+            do_learning_episode(game, hunters, episode)
+
+        with mock.patch.object(simulation, 'do_learning_episode', crashing_learning_episode):
+            simulation.simulation(game, config, 5, 5, 30, verbose=False, checkpoint_file=checkpoint_file,
+                                  checkpoint_interval=10, metrics_file=metrics_file)
+        return config
+
+    def test_resume(self):
+        """ Test if a resumed simulation gives exactly the results of an uninterrupted one """
+        expected_config = self.run_simulation()
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_file = os.path.join(directory, "checkpoint.pkl")
+            self.assertRaises(KeyboardInterrupt, self.run_simulation, checkpoint_file, 25)
+            _, config, total_train_episodes = resume_simulation(checkpoint_file, verbose=False)
+
+        self.assertEqual(total_train_episodes, 30)
+        np.testing.assert_array_equal(config.average_time_steps, expected_config.average_time_steps)
+        np.testing.assert_array_equal(config.std_time_steps, expected_config.std_time_steps)
+        self.assertEqual(len(config.hunter_1.q_table), len(expected_config.hunter_1.q_table))
+
+    def test_resume_backends(self):
+        """ Test if the tables of every backend are restored from the incremental checkpoints """
+        for backend in ('sparse', 'array', 'memmap'):
+            expected_config = self.run_simulation(backend=backend)
+            with tempfile.TemporaryDirectory() as directory:
+                checkpoint_file = os.path.join(directory, "checkpoint.pkl")
+                self.assertRaises(KeyboardInterrupt, self.run_simulation, checkpoint_file, 25, backend=backend)
+                _, config, _ = resume_simulation(checkpoint_file, verbose=False)
+            np.testing.assert_array_equal(config.average_time_steps, expected_config.average_time_steps)
+            np.testing.assert_array_equal(config.hunter_1.q_table.to_array(), expected_config.hunter_1.q_table.to_array())
+
+    def test_incremental_checkpoints(self):
+        """ Test if a checkpoint after the first one only writes the entries changed since then """
+        game = Game((7, 7), 1, 0, seed=0)
+        for backend in ('dict', 'array'):
+            config = HunterConfig_Std("test", QwProposedAEAgent, game, theta=0.998849, backend=backend)
+            hunters = (config.hunter_1, config.hunter_2)
+            for episode in range(20):
+                do_learning_episode(game, hunters, episode)
+            checkpoint = {'game': game, 'hunter_config': config, 'episode': 20}
+
+            with tempfile.TemporaryDirectory() as directory:
+                checkpoint_file = os.path.join(directory, "checkpoint.pkl")
+                checkpoint_writer = CheckpointWriter(checkpoint_file)
+                checkpoint_writer.save(checkpoint, list(hunters))
+                do_learning_episode(game, hunters, 20)
+                checkpoint['episode'] = 21
+                size = checkpoint_writer.save(checkpoint, list(hunters))
+                loaded_config = load_checkpoint(checkpoint_file)['hunter_config']
+
+                # a new writer (i.e. a resumed simulation) starts a new log and removes the previous one
+                CheckpointWriter(checkpoint_file).save(checkpoint, list(hunters))
+                self.assertEqual(sorted(os.listdir(directory)), ["checkpoint.pkl", "checkpoint.pkl.log.2"])
+
+            self.assertLess(size * 10, len(pickle.dumps(checkpoint)))
+            for hunter, loaded_hunter in zip(hunters, (loaded_config.hunter_1, loaded_config.hunter_2)):
+                np.testing.assert_array_equal(loaded_hunter.q_table.to_array(), hunter.q_table.to_array())
+                np.testing.assert_array_equal(loaded_hunter.internal_model.get_action_prob_table(),
+                                              hunter.internal_model.get_action_prob_table())
+
+    def test_not_a_checkpoint(self):
+        """ Test if a file which is not a checkpoint is neither loaded nor overwritten """
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_file = os.path.join(directory, "checkpoint.pkl")
+            with open(checkpoint_file, 'wb') as other_file:
+                pickle.dump({'episode': 10}, other_file)
+            self.assertRaises(ValueError, load_checkpoint, checkpoint_file)
+            self.assertRaises(ValueError, self.run_simulation, checkpoint_file)
+            self.assertEqual(os.listdir(directory), ["checkpoint.pkl"])
+
+    def test_resume_metrics_file(self):
+        """ Test if the metrics streamed by a resumed simulation are the ones of an uninterrupted one """
+        with tempfile.TemporaryDirectory() as directory:
+            expected_metrics_file = os.path.join(directory, "expected.csv")
+            self.run_simulation(metrics_file=expected_metrics_file)
+
+            checkpoint_file = os.path.join(directory, "checkpoint.pkl")
+            metrics_file = os.path.join(directory, "metrics.csv")
+            self.assertRaises(KeyboardInterrupt, self.run_simulation, checkpoint_file, 25, metrics_file)
+            # the evaluations up to episode 25 were written, after the checkpoint of episode 20
+            np.testing.assert_array_equal(load_metrics_file(metrics_file)['episodes'], [0, 5, 10, 15, 20, 25])
+            resume_simulation(checkpoint_file, verbose=False)
+
+            with open(metrics_file) as resumed, open(expected_metrics_file) as expected:
+                self.assertEqual(resumed.read(), expected.read())
+
+
+class TestProfiler(unittest.TestCase):
+
+    def run_simulation(self, profiler=None, fast_kernel=False):
+        """ Run a short seeded simulation and return its configuration """
+        game = Game((5, 5), 1, 0, seed=0)
+        config = HunterConfig_Std("test", QwProposedAEAgent, game, theta=0.998849, backend='array')
+        simulation.simulation(game, config, 5, 5, 15, verbose=False, fast_kernel=fast_kernel, profiler=profiler)
+        return config
+
+    def test_report(self):
+        """ Test if the profiler records the phases and counters without changing the results """
+        expected_config = self.run_simulation()
+        profiler = Profiler()
+        config = self.run_simulation(profiler)
+        np.testing.assert_array_equal(config.average_time_steps, expected_config.average_time_steps)
+
+        report = profiler.report()
+        self.assertEqual(report['phases']['learning_episode']['calls'], 15)
+        self.assertEqual(report['phases']['evaluation']['calls'], 3)
+        self.assertEqual(len(report['counters']['steps_per_episode']), 15)
+        self.assertEqual(report['phases']['update']['calls'], sum(report['counters']['steps_per_episode']))
+        self.assertEqual(report['counters']['learned_q_values'][0], [0] * 2)
+        self.assertTrue(all(count > 0 for count in report['counters']['learned_q_values'][-1]))
+        self.assertEqual(report['counters']['memory_usage'][0], [config.hunter_1.q_table.values.nbytes
+                                                                 + config.hunter_1.internal_model.model.nbytes] * 2)
+
+    def test_fast_kernel(self):
+        """ Test if the episodes played by the fast kernel are counted as well """
+        profiler = Profiler()
+        self.run_simulation(profiler, fast_kernel=True)
+        report = profiler.report()
+        self.assertEqual(len(report['counters']['steps_per_episode']), 15)
+        self.assertNotIn('update', report['phases'])
+
+
+class TestAsyncEvaluation(unittest.TestCase):
+
+    def run_simulation(self, eval_episodes=5, evaluation_workers=1, agent_type=QwProposedAEAgent,
+                       async_evaluation=True):
+        """ Run a short seeded simulation with asynchronous (or batched) evaluations and return its configuration """
+        game = Game((5, 5), 1, 0, seed=0)
+        if agent_type is None:
+            config = Centralized_Config_Std("test", game, theta=0.998849)
+        else:
+            config = HunterConfig_Std("test", agent_type, game, theta=0.998849)
+        simulation.simulation(game, config, 5, eval_episodes, 15, verbose=False, async_evaluation=async_evaluation,
+                              batched_evaluation=not async_evaluation, evaluation_workers=evaluation_workers)
+        return config
+
+    def test_workers(self):
+        """ Test if the results do not depend on the number of workers """
+        for agent_type in (QwProposedAEAgent, None):
+            expected_config = self.run_simulation(agent_type=agent_type)
+            config = self.run_simulation(evaluation_workers=2, agent_type=agent_type)
+            self.assertTrue(np.all(expected_config.average_time_steps >= 1))
+            np.testing.assert_array_equal(config.average_time_steps, expected_config.average_time_steps)
+            np.testing.assert_array_equal(config.max_time_steps, expected_config.max_time_steps)
+
+    def test_training_unchanged(self):
+        """ Test if the evaluations played in the background do not change the training """
+        expected_config = self.run_simulation()
+        config = self.run_simulation(eval_episodes=10)
+        np.testing.assert_array_equal(config.hunter_1.q_table.to_array(), expected_config.hunter_1.q_table.to_array())
+
+    def test_same_as_batched_evaluation(self):
+        """ Test if the evaluations played in the background give the results of the ones played in place """
+        for agent_type in (QwProposedAEAgent, None):
+            expected_config = self.run_simulation(agent_type=agent_type, async_evaluation=False)
+            config = self.run_simulation(agent_type=agent_type)
+            np.testing.assert_array_equal(config.average_time_steps, expected_config.average_time_steps)
+            np.testing.assert_array_equal(config.std_time_steps, expected_config.std_time_steps)
+            agent, expected_agent = (get_agents(hunter_config)[0] for hunter_config in (config, expected_config))
+            np.testing.assert_array_equal(agent.q_table.to_array(), expected_agent.q_table.to_array())
+
+
+class TestEarlyStopping(unittest.TestCase):
+
+    def run_simulation(self, profiler=None, **parameters):
+        """ Run a short seeded simulation and return its configuration """
+        game = Game((5, 5), 1, 0, seed=0)
+        config = HunterConfig_Std("test", QwProposedAEAgent, game, theta=0.998849)
+        simulation.simulation(game, config, 5, 10, 30, verbose=False, profiler=profiler, **parameters)
+        return config
+
+    def test_evaluation_budget(self):
+        """ Test if the evaluations are played in rounds until the budget is met """
+        for parameters in ({}, {'batched_evaluation': True}, {'async_evaluation': True, 'evaluation_workers': 1}):
+            profiler = Profiler()
+            self.run_simulation(profiler, evaluation_budget=EvaluationBudget(np.inf, round_episodes=3), **parameters)
+            self.assertEqual(profiler.report()['counters']['eval_episodes'], [3] * 6)
+
+            profiler = Profiler()
+            self.run_simulation(profiler, evaluation_budget=EvaluationBudget(0, round_episodes=3), **parameters)
+            self.assertEqual(profiler.report()['counters']['eval_episodes'], [10] * 6)
+
+    def test_convergence(self):
+        """ Test if the training is stopped at the evaluation after the curve converged """
+        for parameters in ({}, {'async_evaluation': True, 'evaluation_workers': 1}):
+            config = self.run_simulation(convergence=ConvergenceCriterion(window=2, tolerance=np.inf), **parameters)
+            if parameters:
+                # the evaluations played in the background may be finished later
+                self.assertIn(config.converged_episode, (10, 15, 20, 25))
+            else:
+                self.assertEqual(config.converged_episode, 10)
+            self.assertEqual(len(config.average_time_steps), config.converged_episode // 5)
+
+            with tempfile.TemporaryDirectory() as directory:
+                _, filename = save_results(config, 30, directory)
+                with ResultFile(filename) as result_file:
+                    self.assertEqual(result_file.total_training_episodes, config.converged_episode)
+
+        config = self.run_simulation(convergence=ConvergenceCriterion(window=2, tolerance=0))
+        self.assertIsNone(config.converged_episode)
+        self.assertEqual(len(config.average_time_steps), 6)
+
+
+class TestSparseTables(unittest.TestCase):
+
+    def train(self, backend, compact=False):
+        """ Train seeded hunters, with their tables compacted halfway """
+        game = Game((5, 5), 1, 0, seed=4)
+        config = HunterConfig("test", QwProposedAEAgent, game, theta=0.998849, backend=backend)
+        hunters = (config.hunter_1, config.hunter_2)
+        for episode in range(10):
+            if compact and episode == 5:
+                self.assertGreater(compact_tables(hunters), 0)
+            do_learning_episode(game, hunters, episode)
+        return config.hunter_1
+
+    def test_same_learning(self):
+        """ Test if the sparse backend and the compaction do not change what the hunters learn """
+        expected = self.train('dict')
+        for hunter in (self.train('dict', compact=True), self.train('sparse')):
+            np.testing.assert_array_equal(hunter.q_table.to_array(), expected.q_table.to_array())
+            np.testing.assert_array_equal(hunter.internal_model.get_action_prob_table(),
+                                          expected.internal_model.get_action_prob_table())
+
+    def test_memory(self):
+        """ Test if the sparse tables only store the states updated """
+        dict_hunter, sparse_hunter = self.train('dict'), self.train('sparse')
+        self.assertLess(len(sparse_hunter.q_table.values), len({key[0] for key in dict_hunter.q_table.values}))
+        self.assertLess(simulation.get_memory_usage(sparse_hunter), simulation.get_memory_usage(dict_hunter))
+
+
+class TestResultFile(unittest.TestCase):
+
+    def check_round_trip(self, config, agents):
+        """ Check that a saved configuration is loaded back with the same results and agents """
+        hunters = (config.hunter_1, config.hunter_2)
+        for episode in range(3):
+            do_learning_episode(config.game, hunters, episode)
+        config.average_time_steps = np.array([10.0, 5.0])
+        config.std_time_steps = np.array([1.0, 0.5])
+
+        with tempfile.TemporaryDirectory() as directory:
+            _, filename = save_results(config, 20, directory)
+            with ResultFile(filename) as result_file:
+                self.assertEqual(result_file.name, "test")
+                self.assertEqual(result_file.total_training_episodes, 20)
+                np.testing.assert_array_equal(result_file.get_metric('average_time_steps'), [10.0, 5.0])
+                self.assertIsNone(result_file.get_metric('max_time_steps'))
+            loaded_config = load_hunter_config(filename)
+
+        np.testing.assert_array_equal(loaded_config.std_time_steps, [1.0, 0.5])
+        loaded_agents = [loaded_config.hunter_1.CA] if hasattr(loaded_config.hunter_1, 'CA') \
+            else [loaded_config.hunter_1, loaded_config.hunter_2]
+        for agent, loaded_agent in zip(agents, loaded_agents):
+            self.assertEqual(type(agent), type(loaded_agent))
+            np.testing.assert_array_equal(loaded_agent.q_table.to_array(), agent.q_table.to_array())
+            state_ids = np.arange(config.game.state_encoder.num_states)
+            np.testing.assert_allclose(loaded_agent.get_policy()[state_ids], agent.get_policy()[state_ids])
+
+    def test_agents(self):
+        """ Test if agents with an internal model are saved and loaded back """
+        np.random.seed(0)
+        for backend in ('dict', 'sparse', 'array'):
+            config = HunterConfig("test", QwProposedAEAgent, Game((5, 5), 1, 0), theta=0.998849, backend=backend)
+            self.check_round_trip(config, [config.hunter_1, config.hunter_2])
+
+    def test_legacy_agents(self):
+        """ Test if agents pickled with tables keyed by relative positions are loaded with a state encoder """
+        game = Game((5, 5), 1, 0, seed=0)
+        config = HunterConfig("test", QwProposedAEAgent, game, theta=0.998849)
+        hunters = (config.hunter_1, config.hunter_2)
+        for episode in range(3):
+            do_learning_episode(game, hunters, episode)
+        state_ids = np.arange(game.state_encoder.num_states)
+        policies = [hunter.get_policy()[state_ids] for hunter in hunters]
+
+        def get_positions(state_id):
+            state = game.state_encoder.decode(state_id)
+            return state.rel_position, state.other_rel_position
+
+        for hunter in hunters:
+            # the tables of the agents pickled before the states were encoded
+            hunter.q_table = {get_positions(state_id) + (action, other_action): q_value
+                              for (state_id, action, other_action), q_value in hunter.q_table.values.items()}
+            hunter.internal_model.model = {get_positions(state_id) + (action,): estimation
+                                           for (state_id, action), estimation in hunter.internal_model.model.items()}
+            hunter.internal_model.state_encoder = None
+        # the hunter configurations of the older versions did not keep the game
+        del config.game
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "legacy.bin")
+            with open(filename, 'wb') as legacy_file:
+                pickle.dump(config, legacy_file)
+            loaded_config = load_hunter_config(filename, (5, 5))
+
+        loaded_hunters = (loaded_config.hunter_1, loaded_config.hunter_2)
+        for hunter, policy in zip(loaded_hunters, policies):
+            np.testing.assert_allclose(hunter.get_policy()[state_ids], policy)
+        self.assertEqual(do_batched_evaluation(game, loaded_hunters, 5).shape, (5,))
+
+    def test_shipped_bin_file(self):
+        """ Test if a .bin file of the results folder is loaded with its tables keyed by state id """
+        filename = os.path.join(os.path.dirname(__file__), "results", "figure5_V1",
+                                "hunters_Centralized Q-learning_02012021_1548.bin")
+        loaded_config = load_hunter_config(filename)
+        agent = loaded_config.hunter_1.CA
+        game = Game((7, 7), 1, -1, seed=0)
+        state_ids = [state_id for state_id, _, _ in agent.q_table.values]
+        self.assertEqual(len(state_ids), 57600)
+        self.assertTrue(all(0 <= state_id < game.state_encoder.num_states for state_id in state_ids))
+        self.assertEqual(do_batched_evaluation(game, (loaded_config.hunter_1, loaded_config.hunter_2), 5).shape, (5,))
+
+    def test_without_evaluation(self):
+        """ Test if the results of a run without any training episode can be saved """
+        config = HunterConfig_Std("test", QwProposedAEAgent, Game((5, 5), 1, 0, seed=0), theta=0.998849)
+        simulation.simulation(config.game, config, 10, 5, 0, verbose=False)
+        with tempfile.TemporaryDirectory() as directory:
+            filename_results, _ = save_results(config, 0, directory)
+            metrics = load_metrics_file(filename_results)
+        self.assertEqual(metrics['train_episodes_batch'], 10)
+        self.assertEqual(len(metrics['average']), 0)
+
+    def test_centralized(self):
+        """ Test if the centralized agent is saved and loaded back """
+        np.random.seed(0)
+        config = Centralized_Config_Std("test", Game((5, 5), 1, 0, 2, -1), theta=0.998849)
+        self.check_round_trip(config, [config.hunter_1.CA])
+
+
+if __name__ == '__main__':
+    unittest.main()